@@ -28,5 +28,8 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(history_bp, url_prefix='/api')
+
+    from .services.metrics import init_app as init_metrics
+    init_metrics(app)
     
     return app
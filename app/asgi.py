@@ -0,0 +1,77 @@
+"""ASGI serving mode: async routes on Quart, every other route on the Flask app.
+
+Requests whose path and method match a route in async_history/async_auth
+are handled on the event loop. Anything else goes to the unchanged Flask
+app through a2wsgi's thread pool. One server (see asgi.py at the repo
+root) therefore serves the whole API.
+"""
+import logging
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart
+from werkzeug.exceptions import HTTPException
+
+from . import create_app
+from .config import Config
+from .routes.async_auth import auth_async_bp
+from .routes.async_history import history_async_bp
+from .services.metrics import init_async_app as init_metrics
+from .utils.async_database import open_async_pool, close_async_pool
+
+logger = logging.getLogger(__name__)
+
+
+class RouteDispatcher:
+    """Send each HTTP request to the async app if it has the route, else to WSGI."""
+
+    def __init__(self, async_app, wsgi_app, wsgi_threads):
+        self.async_app = async_app
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=wsgi_threads)
+        self._routes = async_app.url_map.bind('localhost')
+
+    def handles(self, path, method):
+        try:
+            self._routes.match(path, method=method)
+            return True
+        except HTTPException:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        # Lifespan events go to Quart so the async pool opens and closes with the server
+        if scope['type'] == 'http' and not self.handles(scope['path'], scope['method']):
+            await self.wsgi(scope, receive, send)
+        else:
+            await self.async_app(scope, receive, send)
+
+
+def create_async_app():
+    """The Quart app holding the async route variants."""
+    app = Quart(__name__, static_folder=None)
+    app.config.from_object(Config)
+    app.register_blueprint(auth_async_bp, url_prefix='/auth')
+    app.register_blueprint(history_async_bp, url_prefix='/api')
+    init_metrics(app)
+
+    @app.before_serving
+    async def startup():
+        await open_async_pool()
+        # What history_bp's before_app_request does for WSGI requests
+        try:
+            from .services.ocr_service import start_model_warmup
+            start_model_warmup()
+            if Config.OCR_ASYNC_ENABLED:
+                from .services.job_queue import ensure_job_workers
+                ensure_job_workers()
+        except ImportError:
+            pass
+
+    @app.after_serving
+    async def shutdown():
+        await close_async_pool()
+
+    return app
+
+
+def create_asgi_app():
+    """Application factory for the ASGI serving mode."""
+    return RouteDispatcher(create_async_app(), create_app(), Config.ASYNC_WSGI_THREADS)
@@ -11,10 +11,187 @@ class Config:
     DB_PASSWORD = os.getenv("DB_PASSWORD", "Ehetenandayo123")
     DB_NAME = os.getenv("DB_NAME", "carwatch")
     DB_PORT = int(os.getenv("DB_PORT", "3306"))
+
+    # Connection pool (per gunicorn worker; size it to at least `threads`)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+    DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "5"))
+
+    # ASGI serving mode (asgi.py): aiomysql pool per worker, threads for OCR in
+    # async uploads, and threads for the routes still served by the Flask app
+    ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+    ASYNC_OCR_THREADS = int(os.getenv("ASYNC_OCR_THREADS", "2"))
+    ASYNC_WSGI_THREADS = int(os.getenv("ASYNC_WSGI_THREADS", "8"))
     
     # Security
     SECRET_KEY = os.getenv("SECRET_KEY", "fa9ad7597c3d00bfee0003ab96cd6cd70448e1202193bb9dcce7308fda931100")
     BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+    # bcrypt runs on PASSWORD_HASH_WORKERS threads (0 = CPU count); past that,
+    # PASSWORD_HASH_MAX_QUEUE calls may wait and the rest get 429
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
     
+    # Inference batching (collects concurrent requests into one forward pass)
+    INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "False").lower() == "true"
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+    INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "60"))
+
+    # Inference backend: "pytorch" runs the .pt checkpoints through ultralytics,
+    # "onnx" runs models/best_*.onnx (see scripts/export_onnx.py) through ONNX Runtime
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+    ONNX_INT8 = os.getenv("ONNX_INT8", "False").lower() == "true"
+    ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+    ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+    ONNX_PROVIDERS = os.getenv("ONNX_PROVIDERS", "CPUExecutionProvider")
+
+    # Inference pool: model-owning processes shared by all web workers, which
+    # then skip loading the models themselves. 0 processes = cores / threads.
+    INFERENCE_POOL_ENABLED = os.getenv("INFERENCE_POOL_ENABLED", "False").lower() == "true"
+    INFERENCE_POOL_PROCESSES = int(os.getenv("INFERENCE_POOL_PROCESSES", "0"))
+    INFERENCE_POOL_THREADS = int(os.getenv("INFERENCE_POOL_THREADS", "2"))
+    INFERENCE_POOL_PIN_CPUS = os.getenv("INFERENCE_POOL_PIN_CPUS", "False").lower() == "true"
+    INFERENCE_POOL_SOCKET = os.getenv("INFERENCE_POOL_SOCKET", "/tmp/carwatch-inference.sock")
+    INFERENCE_POOL_BACKLOG = int(os.getenv("INFERENCE_POOL_BACKLOG", "256"))
+
+    # Models load lazily; with warm-up each worker loads them in the background
+    # right after start and /health/ready turns 200 once a dummy pass succeeded
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "True").lower() == "true"
+    MODEL_WARMUP_SIZE = int(os.getenv("MODEL_WARMUP_SIZE", "640"))
+
+    # Plate read cache (per worker): near-identical frames within the TTL reuse
+    # the previous LPD+OCR result. Distance is in bits of a HASH_SIZE^2-bit hash.
+    PLATE_CACHE_ENABLED = os.getenv("PLATE_CACHE_ENABLED", "False").lower() == "true"
+    PLATE_CACHE_HASH = os.getenv("PLATE_CACHE_HASH", "dhash").lower()
+    PLATE_CACHE_HASH_SIZE = int(os.getenv("PLATE_CACHE_HASH_SIZE", "16"))
+    PLATE_CACHE_MAX_DISTANCE = int(os.getenv("PLATE_CACHE_MAX_DISTANCE", "10"))
+    PLATE_CACHE_TTL = float(os.getenv("PLATE_CACHE_TTL", "10"))
+    PLATE_CACHE_MAX_ENTRIES = int(os.getenv("PLATE_CACHE_MAX_ENTRIES", "256"))
+
+    # Plate events: frames from one camera (?camera_id=) within the window update a
+    # single history row with a fused plate instead of adding one row each
+    PLATE_EVENTS_ENABLED = os.getenv("PLATE_EVENTS_ENABLED", "False").lower() == "true"
+    PLATE_EVENTS_WINDOW = float(os.getenv("PLATE_EVENTS_WINDOW", "5"))
+    PLATE_EVENTS_MAX_DURATION = float(os.getenv("PLATE_EVENTS_MAX_DURATION", "60"))
+    PLATE_EVENTS_MIN_SIMILARITY = float(os.getenv("PLATE_EVENTS_MIN_SIMILARITY", "0.5"))
+    PLATE_EVENTS_MAX_READS = int(os.getenv("PLATE_EVENTS_MAX_READS", "20"))
+
+    # Frames are shrunk to the detector's input size before LPD; 0 takes it from
+    # the loaded model (imgsz of the .pt, input shape of the .onnx)
+    LPD_INPUT_SIZE = int(os.getenv("LPD_INPUT_SIZE", "0"))
+
+    # Frame gate: per-camera ROI (JSON {"camera": [x1, y1, x2, y2]}, fractions or
+    # pixels) and motion check that reuses the camera's last read on static frames
+    FRAME_GATE_ENABLED = os.getenv("FRAME_GATE_ENABLED", "False").lower() == "true"
+    CAMERA_ROIS = os.getenv("CAMERA_ROIS", "")
+    MOTION_WIDTH = int(os.getenv("MOTION_WIDTH", "160"))
+    MOTION_THRESHOLD = int(os.getenv("MOTION_THRESHOLD", "25"))
+    MOTION_MIN_AREA = float(os.getenv("MOTION_MIN_AREA", "0.01"))
+    MOTION_BG_ALPHA = float(os.getenv("MOTION_BG_ALPHA", "1.0"))
+    MOTION_MAX_SKIP_SECONDS = float(os.getenv("MOTION_MAX_SKIP_SECONDS", "30"))
+
+    # Streaming ingest (/api/stream): chunked MJPEG or back-to-back JPEGs from one
+    # camera, sampled to STREAM_SAMPLE_FPS (0 = every frame, otherwise capped at
+    # STREAM_MAX_SAMPLE_FPS) and processed through a drop-oldest queue of
+    # STREAM_QUEUE_SIZE frames
+    STREAM_SAMPLE_FPS = float(os.getenv("STREAM_SAMPLE_FPS", "2"))
+    STREAM_MAX_SAMPLE_FPS = float(os.getenv("STREAM_MAX_SAMPLE_FPS", "10"))
+    STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "2"))
+    STREAM_MAX_FRAME_BYTES = int(os.getenv("STREAM_MAX_FRAME_BYTES", str(8 * 1024 * 1024)))
+    STREAM_READ_CHUNK = int(os.getenv("STREAM_READ_CHUNK", "16384"))
+    STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "3600"))
+    STREAM_DRAIN_TIMEOUT = float(os.getenv("STREAM_DRAIN_TIMEOUT", "15"))
+    STREAM_MAX_PER_WORKER = int(os.getenv("STREAM_MAX_PER_WORKER", "1"))
+
+    # Prometheus metrics (/metrics). Under gunicorn every worker writes its samples
+    # to METRICS_MULTIPROC_DIR (gunicorn.conf.py defaults it) and a scrape sums them
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+
+    # Keep a copy of every upload in uploads/ (debugging only; not needed for processing)
+    UPLOAD_SAVE_COPY = os.getenv("UPLOAD_SAVE_COPY", "False").lower() == "true"
+
+    # Batch upload (/api/upload_images)
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "64"))
+    BATCH_UPLOAD_MAX_FRAME_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_FRAME_BYTES", str(16 * 1024 * 1024)))
+    BATCH_UPLOAD_MAX_TOTAL_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_TOTAL_BYTES", str(256 * 1024 * 1024)))
+
+    # Asynchronous OCR jobs (/api/upload_image?async=1, /api/jobs/<id>)
+    OCR_ASYNC_ENABLED = os.getenv("OCR_ASYNC_ENABLED", "False").lower() == "true"
+    OCR_ASYNC_DEFAULT = os.getenv("OCR_ASYNC_DEFAULT", "False").lower() == "true"
+    OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "1"))
+    OCR_JOB_POLL_INTERVAL = float(os.getenv("OCR_JOB_POLL_INTERVAL", "2"))
+    OCR_JOB_STALE_SECONDS = float(os.getenv("OCR_JOB_STALE_SECONDS", "300"))
+    OCR_JOB_MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+    OCR_JOB_MAX_WAIT = float(os.getenv("OCR_JOB_MAX_WAIT", "30"))
+    OCR_JOB_LONG_POLL_INTERVAL = float(os.getenv("OCR_JOB_LONG_POLL_INTERVAL", "0.25"))
+
+    # History pagination (/api/history)
+    HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "1000"))
+    HISTORY_EXPORT_FETCH_SIZE = int(os.getenv("HISTORY_EXPORT_FETCH_SIZE", "500"))
+
+    # Image storage: 'local' (content-addressed files) or 'blob' (images.image_data)
+    IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "local")
+    IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "storage/images")
+
+    # Image delivery (/api/get_image): 'wsgi' (sendfile via gunicorn),
+    # 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx)
+    IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "31536000"))
+    IMAGE_SENDFILE_MODE = os.getenv("IMAGE_SENDFILE_MODE", "wsgi").lower()
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.getenv("IMAGE_ACCEL_REDIRECT_PREFIX", "/_protected_images")
+    USE_X_SENDFILE = IMAGE_SENDFILE_MODE == "x-sendfile"
+
+    # Latest image (/api/fetch_img) cached per worker. Uploads replace
+    # LATEST_IMAGE_SIGNAL_FILE (default: carwatch-latest-image in the temp dir) so
+    # other workers re-check MAX(image_id); they also re-check every RECHECK_SECONDS
+    LATEST_IMAGE_CACHE_ENABLED = os.getenv("LATEST_IMAGE_CACHE_ENABLED", "True").lower() == "true"
+    LATEST_IMAGE_SIGNAL_FILE = os.getenv("LATEST_IMAGE_SIGNAL_FILE", "")
+    LATEST_IMAGE_RECHECK_SECONDS = float(os.getenv("LATEST_IMAGE_RECHECK_SECONDS", "5"))
+
+    # Push of new history rows (/api/events SSE; /api/events/ws under asgi.py).
+    # Workers poll history by id when EVENTS_SIGNAL_FILE changes (default:
+    # carwatch-events in the temp dir) and at least every EVENTS_POLL_INTERVAL.
+    # Rows among the last EVENTS_UPDATE_WINDOW sent are re-read for history_update.
+    # A WSGI stream holds a gthread thread, hence the small per-worker cap.
+    EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "True").lower() == "true"
+    EVENTS_SIGNAL_FILE = os.getenv("EVENTS_SIGNAL_FILE", "")
+    EVENTS_SIGNAL_CHECK_INTERVAL = float(os.getenv("EVENTS_SIGNAL_CHECK_INTERVAL", "0.1"))
+    EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "2"))
+    EVENTS_GAP_SECONDS = float(os.getenv("EVENTS_GAP_SECONDS", "5"))
+    EVENTS_UPDATE_WINDOW = int(os.getenv("EVENTS_UPDATE_WINDOW", "200"))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+    EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "100"))
+    EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "500"))
+    EVENTS_MAX_CLIENTS_PER_WORKER = int(os.getenv("EVENTS_MAX_CLIENTS_PER_WORKER", "1"))
+    EVENTS_MAX_SECONDS = float(os.getenv("EVENTS_MAX_SECONDS", "300"))
+    EVENTS_ASYNC_MAX_CLIENTS = int(os.getenv("EVENTS_ASYNC_MAX_CLIENTS", "1000"))
+
+    # Fuzzy plate search (/api/plates/search) over an in-memory index of
+    # distinct plates. Workers catch up when the history signal file changes
+    # (EVENTS_SIGNAL_FILE) or every REFRESH_SECONDS, re-reading LOOKBACK_ROWS
+    # rows to see plates filled in later by OCR jobs and events
+    PLATE_SEARCH_ENABLED = os.getenv("PLATE_SEARCH_ENABLED", "True").lower() == "true"
+    PLATE_SEARCH_REFRESH_SECONDS = float(os.getenv("PLATE_SEARCH_REFRESH_SECONDS", "2"))
+    PLATE_SEARCH_LOOKBACK_ROWS = int(os.getenv("PLATE_SEARCH_LOOKBACK_ROWS", "1000"))
+    PLATE_SEARCH_MAX_DISTANCE = float(os.getenv("PLATE_SEARCH_MAX_DISTANCE", "2"))
+    PLATE_SEARCH_LIMIT = int(os.getenv("PLATE_SEARCH_LIMIT", "10"))
+    PLATE_SEARCH_MAX_LIMIT = int(os.getenv("PLATE_SEARCH_MAX_LIMIT", "50"))
+    PLATE_SEARCH_EVENTS_PER_PLATE = int(os.getenv("PLATE_SEARCH_EVENTS_PER_PLATE", "5"))
+
+    # Resized variants (/api/get_image/<id>?w=&h=&q=&fmt=)
+    VARIANT_CACHE_DIR = os.getenv("VARIANT_CACHE_DIR", "storage/variants")
+    VARIANT_CACHE_MAX_BYTES = int(os.getenv("VARIANT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    VARIANT_MAX_DIMENSION = int(os.getenv("VARIANT_MAX_DIMENSION", "2048"))
+    VARIANT_DEFAULT_QUALITY = int(os.getenv("VARIANT_DEFAULT_QUALITY", "75"))
+    THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+    THUMBNAIL_PRECOMPUTE = os.getenv("THUMBNAIL_PRECOMPUTE", "False").lower() == "true"
+
     # Application settings
     DEBUG = False
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Async (Quart) twins of the /auth session routes, served by asgi.py.
+
+The session cookie is Flask's signed cookie, so a login made here is valid
+on the routes the Flask app still serves (update/delete) and vice versa.
+bcrypt runs on the shared password hasher's threads (see
+services/password_hasher.py), and the event loop keeps serving other
+requests while a hash is computed.
+"""
+import logging
+
+import bleach
+from quart import Blueprint, jsonify, request, session
+
+from ..config import Config
+from ..services.password_hasher import get_password_hasher, HasherBusyError
+from ..utils.async_database import get_async_db_connection
+
+logger = logging.getLogger(__name__)
+auth_async_bp = Blueprint('auth_async', __name__)
+
+
+def hasher_busy_response():
+    response = jsonify({'success': False, 'message': 'Too many password operations in progress; retry shortly.'})
+    response.headers['Retry-After'] = str(Config.PASSWORD_HASH_RETRY_AFTER)
+    return response, 429
+
+
+@auth_async_bp.route('/register', methods=['POST'])
+async def register():
+    data = await request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return jsonify({'success': False, 'message': 'Username and password are required'}), 400
+
+    try:
+        username = bleach.clean(username)
+        async with get_async_db_connection() as (db, cursor):
+            await cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+            if await cursor.fetchone():
+                return jsonify({'success': False, 'message': 'Username already exists'}), 409
+
+        # No connection is held while bcrypt runs
+        hashed_password = await get_password_hasher().hash_async(password)
+        async with get_async_db_connection() as (db, cursor):
+            await cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
+            await db.commit()
+        return jsonify({'success': True, 'message': 'User registered successfully'}), 201
+    except HasherBusyError:
+        return hasher_busy_response()
+    except Exception as e:
+        logger.error(f"Registration error: {e}")
+        return jsonify({'success': False, 'message': 'Registration failed'}), 500
+
+
+@auth_async_bp.route('/login', methods=['POST'])
+async def login():
+    data = await request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return jsonify({'success': False, 'message': 'Username and password are required'}), 400
+
+    try:
+        username = bleach.clean(username)
+        async with get_async_db_connection() as (db, cursor):
+            await cursor.execute("SELECT user_id, username, password FROM users WHERE username = %s", (username,))
+            user = await cursor.fetchone()
+
+        if not user:
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+        hasher = get_password_hasher()
+        if not await hasher.verify_async(password, user['password']):
+            return jsonify({'success': False, 'message': 'Incorrect password'}), 401
+
+        hasher.rehash_if_needed(user['user_id'], password, user['password'])
+        session.permanent = True
+        session['user_id'] = user['user_id']
+        session['username'] = user['username']
+        return jsonify({
+            "success": True,
+            "message": "Login successful",
+            "data": {
+                "user_id": user['user_id'],
+                "username": user['username']
+            }
+        }), 200
+    except HasherBusyError:
+        return hasher_busy_response()
+    except Exception as e:
+        logger.error(f"Login error: {e}")
+        return jsonify({'success': False, 'message': 'Login failed'}), 500
+
+
+@auth_async_bp.route('/logout', methods=['POST'])
+async def logout():
+    session.pop('user_id', None)
+    session.pop('username', None)
+    return jsonify({'success': True, 'message': 'Logout successful'}), 200
+
+
+@auth_async_bp.route('/me', methods=['GET'])
+async def get_current_user():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    return jsonify({
+        'success': True,
+        'message': 'User details retrieved successfully.',
+        'data': {
+            'user_id': session['user_id'],
+            'username': session['username']
+        }
+    }), 200
@@ -0,0 +1,395 @@
+"""Async (Quart) twins of the I/O-bound /api routes, served by asgi.py.
+
+History pages, image delivery and the latest-image poll spend nearly all
+their time waiting on MySQL or the disk, so here they await aiomysql and
+aiofiles instead of holding a gthread slot. The /events push stream (and
+its WebSocket variant) waits on the event broadcaster the same way. upload_image keeps the same
+code path as the WSGI route, run in a bounded thread pool so OCR never
+blocks the event loop. Responses match history.py field for field; every
+other /api route is still served by the Flask app.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Blueprint, Response, jsonify, request, send_file, websocket
+from werkzeug.datastructures import ContentRange
+from werkzeug.sansio.http import is_resource_modified
+
+from ..config import Config
+from ..services.history_query import (
+    build_history_query, parse_history_filters, parse_fields, encode_cursor, decode_cursor
+)
+from ..services.image_store import get_store_for_backend, load_image_bytes
+from ..services.events import (
+    SINCE_SQL as EVENTS_SINCE_SQL, HistoryUpdate, event_payload, format_sse, format_sse_reset,
+    get_event_broadcaster, parse_last_event_id
+)
+from ..services.latest_image import (
+    LATEST_SQL as LATEST_IMAGE_SQL, VERSION_SQL as LATEST_VERSION_SQL, BLOB_SQL as LATEST_BLOB_SQL,
+    build_entry, get_latest_image_cache
+)
+from ..services.thumbnails import parse_variant_args, get_or_render_variant, variant_name, variant_mimetype
+from ..utils.async_database import get_async_db_connection
+from ..utils.image_response import (
+    IMAGE_META_COLUMNS, apply_image_caching, apply_latest_image_caching, image_mimetype
+)
+from .history import process_upload, wants_async
+
+logger = logging.getLogger(__name__)
+history_async_bp = Blueprint('history_async', __name__)
+
+_ocr_executor = None
+
+
+def get_ocr_executor():
+    """Threads that run decode/OCR/DB work for async uploads (ASYNC_OCR_THREADS)."""
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = ThreadPoolExecutor(max_workers=Config.ASYNC_OCR_THREADS, thread_name_prefix='async-ocr')
+    return _ocr_executor
+
+
+@history_async_bp.route('/upload_image', methods=['POST'])
+async def upload_image():
+    files = await request.files
+    if 'image' not in files:
+        return jsonify({'success': False, 'message': 'No image part in the request'}), 400
+
+    file = files['image']
+    status = request.args.get('status', 'unknown')
+
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'No selected file'}), 400
+
+    camera_id = (request.args.get('camera_id') or 'default')[:64]
+    loop = asyncio.get_running_loop()
+    response_data, status_code = await loop.run_in_executor(
+        get_ocr_executor(), process_upload,
+        file.read(), file.filename, status, camera_id, wants_async(request.args)
+    )
+    return jsonify(response_data), status_code
+
+
+@history_async_bp.route('/history', methods=['GET'])
+async def get_all_history():
+    try:
+        filters = parse_history_filters(request.args)
+        fields = parse_fields(request.args.get('fields'))
+        cursor_arg = request.args.get('cursor')
+        after = decode_cursor(cursor_arg) if cursor_arg else None
+        limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        limit = min(limit, Config.HISTORY_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        async with get_async_db_connection() as (db, cursor):
+            # One extra row tells us whether another page exists
+            sql, params = build_history_query(filters, fields, cursor=after, limit=limit + 1)
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['date'], rows[-1]['history_id']) if has_more else None
+        history_list = [{field: row[field] for field in fields} for row in rows]
+        return jsonify({
+            'success': True,
+            'message': 'History retrieved',
+            'data': history_list,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        }), 200
+    except Exception as e:
+        logger.error(f"History error: {e}")
+        return jsonify({'success': False, 'message': 'Error fetching history'}), 500
+
+
+def _is_modified(etag, last_modified):
+    return is_resource_modified(
+        http_range=request.headers.get('Range'),
+        http_if_range=request.headers.get('If-Range'),
+        http_if_modified_since=request.headers.get('If-Modified-Since'),
+        http_if_none_match=request.headers.get('If-None-Match'),
+        http_if_match=request.headers.get('If-Match'),
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+async def _make_conditional(response, complete_length):
+    await response.make_conditional(request, accept_ranges=True, complete_length=complete_length)
+    if response.status_code == 206:
+        # Quart 0.19 hands werkzeug's ContentRange an inclusive end, so the
+        # header would claim one byte less than the body carries
+        body = response.response
+        response.content_range = ContentRange('bytes', body.begin, body.end, complete_length)
+    return response
+
+
+async def _send_path(path, mimetype, etag, last_modified, store_root=None):
+    if store_root is not None and Config.IMAGE_SENDFILE_MODE == 'x-accel-redirect':
+        relative = os.path.relpath(path, store_root).replace(os.sep, '/')
+        response = Response(b"", mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = f"{Config.IMAGE_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return apply_image_caching(response, etag, last_modified)
+
+    # Quart streams the file through aiofiles, so a slow client never holds a thread
+    response = await send_file(path, mimetype=mimetype, add_etags=False, last_modified=last_modified)
+    apply_image_caching(response, etag, last_modified)
+    return await _make_conditional(response, os.path.getsize(path))
+
+
+async def _send_bytes(image_data, mimetype, etag, last_modified):
+    response = await send_file(io.BytesIO(image_data), mimetype=mimetype, add_etags=False,
+                               last_modified=last_modified)
+    apply_image_caching(response, etag, last_modified)
+    return await _make_conditional(response, len(image_data))
+
+
+async def _image_response(row, image_data, variant):
+    """Async build_image_response()/build_variant_response(); image_data is the legacy BLOB."""
+    last_modified = row.get('upload_date')
+    store = None
+    if row.get('storage_key'):
+        content_key = row['storage_key']
+        store = get_store_for_backend(row.get('storage_backend') or 'local')
+        original = store.path(content_key)
+        if not (original and os.path.exists(original)):
+            original = None
+    elif image_data:
+        content_key = hashlib.sha256(image_data).hexdigest()
+        original = None
+    else:
+        return None
+
+    etag = content_key if variant is None else variant_name(content_key, variant)
+    if not _is_modified(etag, last_modified):
+        return apply_image_caching(Response(b"", status=304), etag, last_modified)
+
+    if variant is None:
+        if original:
+            return await _send_path(original, image_mimetype(row.get('file_type')), etag, last_modified, store.root)
+        if image_data is None:
+            image_data = await asyncio.to_thread(load_image_bytes, row)
+        if not image_data:
+            return None
+        return await _send_bytes(image_data, image_mimetype(row.get('file_type')), etag, last_modified)
+
+    if original:
+        load_source = lambda: original
+    elif image_data is not None:
+        load_source = lambda: image_data
+    else:
+        load_source = lambda: load_image_bytes(row)
+    # Resizing is CPU work; a cached variant is just a stat() in the thread
+    path = await asyncio.to_thread(get_or_render_variant, content_key, variant, load_source)
+    if path is None:
+        return None
+    return await _send_path(path, variant_mimetype(variant), etag, last_modified)
+
+
+@history_async_bp.route('/get_image/<int:image_id>', methods=['GET'])
+async def serve_image_by_id(image_id):
+    try:
+        variant = parse_variant_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        async with get_async_db_connection() as (db, cursor):
+            await cursor.execute(f"SELECT {IMAGE_META_COLUMNS} FROM images WHERE image_id = %s", (image_id,))
+            result = await cursor.fetchone()
+
+            if not result:
+                logger.warning(f"No result found for image_id={image_id}")
+                return jsonify({'success': False, 'message': 'Image not found'}), 404
+
+            image_data = None
+            if not result.get('storage_key'):
+                await cursor.execute("SELECT image_data FROM images WHERE image_id = %s", (image_id,))
+                blob_row = await cursor.fetchone()
+                image_data = blob_row['image_data'] if blob_row else None
+
+        response = await _image_response(result, image_data, variant)
+        if response is None:
+            logger.warning(f"Empty image_data for image_id={image_id}")
+            return jsonify({'success': False, 'message': 'Image data missing'}), 404
+        return response
+    except Exception as e:
+        logger.error(f"Error serving image by ID: {e}")
+        return jsonify({'success': False, 'message': 'Internal server error'}), 500
+
+
+@history_async_bp.route('/fetch_img', methods=['GET'])
+async def fetch_image():
+    try:
+        latest = await _latest_image()
+    except Exception as e:
+        logger.error(f"Error in fetch_image: {e}")
+        return jsonify({'success': False, 'message': f'Error fetching image: {str(e)}'}), 500
+
+    if latest is None:
+        logger.warning("No images found in database")
+        return jsonify({'success': False, 'message': 'No images found in database'}), 404
+    if not _is_modified(latest.etag, latest.last_modified):
+        return apply_latest_image_caching(Response(b"", status=304), latest.etag, latest.last_modified)
+    response = Response(latest.data, mimetype=image_mimetype(latest.file_type))
+    return apply_latest_image_caching(response, latest.etag, latest.last_modified)
+
+
+async def _latest_image():
+    """get_latest_image() on aiomysql; shares this worker's cache with the sync routes."""
+    cache = get_latest_image_cache()
+    signal = version = None
+    if cache is not None:
+        entry, signal = cache.lookup()
+        if entry is not None:
+            return entry
+
+    async with get_async_db_connection() as (db, cursor):
+        if cache is not None:
+            await cursor.execute(LATEST_VERSION_SQL)
+            row = await cursor.fetchone()
+            version = row['image_id'] if row else None
+            entry = cache.confirm(version, signal)
+            if entry is not None:
+                return entry
+
+        await cursor.execute(LATEST_IMAGE_SQL)
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        image_data = None
+        if not row.get('storage_key'):
+            await cursor.execute(LATEST_BLOB_SQL, (row['image_id'],))
+            blob = await cursor.fetchone()
+            image_data = blob['image_data'] if blob else None
+
+    if row.get('storage_key'):
+        image_data = await asyncio.to_thread(load_image_bytes, row)
+    entry = build_entry(row, image_data)
+    if cache is not None and entry is not None:
+        cache.store(entry, version, signal)
+    return entry
+
+
+async def _event_feed(broadcaster, subscriber, ready, last_event_id):
+    """Yields event payloads, ``None`` for a heartbeat and ``('reset', id)`` when replay was cut."""
+    try:
+        pending_replay = last_event_id
+        while True:
+            if pending_replay is not None:
+                async with get_async_db_connection() as (db, cursor):
+                    await cursor.execute(EVENTS_SINCE_SQL, (pending_replay, Config.EVENTS_REPLAY_LIMIT))
+                    rows = await cursor.fetchall()
+                for row in rows:
+                    event = event_payload(row)
+                    if subscriber.accept(event):
+                        yield event
+                if len(rows) >= Config.EVENTS_REPLAY_LIMIT:
+                    yield ('reset', subscriber.last_id)
+                pending_replay = None
+
+            try:
+                await asyncio.wait_for(ready.wait(), Config.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            ready.clear()
+            events, lagged = subscriber.take()
+            for event in events:
+                if subscriber.accept(event):
+                    yield event
+            if lagged:
+                pending_replay = subscriber.last_id
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+async def _open_event_feed(last_event_id):
+    """(feed, None) or (None, (message, status)) for /events and /events/ws."""
+    broadcaster = get_event_broadcaster()
+    if broadcaster is None:
+        return None, ('Event push is disabled', 503)
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    # subscribe() may read MAX(history_id) through the sync pool
+    subscriber = await asyncio.to_thread(
+        broadcaster.subscribe, Config.EVENTS_CLIENT_BUFFER, Config.EVENTS_ASYNC_MAX_CLIENTS,
+        lambda: loop.call_soon_threadsafe(ready.set)
+    )
+    if subscriber is None:
+        return None, ('Too many event streams on this worker; retry later.', 503)
+    return _event_feed(broadcaster, subscriber, ready, last_event_id), None
+
+
+@history_async_bp.route('/events', methods=['GET'])
+async def event_stream():
+    """events.sse_stream() as a coroutine: a stream costs no thread, so it never needs to end."""
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    try:
+        feed, error = await _open_event_feed(last_event_id)
+    except Exception as e:
+        logger.error(f"Could not open event stream: {e}")
+        return jsonify({'success': False, 'message': 'Error opening event stream'}), 500
+    if error is not None:
+        return jsonify({'success': False, 'message': error[0]}), error[1]
+
+    async def body():
+        try:
+            yield f"retry: {Config.EVENTS_RETRY_MS}\n\n".encode()
+            async for item in feed:
+                if item is None:
+                    yield b": ping\n\n"
+                elif isinstance(item, tuple):
+                    yield format_sse_reset(item[1]).encode()
+                else:
+                    yield format_sse(item).encode()
+        finally:
+            await feed.aclose()
+
+    response = Response(body(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+
+@history_async_bp.websocket('/events/ws')
+async def event_socket():
+    """The same feed over a WebSocket: JSON text frames ``{"type": "history" | "history_update" | "ping" | "reset", ...}``.
+
+    Reconnect with ?last_event_id=<last history_id received> to replay.
+    """
+    try:
+        feed, error = await _open_event_feed(parse_last_event_id(websocket.args.get('last_event_id')))
+    except Exception as e:
+        logger.error(f"Could not open event socket: {e}")
+        await websocket.close(1011)
+        return
+    if error is not None:
+        await websocket.close(1013, error[0])
+        return
+
+    try:
+        await websocket.accept()
+        async for item in feed:
+            if item is None:
+                message = {'type': 'ping'}
+            elif isinstance(item, tuple):
+                message = {'type': 'reset', 'after_id': item[1]}
+            else:
+                message = {'type': 'history_update' if isinstance(item, HistoryUpdate) else 'history', **item}
+            await websocket.send(json.dumps(message, separators=(',', ':')))
+    finally:
+        await feed.aclose()
@@ -4,18 +4,27 @@ import logging
 
 # Import utilities with fallback
 try:
+    from ..config import Config
     from ..utils.database import get_db_connection
-    from ..utils.auth import hash_password, check_password
+    from ..services.password_hasher import get_password_hasher, HasherBusyError
 except ImportError:
     # Fallback to root level
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-    from utils import get_db_connection, hash_password, check_password
+    from app.config import Config
+    from utils import get_db_connection
+    from app.services.password_hasher import get_password_hasher, HasherBusyError
 
 logger = logging.getLogger(__name__)
 auth_bp = Blueprint('auth', __name__)
 
+def hasher_busy_response():
+    """429 for when every bcrypt worker is busy and the queue is full."""
+    response = jsonify({'success': False, 'message': 'Too many password operations in progress; retry shortly.'})
+    response.headers['Retry-After'] = str(Config.PASSWORD_HASH_RETRY_AFTER)
+    return response, 429
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -26,19 +35,22 @@ def register():
         return jsonify({'success': False, 'message': 'Username and password are required'}), 400
 
     try:
+        username = bleach.clean(username)
         with get_db_connection() as (db, cursor):
-            username = bleach.clean(username)
-
             sql_check_user = "SELECT username FROM users WHERE username = %s"
             cursor.execute(sql_check_user, (username,))
             if cursor.fetchone():
                 return jsonify({'success': False, 'message': 'Username already exists'}), 409
 
-            hashed_password = hash_password(password)
+        # bcrypt runs without holding a pooled connection
+        hashed_password = get_password_hasher().hash(password)
+        with get_db_connection() as (db, cursor):
             sql_insert_user = "INSERT INTO users (username, password) VALUES (%s, %s)"
             cursor.execute(sql_insert_user, (username, hashed_password))
             db.commit()
-            return jsonify({'success': True, 'message': 'User registered successfully'}), 201
+        return jsonify({'success': True, 'message': 'User registered successfully'}), 201
+    except HasherBusyError:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({'success': False, 'message': 'Registration failed'}), 500
@@ -53,29 +65,33 @@ def login():
         return jsonify({'success': False, 'message': 'Username and password are required'}), 400
 
     try:
+        username = bleach.clean(username)
         with get_db_connection() as (db, cursor):
-            username = bleach.clean(username)
-
             sql = "SELECT user_id, username, password FROM users WHERE username = %s"
             cursor.execute(sql, (username,))
             user = cursor.fetchone()
 
-            if user and check_password(password, user['password']):
-                session.permanent = True
-                session['user_id'] = user['user_id']
-                session['username'] = user['username']
-                return jsonify({
-                    "success": True,
-                    "message": "Login successful",
-                    "data": {
-                        "user_id": user['user_id'],
-                        "username": user['username']
-                    }
-                }), 200
-            elif user:
-                return jsonify({'success': False, 'message': 'Incorrect password'}), 401
-            else:
-                return jsonify({'success': False, 'message': 'Account not found'}), 404
+        if not user:
+            return jsonify({'success': False, 'message': 'Account not found'}), 404
+
+        hasher = get_password_hasher()
+        if not hasher.verify(password, user['password']):
+            return jsonify({'success': False, 'message': 'Incorrect password'}), 401
+
+        hasher.rehash_if_needed(user['user_id'], password, user['password'])
+        session.permanent = True
+        session['user_id'] = user['user_id']
+        session['username'] = user['username']
+        return jsonify({
+            "success": True,
+            "message": "Login successful",
+            "data": {
+                "user_id": user['user_id'],
+                "username": user['username']
+            }
+        }), 200
+    except HasherBusyError:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'success': False, 'message': 'Login failed'}), 500
@@ -166,22 +182,26 @@ def update_password():
 
     try:
         with get_db_connection() as (db, cursor):
-            # Verify current password
             sql_get_user = "SELECT password FROM users WHERE user_id = %s"
             cursor.execute(sql_get_user, (current_user_id,))
             user_data = cursor.fetchone()
 
-            if not user_data or not check_password(current_password, user_data['password']):
-                return jsonify({'success': False, 'message': 'Incorrect current password'}), 403
+        # Verify current password
+        hasher = get_password_hasher()
+        if not user_data or not hasher.verify(current_password, user_data['password']):
+            return jsonify({'success': False, 'message': 'Incorrect current password'}), 403
 
-            # Update password
-            hashed_new_password = hash_password(new_password)
+        # Update password
+        hashed_new_password = hasher.hash(new_password)
+        with get_db_connection() as (db, cursor):
             sql_update_password = "UPDATE users SET password = %s WHERE user_id = %s"
             cursor.execute(sql_update_password, (hashed_new_password, current_user_id))
             db.commit()
 
-            return jsonify({'success': True, 'message': 'Password updated successfully'}), 200
+        return jsonify({'success': True, 'message': 'Password updated successfully'}), 200
 
+    except HasherBusyError:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Password update error: {e}")
         return jsonify({'success': False, 'message': 'Password update failed'}), 500
@@ -200,14 +220,15 @@ def delete_user():
 
     try:
         with get_db_connection() as (db, cursor):
-            # Verify password
             sql_get_user = "SELECT password FROM users WHERE user_id = %s"
             cursor.execute(sql_get_user, (current_user_id,))
             user_data = cursor.fetchone()
 
-            if not user_data or not check_password(password_for_verification, user_data['password']):
-                return jsonify({'success': False, 'message': 'Incorrect password. Account deletion failed.'}), 403
+        # Verify password
+        if not user_data or not get_password_hasher().verify(password_for_verification, user_data['password']):
+            return jsonify({'success': False, 'message': 'Incorrect password. Account deletion failed.'}), 403
 
+        with get_db_connection() as (db, cursor):
             # Delete associated history records first (if user_id column exists)
             try:
                 sql_delete_history = "DELETE FROM history WHERE user_id = %s"
@@ -221,12 +242,13 @@ def delete_user():
             cursor.execute(sql_delete_user, (current_user_id,))
             db.commit()
 
-            # Clear session
-            session.pop('user_id', None)
-            session.pop('username', None)
-
-            return jsonify({'success': True, 'message': 'Account deleted successfully'}), 200
+        # Clear session
+        session.pop('user_id', None)
+        session.pop('username', None)
+        return jsonify({'success': True, 'message': 'Account deleted successfully'}), 200
 
+    except HasherBusyError:
+        return hasher_busy_response()
     except Exception as e:
         logger.error(f"Account deletion error: {e}")
         return jsonify({'success': False, 'message': 'Account deletion failed'}), 500
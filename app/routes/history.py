@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, session, send_from_directory, Response
+from flask import Blueprint, request, jsonify, session, send_from_directory, Response, stream_with_context
 import bleach
 import os
 import cv2
@@ -6,20 +6,60 @@ import numpy as np
 import datetime
 import logging
 import time
-from ..services.db_upload import db_upload_image
+import io
+import csv
+import json
+import zlib
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from ..services.db_upload import store_uploaded_image, prepare_image_data, insert_images_batch
+from ..services.plate_events import record_frame
+from ..services.stream_ingest import open_session
+from ..services.metrics import observe_stage
+from ..services.latest_image import get_latest_image, publish_latest_image
+from ..services.events import get_event_broadcaster, parse_last_event_id, publish_history_event, sse_stream
+from ..services.plate_search import get_plate_index, normalize_plate, search_plates, start_plate_index
+from ..utils.image_response import (
+    build_image_response, build_variant_response, build_latest_image_response, IMAGE_META_COLUMNS
+)
+from ..services.thumbnails import parse_variant_args
+from ..services.history_query import (
+    build_history_query, parse_history_filters, parse_fields, encode_cursor, decode_cursor
+)
 
 try:
-    from ..utils.database import get_db_connection
+    from ..utils.database import get_db_connection, kill_running_query
 except ImportError:
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-    from utils import get_db_connection
+    from utils import get_db_connection, kill_running_query
 
 try:
-    from ..services.ocr_service import detect_and_crop_plate, recognize_characters_with_yolo
+    from ..config import Config
 except ImportError:
+    from app.config import Config
+
+try:
+    from ..services.ocr_service import (
+        detect_and_crop_plate, recognize_characters_with_yolo,
+        detect_and_crop_plates_batch, recognize_characters_batch, read_plates,
+        ModelUnavailableError, start_model_warmup
+    )
+except ImportError:
+    class ModelUnavailableError(RuntimeError): pass
+    def start_model_warmup(): pass
     def detect_and_crop_plate(img): return None
     def recognize_characters_with_yolo(img): return "NO_OCR"
+    def read_plates(img, camera_id=None): return []
+    def detect_and_crop_plates_batch(imgs): return [None] * len(imgs)
+    def recognize_characters_batch(imgs): return ["NO_OCR"] * len(imgs)
+
+try:
+    from ..services.job_queue import enqueue_ocr_job, wake_workers, ensure_job_workers, get_job, wait_for_job
+    JOB_QUEUE_AVAILABLE = True
+except ImportError:
+    JOB_QUEUE_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 history_bp = Blueprint('history', __name__)
@@ -32,6 +72,29 @@ IMAGES_FOLDER = 'images'
 if not os.path.exists(IMAGES_FOLDER):
     os.makedirs(IMAGES_FOLDER)
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+ARCHIVE_CONTENT_TYPES = ('application/zip', 'application/x-tar', 'application/gzip', 'application/x-gzip')
+
+@history_bp.before_app_request
+def start_job_workers():
+    # All once-per-process; gunicorn's post_fork hook usually got there first
+    start_model_warmup()
+    start_plate_index()
+    if JOB_QUEUE_AVAILABLE and Config.OCR_ASYNC_ENABLED:
+        ensure_job_workers()
+
+def wants_async(args):
+    value = args.get('async')
+    if value is None:
+        return Config.OCR_ASYNC_DEFAULT
+    return value.lower() in ('1', 'true', 'yes')
+
+def history_fields_for_status(status):
+    """Map an upload status onto the (subject, description) stored in history."""
+    description = "car is available" if status == "entering" else "car is being use"
+    subject = "Vehicle Entry" if status == "entering" else ("Vehicle Exit" if status == "leaving" else "Unknown Status")
+    return subject, description
+
 @history_bp.route('/upload_image', methods=['POST'])
 def upload_image():
     if 'image' not in request.files:
@@ -43,38 +106,66 @@ def upload_image():
     if file.filename == '':
         return jsonify({'success': False, 'message': 'No selected file'}), 400
 
+    camera_id = (request.args.get('camera_id') or 'default')[:64]
+    response_data, status_code = process_upload(
+        file.read(), file.filename, status, camera_id, wants_async(request.args)
+    )
+    return jsonify(response_data), status_code
+
+def process_upload(image_bytes, original_filename, status, camera_id, run_async=False):
+    """Store, read and record one uploaded image; returns (response dict, status code).
+
+    Shared by upload_image and its ASGI twin, which runs it in an executor.
+    """
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
-    original_filename = file.filename
     file_extension = os.path.splitext(original_filename)[1]
     filename = f"image_{timestamp}{file_extension}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
 
-    image_bytes = file.read()
-    with open(filepath, 'wb') as f:
-        f.write(image_bytes)
+    if Config.UPLOAD_SAVE_COPY:
+        with observe_stage('save_copy'), open(os.path.join(UPLOAD_FOLDER, filename), 'wb') as f:
+            f.write(image_bytes)
 
-    db_upload_result = db_upload_image(filename)
+    if JOB_QUEUE_AVAILABLE and Config.OCR_ASYNC_ENABLED and run_async:
+        # The job worker decodes later; JPEGs are stored without decoding here
+        db_upload_result = store_uploaded_image(image_bytes, filename)
+        if db_upload_result.get('image_id'):
+            return _queue_upload(db_upload_result, status)
 
     try:
-        img_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        with observe_stage('decode'):
+            img_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
         if img_np is None:
             raise ValueError("Could not decode image.")
     except Exception as e:
-        os.remove(filepath)
-        return jsonify({'success': False, 'message': f'Error decoding image: {e}'}), 500
+        return {'success': False, 'message': f'Error decoding image: {e}'}, 500
 
-    cropped_plate = detect_and_crop_plate(img_np)
-    plate_number = ""
-    if cropped_plate is not None:
-        plate_number = recognize_characters_with_yolo(cropped_plate)
-        logger.info(f"OCR Result: {plate_number}")
+    return _ingest_frame(image_bytes, filename, img_np, status, camera_id)
 
-    description = "car is available" if status == "entering" else "car is being use"
-    subject = "Vehicle Entry" if status == "entering" else ("Vehicle Exit" if status == "leaving" else "Unknown Status")
+def _ingest_frame(image_bytes, filename, img_np, status, camera_id):
+    """Read plates on a decoded frame and record it; returns (response dict, status code).
+
+    Needs no request context, so the streaming ingest thread uses it too.
+    """
+    if Config.PLATE_EVENTS_ENABLED:
+        return _record_event_frame(image_bytes, filename, img_np, status, camera_id)
+
+    # Read first: a 503 must not leave an images row that no history row points at
+    try:
+        plates = read_plates(img_np, camera_id)
+    except ModelUnavailableError as e:
+        return {'success': False, 'message': str(e), 'image_uploaded': False}, 503
+
+    # The same decoded array feeds storage (non-JPEG transcode) and detection
+    db_upload_result = store_uploaded_image(image_bytes, filename, img_np)
+    plate_number = plates[0]['plate'] if plates else ""
+    if plates:
+        logger.info(f"OCR Result: {plate_number} ({len(plates)} plate(s) in frame)")
+
+    subject, description = history_fields_for_status(status)
 
     try:
         image_id = db_upload_result.get('image_id')  # Boleh None
-        with get_db_connection() as (db, cursor):
+        with observe_stage('history_insert'), get_db_connection() as (db, cursor):
             if image_id:
                 sql = "INSERT INTO history (plate, subject, description, image_id) VALUES (%s, %s, %s, %s)"
                 cursor.execute(sql, (plate_number, subject, description, image_id))
@@ -88,13 +179,14 @@ def upload_image():
         logger.error(f"Database recording error: {e}")
         message = f'Failed to record data to database: {e}'
         status_code = 500
-    finally:
-        os.remove(filepath)
+    if status_code == 201:
+        publish_history_event()
 
     response_data = {
         'success': status_code == 201,
         'message': message,
         'plate_number': plate_number,
+        'plates': plates,
         'status': status,
         'image_uploaded': db_upload_result['success']
     }
@@ -105,65 +197,526 @@ def upload_image():
     else:
         response_data['upload_error'] = db_upload_result['message']
 
-    return jsonify(response_data), status_code
+    return response_data, status_code
+
+def _record_event_frame(image_bytes, filename, img_np, status, camera_id):
+    """Fold the frame into the camera's open event instead of adding a history row.
+
+    The image is only stored when it becomes the event's picture (first
+    frame, or a more confident plate than the frames before it).
+    """
+    try:
+        plates = read_plates(img_np, camera_id)
+    except ModelUnavailableError as e:
+        return {'success': False, 'message': str(e)}, 503
+
+    subject, description = history_fields_for_status(status)
+
+    def store_frame(cursor):
+        try:
+            img_data, file_size, file_extension, _ = prepare_image_data(image_bytes, filename, img_np)
+        except ValueError as e:
+            logger.warning(f"Not storing {filename}: {e}")
+            return None
+        return insert_images_batch(cursor, [(filename, img_data, file_size, file_extension)])[0]
+
+    try:
+        with observe_stage('event_record'):
+            event = record_frame(camera_id, status, plates[0] if plates else None, subject, description, store_frame)
+    except Exception as e:
+        logger.error(f"Event recording error: {e}")
+        return {
+            'success': False,
+            'message': f'Failed to record data to database: {e}',
+            'plates': plates,
+            'status': status
+        }, 500
+    if event['image_stored']:
+        publish_latest_image(event['image_id'])
+    # A merged frame updates the event's row (fused plate, better image)
+    publish_history_event()
+
+    response_data = {
+        'success': True,
+        'message': ('Image received, OCR processed, and new event recorded.' if event['new_event']
+                    else f"Frame merged into event {event['history_id']} ({event['frames']} frames)."),
+        'plate_number': event['plate'],
+        'frame_plate_number': plates[0]['plate'] if plates else "",
+        'plates': plates,
+        'status': status,
+        'camera_id': camera_id,
+        'event': event,
+        'image_uploaded': event['image_stored'],
+        'image_id': event['image_id']
+    }
+    if event['image_stored']:
+        response_data['image_filename'] = filename
+    return response_data, 201 if event['new_event'] else 200
+
+def _queue_upload(db_upload_result, status):
+    """Record the history row with an empty plate and queue OCR for later."""
+    subject, description = history_fields_for_status(status)
+    image_id = db_upload_result['image_id']
+    try:
+        with get_db_connection() as (db, cursor):
+            sql = "INSERT INTO history (plate, subject, description, image_id) VALUES (%s, %s, %s, %s)"
+            cursor.execute(sql, ("", subject, description, image_id))
+            history_id = cursor.lastrowid
+            job_id = enqueue_ocr_job(cursor, image_id, history_id)
+            db.commit()
+    except Exception as e:
+        logger.error(f"Could not queue OCR job: {e}")
+        return {'success': False, 'message': f'Failed to queue OCR job: {e}'}, 500
+
+    publish_history_event()
+    wake_workers()
+    return {
+        'success': True,
+        'message': 'Image received and queued for OCR processing.',
+        'job_id': job_id,
+        'history_id': history_id,
+        'status': status,
+        'status_url': f"/api/jobs/{job_id}",
+        'image_uploaded': True,
+        'image_filename': db_upload_result['filename'],
+        'image_id': image_id
+    }, 202
+
+@history_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    if not JOB_QUEUE_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Job queue is not available'}), 503
+
+    try:
+        wait = min(float(request.args.get('wait', 0)), Config.OCR_JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid wait parameter'}), 400
+
+    try:
+        job = wait_for_job(job_id, wait) if wait > 0 else get_job(job_id)
+    except Exception as e:
+        logger.error(f"Job status error: {e}")
+        return jsonify({'success': False, 'message': 'Error fetching job'}), 500
+
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+
+    return jsonify({
+        'success': True,
+        'message': 'Job retrieved',
+        'data': {
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'plate_number': job['plate'],
+            'error': job['error'],
+            'attempts': job['attempts'],
+            'history_id': job['history_id'],
+            'image_id': job['image_id'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at']
+        }
+    }), 200
+
+class BatchTooLarge(ValueError):
+    """The batch passed BATCH_UPLOAD_MAX_FILES or one of the byte limits; answered with 413."""
+
+def _is_archive_image(name):
+    # macOS zips carry a __MACOSX/._name.jpg resource fork next to every image
+    return (name.lower().endswith(IMAGE_EXTENSIONS) and '__MACOSX/' not in name
+            and not os.path.basename(name).startswith('._'))
+
+def _read_limited(fileobj, name, max_bytes):
+    # Declared sizes can lie, so never read more than one byte past the limit
+    data = fileobj.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise BatchTooLarge(f'{name} is larger than {max_bytes} bytes')
+    return data
+
+def _read_archive_frames(fileobj, is_zip, max_frame_bytes):
+    """Yield (name, bytes) for image members of a zip or tar stream, reading one member at a time."""
+    if is_zip:
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_archive_image(info.filename):
+                    continue
+                if info.file_size > max_frame_bytes:
+                    raise BatchTooLarge(f'{info.filename} is larger than {max_frame_bytes} bytes')
+                with archive.open(info) as member:
+                    yield os.path.basename(info.filename), _read_limited(member, info.filename, max_frame_bytes)
+        return
+
+    # Streaming mode so large tar uploads are never fully buffered
+    with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not _is_archive_image(member.name):
+                continue
+            if member.size > max_frame_bytes:
+                raise BatchTooLarge(f'{member.name} is larger than {max_frame_bytes} bytes')
+            yield os.path.basename(member.name), _read_limited(archive.extractfile(member), member.name, max_frame_bytes)
+
+def _batch_sources(max_frame_bytes, max_total_bytes):
+    for f in request.files.getlist('images'):
+        if f.filename:
+            yield f.filename, _read_limited(f.stream, f.filename, max_frame_bytes)
+
+    archive = request.files.get('archive')
+    if archive is not None and archive.filename:
+        is_zip = zipfile.is_zipfile(archive.stream)
+        archive.stream.seek(0)
+        yield from _read_archive_frames(archive.stream, is_zip, max_frame_bytes)
+    elif not request.files and request.mimetype in ARCHIVE_CONTENT_TYPES:
+        if request.mimetype == 'application/zip':
+            # zipfile needs to seek, so this body is read whole; refuse it before that
+            if (request.content_length or 0) > max_total_bytes:
+                raise BatchTooLarge(f'Archive is larger than {max_total_bytes} bytes')
+            yield from _read_archive_frames(io.BytesIO(request.get_data(cache=False)), True, max_frame_bytes)
+        else:
+            yield from _read_archive_frames(request.stream, False, max_frame_bytes)
+
+def _collect_batch_frames(max_files):
+    """Frames from a multipart 'images' list, an 'archive' part, or a raw archive body.
+
+    Stops reading with BatchTooLarge at the first frame past ``max_files``,
+    BATCH_UPLOAD_MAX_FRAME_BYTES or BATCH_UPLOAD_MAX_TOTAL_BYTES, so an
+    oversized or hostile archive is never held in memory.
+    """
+    max_total_bytes = Config.BATCH_UPLOAD_MAX_TOTAL_BYTES
+    frames = []
+    total_bytes = 0
+    for name, image_bytes in _batch_sources(Config.BATCH_UPLOAD_MAX_FRAME_BYTES, max_total_bytes):
+        if len(frames) >= max_files:
+            raise BatchTooLarge(f'Too many images (max {max_files})')
+        total_bytes += len(image_bytes)
+        if total_bytes > max_total_bytes:
+            raise BatchTooLarge(f'Images add up to more than {max_total_bytes} bytes')
+        frames.append((name, image_bytes))
+    return frames
+
+def _decode_frame(image_bytes):
+    try:
+        return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+@history_bp.route('/upload_images', methods=['POST'])
+def upload_images():
+    max_files = Config.BATCH_UPLOAD_MAX_FILES
+    try:
+        frames = _collect_batch_frames(max_files)
+    except BatchTooLarge as e:
+        return jsonify({'success': False, 'message': str(e)}), 413
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        return jsonify({'success': False, 'message': f'Invalid archive: {e}'}), 400
+
+    if not frames:
+        return jsonify({'success': False, 'message': 'No images in the request'}), 400
+
+    status = request.args.get('status', 'unknown')
+    subject, description = history_fields_for_status(status)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+    # cv2 releases the GIL while decoding, so frames decode in parallel
+    with ThreadPoolExecutor(max_workers=min(4, len(frames))) as pool:
+        decoded = list(pool.map(_decode_frame, [image_bytes for _, image_bytes in frames]))
+
+    results = []
+    prepared = []
+    images_np = []
+    for index, ((original_name, image_bytes), img_np) in enumerate(zip(frames, decoded)):
+        item = {'index': index, 'original_filename': original_name}
+        results.append(item)
+        if img_np is None:
+            item.update({'success': False, 'message': 'Could not decode image.'})
+            continue
+
+        filename = f"image_{timestamp}_{index:03d}{os.path.splitext(original_name)[1].lower() or '.jpg'}"
+        item['image_filename'] = filename
+        try:
+            img_data, file_size, file_extension, _ = prepare_image_data(image_bytes, filename, img_np)
+            prepared.append((filename, img_data, file_size, file_extension))
+            item['_prepared'] = len(prepared) - 1
+        except Exception as e:
+            item['upload_error'] = str(e)
+        images_np.append(img_np)
+        item['_frame'] = len(images_np) - 1
+
+    try:
+        crops = detect_and_crop_plates_batch(images_np)
+        plates = recognize_characters_batch(crops)
+    except ModelUnavailableError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    decoded_items = [item for item in results if '_frame' in item]
+    try:
+        with get_db_connection() as (db, cursor):
+            image_ids = insert_images_batch(cursor, prepared)
+            history_rows = []
+            for item in decoded_items:
+                image_id = image_ids[item['_prepared']] if '_prepared' in item else None
+                item['image_id'] = image_id
+                history_rows.append((plates[item['_frame']], subject, description, image_id))
+
+            sql = "INSERT INTO history (plate, subject, description, image_id) VALUES (%s, %s, %s, %s)"
+            cursor.executemany(sql, history_rows)
+            db.commit()
+        if image_ids:
+            publish_latest_image(max(image_ids))
+        publish_history_event()
+        status_code = 201
+        message = f'Processed {len(decoded_items)} of {len(results)} image(s).'
+    except Exception as e:
+        logger.error(f"Batch database recording error: {e}")
+        status_code = 500
+        message = f'Failed to record data to database: {e}'
+
+    for item in results:
+        if '_frame' in item:
+            item['plate_number'] = plates[item['_frame']]
+            item['image_uploaded'] = status_code == 201 and item.get('image_id') is not None
+            item['success'] = status_code == 201
+        item.pop('_frame', None)
+        item.pop('_prepared', None)
+
+    return jsonify({
+        'success': status_code == 201,
+        'message': message,
+        'status': status,
+        'processed': len(decoded_items) if status_code == 201 else 0,
+        'failed': len(results) - (len(decoded_items) if status_code == 201 else 0),
+        'results': results
+    }), status_code
+
+@history_bp.route('/stream', methods=['POST'])
+def ingest_stream():
+    """Long-lived chunked upload of one camera's MJPEG (or back-to-back JPEG) stream.
+
+    Frames are parsed as they arrive and sampled to ``fps``; sampled frames
+    go through the same path as /api/upload_image on a background thread,
+    dropping the oldest pending frame when OCR falls behind. The response
+    is a summary sent when the client ends the stream (or after
+    STREAM_MAX_SECONDS).
+    """
+    status = request.args.get('status', 'unknown')
+    camera_id = (request.args.get('camera_id') or 'default')[:64]
+    try:
+        sample_fps = float(request.args.get('fps', Config.STREAM_SAMPLE_FPS))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid fps parameter'}), 400
+    if sample_fps < 0:
+        return jsonify({'success': False, 'message': 'fps must not be negative'}), 400
+    # 0 hands every frame to OCR; the drop-oldest queue still bounds the work
+    if sample_fps > Config.STREAM_MAX_SAMPLE_FPS:
+        sample_fps = Config.STREAM_MAX_SAMPLE_FPS
+
+    def process(index, frame_bytes):
+        img_np = _decode_frame(frame_bytes)
+        if img_np is None:
+            return {'frame': index, 'success': False, 'message': 'Could not decode frame.'}
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+        result, status_code = _ingest_frame(frame_bytes, f"stream_{timestamp}.jpg", img_np, status, camera_id)
+        return {
+            'frame': index,
+            'success': result['success'],
+            'status_code': status_code,
+            'plate_number': result.get('plate_number', ""),
+            'image_id': result.get('image_id'),
+        }
+
+    stream = open_session(Config.STREAM_MAX_PER_WORKER, process, sample_fps,
+                            Config.STREAM_QUEUE_SIZE, Config.STREAM_MAX_FRAME_BYTES)
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Too many streams on this worker; retry later.'}), 503
+
+    sampling = f"{sample_fps:g} fps sampled" if sample_fps else "every frame"
+    logger.info(f"Stream from camera {camera_id} started ({sampling})")
+    deadline = time.monotonic() + Config.STREAM_MAX_SECONDS
+    ended_by = 'client'
+    try:
+        while True:
+            chunk = request.stream.read(Config.STREAM_READ_CHUNK)
+            if not chunk:
+                break
+            stream.feed(chunk)
+            if time.monotonic() > deadline:
+                ended_by = 'max_duration'
+                break
+    except Exception as e:
+        # Usually the camera dropping the connection; frames already queued still count
+        logger.warning(f"Stream from camera {camera_id} interrupted: {e}")
+        ended_by = 'disconnect'
+
+    summary = stream.finish(Config.STREAM_DRAIN_TIMEOUT)
+    logger.info(f"Stream from camera {camera_id} ended ({ended_by}): "
+                f"{summary['frames_processed']}/{summary['frames_received']} frames processed, "
+                f"{summary['frames_dropped']} dropped")
+    return jsonify({
+        'success': True,
+        'message': f"Stream ended ({ended_by}).",
+        'camera_id': camera_id,
+        'status': status,
+        'sample_fps': sample_fps,
+        'ended_by': ended_by,
+        **summary,
+        'results': stream.results()
+    }), 200
 
 @history_bp.route('/history', methods=['GET'])
 def get_all_history():
+    try:
+        filters = parse_history_filters(request.args)
+        fields = parse_fields(request.args.get('fields'))
+        cursor_arg = request.args.get('cursor')
+        after = decode_cursor(cursor_arg) if cursor_arg else None
+        limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        limit = min(limit, Config.HISTORY_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
     try:
         with get_db_connection() as (db, cursor):
-            sql = """
-                SELECT h.subject, h.plate, h.description, h.date, h.image_id
-                FROM history h
-                ORDER BY h.date DESC
-            """
-            cursor.execute(sql)
+            # One extra row tells us whether another page exists
+            sql, params = build_history_query(filters, fields, cursor=after, limit=limit + 1)
+            cursor.execute(sql, params)
             rows = cursor.fetchall()
-            history_list = []
-            for row in rows:
-                history_list.append({
-                    'subject': row['subject'],
-                    'plate': row['plate'],
-                    'description': row['description'],
-                    'date': row['date'],
-                    'image_id': row.get('image_id')
-                })
-            return jsonify({'success': True, 'message': 'History retrieved', 'data': history_list}), 200
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['date'], rows[-1]['history_id']) if has_more else None
+        history_list = [{field: row[field] for field in fields} for row in rows]
+        return jsonify({
+            'success': True,
+            'message': 'History retrieved',
+            'data': history_list,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        }), 200
     except Exception as e:
         logger.error(f"History error: {e}")
         return jsonify({'success': False, 'message': 'Error fetching history'}), 500
 
+def _export_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def _stream_history_rows(filters, fields):
+    """Yield lists of rows from an unbuffered cursor, one fetchmany() at a time."""
+    with get_db_connection() as (db, cursor):
+        sql, params = build_history_query(filters, fields)
+        cursor.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(Config.HISTORY_EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                yield rows
+        except GeneratorExit:
+            # Client went away. Closing the connection would still read every
+            # remaining row off the wire, so stop the query on the server first;
+            # get_db_connection() then discards the connection.
+            logger.info("History export aborted by client")
+            try:
+                kill_running_query(db)
+            except Exception as e:
+                logger.warning(f"Could not stop aborted history export query: {e}")
+            raise
+
+def _encode_ndjson(batches, fields):
+    for rows in batches:
+        yield "".join(
+            json.dumps({field: _export_value(row[field]) for field in fields}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode('utf-8')
+
+def _encode_csv(batches, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([_export_value(row[field]) for field in fields])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@history_bp.route('/history/export', methods=['GET'])
+def export_history():
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'message': 'format must be ndjson or csv'}), 400
+
+    try:
+        filters = parse_history_filters(request.args)
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    encoder = _encode_csv if export_format == 'csv' else _encode_ndjson
+    body = encoder(_stream_history_rows(filters, fields), fields)
+
+    filename = f"history_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if use_gzip:
+        body = _gzip_stream(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @history_bp.route('/get_image/<int:image_id>', methods=['GET'])
 def serve_image_by_id(image_id):
-    logger.info(f"Image request received for ID: {image_id}")
+    try:
+        variant = parse_variant_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
     try:
         with get_db_connection() as (db, cursor):
-            cursor.execute("SELECT image_data, file_type FROM images WHERE image_id = %s", (image_id,))
+            cursor.execute(f"SELECT {IMAGE_META_COLUMNS} FROM images WHERE image_id = %s", (image_id,))
             result = cursor.fetchone()
-            if result:
-                logger.info(f"Fetched image data for ID {image_id}: keys={list(result.keys())}")
-            else:
-                logger.warning(f"No image found in DB for ID {image_id}")
-
 
             if not result:
                 logger.warning(f"No result found for image_id={image_id}")
                 return jsonify({'success': False, 'message': 'Image not found'}), 404
 
-            image_data = result['image_data']
-            file_type = result['file_type']
-
-            if not image_data:
-                logger.warning(f"Empty image_data for image_id={image_id}")
-                return jsonify({'success': False, 'message': 'Image data missing'}), 404
-
-            return Response(
-                image_data,
-                mimetype=file_type or 'image/jpeg',
-                headers={
-                    'Cache-Control': 'no-cache',
-                    'Content-Length': str(len(image_data))
-                }
-            )
+            def fetch_blob():
+                cursor.execute("SELECT image_data FROM images WHERE image_id = %s", (image_id,))
+                row = cursor.fetchone()
+                return row['image_data'] if row else None
+
+            if variant is None:
+                response = build_image_response(result, fetch_blob)
+            else:
+                response = build_variant_response(result, fetch_blob, variant)
+
+        if response is None:
+            logger.warning(f"Empty image_data for image_id={image_id}")
+            return jsonify({'success': False, 'message': 'Image data missing'}), 404
+        return response
     except Exception as e:
         logger.error(f"Error serving image by ID: {e}")
         return jsonify({'success': False, 'message': 'Internal server error'}), 500
@@ -171,50 +724,98 @@ def serve_image_by_id(image_id):
 @history_bp.route('/fetch_img', methods=['GET'])
 def fetch_image():
     try:
-        logger.info("Starting fetch_image request")
-        with get_db_connection() as (db, cursor):
-            logger.info("Database connection established")
-            sql = "SELECT image_data, upload_date, file_type FROM images ORDER BY upload_date DESC LIMIT 1"
-            cursor.execute(sql)
-            logger.info("SQL query executed")
-            result = cursor.fetchone()
-            logger.info(f"Query result type: {type(result)}")
-            
-            if not result:
-                logger.warning("No images found in database")
-                return jsonify({'success': False, 'message': 'No images found in database'}), 404
-            
-            logger.info(f"Result keys: {list(result.keys())}")
-            image_data = result['image_data']  # Access as dictionary key, not index
-            logger.info(f"Image data type: {type(image_data)}, length: {len(image_data) if image_data else 'None'}")
-            
-            file_type = result.get('file_type', 'image/jpeg')  # Get file_type with default
-            logger.info(f"File type: {file_type}")
-            
-            if not image_data:
-                logger.warning("Image data is empty")
-                return jsonify({'success': False, 'message': 'Image data is empty'}), 404
-            
-            logger.info("Creating response")
-            response = Response(
-                image_data,
-                mimetype=file_type,
-                headers={
-                    'Content-Type': file_type,
-                    'Content-Length': str(len(image_data)),
-                    'Cache-Control': 'no-cache'
-                }
-            )
-            logger.info("Response created successfully")
-            return response
-            
+        latest = get_latest_image()
     except Exception as e:
         logger.error(f"Error in fetch_image: {e}")
-        logger.error(f"Error type: {type(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
         return jsonify({'success': False, 'message': f'Error fetching image: {str(e)}'}), 500
 
+    if latest is None:
+        logger.warning("No images found in database")
+        return jsonify({'success': False, 'message': 'No images found in database'}), 404
+    return build_latest_image_response(latest)
+
+@history_bp.route('/events', methods=['GET'])
+def event_stream():
+    """Server-Sent Events: one ``history`` event per new history row.
+
+    Reconnects replay from ``Last-Event-ID`` (or ?last_event_id=). Each
+    stream holds a request thread, so a worker serves at most
+    EVENTS_MAX_CLIENTS_PER_WORKER of them and ends each after
+    EVENTS_MAX_SECONDS; EventSource reconnects without losing events.
+    """
+    broadcaster = get_event_broadcaster()
+    if broadcaster is None:
+        return jsonify({'success': False, 'message': 'Event push is disabled'}), 503
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    try:
+        subscriber = broadcaster.subscribe(Config.EVENTS_CLIENT_BUFFER, Config.EVENTS_MAX_CLIENTS_PER_WORKER)
+    except Exception as e:
+        logger.error(f"Could not open event stream: {e}")
+        return jsonify({'success': False, 'message': 'Error opening event stream'}), 500
+    if subscriber is None:
+        response = jsonify({'success': False, 'message': 'Too many event streams on this worker; retry later.'})
+        response.headers['Retry-After'] = str(max(1, Config.EVENTS_RETRY_MS // 1000))
+        return response, 503
+
+    body = sse_stream(broadcaster, subscriber, last_event_id, Config.EVENTS_MAX_SECONDS)
+    response = Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # nginx would otherwise buffer the stream
+        'X-Accel-Buffering': 'no',
+    })
+    # Also covers a client that leaves before the generator's first chunk
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscriber))
+    return response
+
+@history_bp.route('/plates/search', methods=['GET'])
+def search_plate_index():
+    """Plates within ``max_distance`` OCR edits of ``q``, closest first, with their latest rows."""
+    if not Config.PLATE_SEARCH_ENABLED:
+        return jsonify({'success': False, 'message': 'Plate search is disabled'}), 503
+    try:
+        query = normalize_plate(request.args.get('q'))
+        if not query:
+            raise ValueError('q must contain letters or digits')
+        limit = int(request.args.get('limit', Config.PLATE_SEARCH_LIMIT))
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        limit = min(limit, Config.PLATE_SEARCH_MAX_LIMIT)
+        max_distance = float(request.args.get('max_distance', Config.PLATE_SEARCH_MAX_DISTANCE))
+        if not 0 <= max_distance <= 3:
+            raise ValueError('max_distance must be between 0 and 3')
+        events_per_plate = int(request.args.get('events', Config.PLATE_SEARCH_EVENTS_PER_PLATE))
+        if not 1 <= events_per_plate <= Config.HISTORY_MAX_PAGE_SIZE:
+            raise ValueError(f'events must be between 1 and {Config.HISTORY_MAX_PAGE_SIZE}')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    index = get_plate_index()
+    if index is None:
+        start_plate_index()
+        response = jsonify({'success': False, 'message': 'Plate index is still being built; retry shortly.'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    try:
+        index.refresh()
+    except Exception as e:
+        # Searching a slightly stale index beats failing the request
+        logger.warning(f"Plate index refresh failed: {e}")
+
+    try:
+        results = search_plates(index, query, max_distance, limit, events_per_plate)
+    except Exception as e:
+        logger.error(f"Plate search error: {e}")
+        return jsonify({'success': False, 'message': 'Error searching plates'}), 500
+    return jsonify({
+        'success': True,
+        'message': f'{len(results)} matching plates',
+        'query': query,
+        'max_distance': max_distance,
+        'data': results,
+    }), 200
+
 @history_bp.route('/cleanup_images', methods=['POST'])
 def cleanup_images():
     try:
@@ -1,4 +1,16 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+
+try:
+    from ..utils.database import get_pool_stats
+    from ..services.password_hasher import get_password_hasher_stats
+    from ..services.metrics import render_metrics
+except ImportError:
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from utils import get_pool_stats
+    from app.services.password_hasher import get_password_hasher_stats
+    from app.services.metrics import render_metrics
 
 main_bp = Blueprint('main', __name__)
 
@@ -19,4 +31,89 @@ def health_check():
             'auth': '/auth/*',
             'api': '/api/*'
         }
-    })
\ No newline at end of file
+    })
+
+@main_bp.route('/health/ready')
+def readiness_check():
+    """Readiness: 200 only once this worker's models are loaded and warmed up.
+
+    /health stays a pure liveness check so a slow model load never gets the
+    worker killed, while load balancers hold traffic until this returns 200.
+    """
+    try:
+        from ..services.ocr_service import get_model_status, start_model_warmup
+        start_model_warmup()
+        models = get_model_status()
+    except ImportError as e:
+        models = {'state': 'unavailable', 'error': str(e), 'ready': False}
+
+    return jsonify({
+        'status': 'ready' if models['ready'] else 'not_ready',
+        'service': 'carwatch-backend',
+        'models': models
+    }), 200 if models['ready'] else 503
+
+@main_bp.route('/stats')
+def runtime_stats():
+    """Per-worker runtime metrics (each gunicorn worker reports its own)."""
+    try:
+        from ..services.inference_scheduler import get_scheduler_stats
+        from ..services.inference_pool import get_pool_client_stats
+        from ..services.plate_cache import get_plate_cache_stats
+        from ..services.frame_gate import get_frame_gate_stats
+        from ..services.stream_ingest import get_stream_stats
+        from ..services.latest_image import get_latest_image_cache_stats
+        from ..services.events import get_event_stats
+        from ..services.plate_search import get_plate_search_stats
+        inference_stats = get_scheduler_stats()
+        pool_stats = get_pool_client_stats()
+        plate_cache_stats = get_plate_cache_stats()
+        frame_gate_stats = get_frame_gate_stats()
+        stream_stats = get_stream_stats()
+        latest_image_stats = get_latest_image_cache_stats()
+        event_stats = get_event_stats()
+        plate_search_stats = get_plate_search_stats()
+    except ImportError:
+        inference_stats = {}
+        pool_stats = {}
+        plate_cache_stats = {}
+        frame_gate_stats = {}
+        stream_stats = {}
+        latest_image_stats = {}
+        event_stats = {}
+        plate_search_stats = {}
+
+    try:
+        # Only populated when serving through asgi.py (aiomysql is optional)
+        from ..utils.async_database import get_async_pool_stats
+        async_db_stats = get_async_pool_stats()
+    except ImportError:
+        async_db_stats = {}
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'db_pool': get_pool_stats(),
+            'async_db_pool': async_db_stats,
+            'inference': inference_stats,
+            'inference_pool': pool_stats,
+            'plate_cache': plate_cache_stats,
+            'frame_gate': frame_gate_stats,
+            'stream_ingest': stream_stats,
+            'latest_image': latest_image_stats,
+            'events': event_stats,
+            'plate_search': plate_search_stats,
+            'password_hasher': get_password_hasher_stats()
+        }
+    })
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text format, summed over every gunicorn worker (unlike /stats)."""
+    body, content_type = render_metrics()
+    if body is None:
+        return jsonify({
+            'success': False,
+            'message': 'Metrics are disabled (METRICS_ENABLED=False or prometheus_client not installed)'
+        }), 503
+    return Response(body, content_type=content_type)
@@ -1,8 +1,23 @@
-from .ocr_service import detect_and_crop_plate, recognize_characters_with_yolo
-from .db_upload import db_upload_image
+import importlib
 
-__all__ = [
-    'detect_and_crop_plate', 
-    'recognize_characters_with_yolo',
-    'db_upload_image'
-]
+# Submodules are imported on first attribute access so that lightweight
+# tools (e.g. scripts/migrate_image_blobs.py) do not pull in torch and the
+# YOLO models just by importing a sibling module.
+_EXPORTS = {
+    'detect_and_crop_plate': '.ocr_service',
+    'recognize_characters_with_yolo': '.ocr_service',
+    'detect_and_crop_plates_batch': '.ocr_service',
+    'recognize_characters_batch': '.ocr_service',
+    'detect_plates': '.ocr_service',
+    'read_plates': '.ocr_service',
+    'db_upload_image': '.db_upload',
+    'store_uploaded_image': '.db_upload',
+    'prepare_image_data': '.db_upload',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+
+try:
+    from ..utils.database import get_db_connection
+    from .image_store import get_image_store
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.utils.database import get_db_connection
+    from app.services.image_store import get_image_store
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_blobs(batch_size=100, sleep_seconds=0.5, max_batches=None, dry_run=False):
+    """Move legacy images.image_data BLOBs into the configured image store.
+
+    Works in small id-ordered batches with a pause in between so it can run
+    next to live traffic. Each row is only cleared if it is still unmigrated,
+    so the job is safe to stop and restart at any point.
+    """
+    store = get_image_store()
+    if store is None:
+        return {'success': False, 'message': 'IMAGE_STORE_BACKEND is blob; nothing to migrate to', 'migrated': 0}
+
+    last_id = 0
+    migrated = 0
+    bytes_moved = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with get_db_connection() as (db, cursor):
+            cursor.execute(
+                """SELECT image_id, image_data FROM images
+                   WHERE image_id > %s AND storage_key IS NULL AND image_data IS NOT NULL
+                   ORDER BY image_id
+                   LIMIT %s""",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for row in rows:
+                last_id = row['image_id']
+                if dry_run:
+                    continue
+                key = store.put(row['image_data'])
+                cursor.execute(
+                    """UPDATE images SET storage_key = %s, storage_backend = %s, image_data = NULL
+                       WHERE image_id = %s AND storage_key IS NULL""",
+                    (key, store.name, row['image_id'])
+                )
+                migrated += cursor.rowcount
+                bytes_moved += len(row['image_data'])
+            db.commit()
+
+        batches += 1
+        logger.info(f"Blob migration batch {batches}: up to image_id {last_id}, {migrated} row(s) moved so far")
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    return {
+        'success': True,
+        'message': f'Moved {migrated} image(s) ({bytes_moved} bytes) to the {store.name} store',
+        'migrated': migrated,
+        'bytes_moved': bytes_moved,
+        'last_image_id': last_id,
+        'batches': batches
+    }
+
+
+def prune_orphans(grace_seconds=3600, batch_size=500, dry_run=False):
+    """Delete stored files no images row references any more.
+
+    clear_old_data() removes rows but cannot touch the filesystem, so this
+    reclaims their space. Files newer than ``grace_seconds`` are skipped so
+    uploads whose row is not committed yet are never removed.
+    """
+    store = get_image_store()
+    if store is None:
+        return {'success': False, 'message': 'IMAGE_STORE_BACKEND is blob; nothing to prune', 'removed': 0}
+
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    checked = 0
+
+    def _flush(candidates):
+        nonlocal removed
+        placeholders = ", ".join(["%s"] * len(candidates))
+        with get_db_connection() as (db, cursor):
+            cursor.execute(
+                f"SELECT DISTINCT storage_key FROM images WHERE storage_key IN ({placeholders})",
+                tuple(candidates)
+            )
+            referenced = {row['storage_key'] for row in cursor.fetchall()}
+        for key in candidates:
+            if key not in referenced:
+                if not dry_run:
+                    store.delete(key)
+                removed += 1
+
+    candidates = []
+    for key, mtime in store.keys():
+        if mtime > cutoff:
+            continue
+        checked += 1
+        candidates.append(key)
+        if len(candidates) >= batch_size:
+            _flush(candidates)
+            candidates = []
+    if candidates:
+        _flush(candidates)
+
+    return {
+        'success': True,
+        'message': f'Removed {removed} unreferenced file(s) out of {checked} checked',
+        'removed': removed,
+        'checked': checked
+    }
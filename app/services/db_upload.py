@@ -1,55 +1,94 @@
 import logging
 import os
 import mysql.connector
-from PIL import Image
-import io
+import cv2
+import numpy as np
 from datetime import datetime
 
 try:
     from ..utils.database import get_db_connection
+    from .image_store import store_image_bytes
+    from .thumbnails import precompute_thumbnail
+    from .metrics import observe_stage
+    from .latest_image import publish_latest_image
 except ImportError:
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     from app.utils.database import get_db_connection
+    from app.services.image_store import store_image_bytes
+    from app.services.thumbnails import precompute_thumbnail
+    from app.services.metrics import observe_stage
+    from app.services.latest_image import publish_latest_image
 
 logger = logging.getLogger(__name__)
 
-def db_upload_image(image_filename):
-    try:
-        image_path = os.path.join("uploads", image_filename)
-        
-        if not os.path.exists(image_path):
-            return {'success': False, 'message': 'Image file not found'}
+MAX_IMAGE_SIZE = 16 * 1024 * 1024
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+JPEG_QUALITY = 95
 
-        with Image.open(image_path) as img:
-            if img.mode in ('RGBA', 'P', 'LA'):
-                img = img.convert('RGB')
-                format_type = 'JPEG'
-            else:
-                format_type = img.format if img.format else 'PNG'
+def is_jpeg(image_bytes):
+    return image_bytes[:3] == JPEG_SIGNATURE
 
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format=format_type)
-            img_data = img_buffer.getvalue()
+def prepare_image_data(image_bytes, image_filename, image_np=None):
+    """Bytes to store for an upload, without any disk round-trip.
 
-        file_size = len(img_data)
-        file_extension = os.path.splitext(image_filename)[1].lower()
+    JPEG uploads are stored verbatim. Anything else is encoded to JPEG from
+    ``image_np`` (the BGR array the caller already decoded for detection), so
+    the upload is decoded at most once. Returns (img_data, file_size,
+    file_extension, format_type) and raises ValueError when the image is too
+    large or cannot be decoded.
+    """
+    if is_jpeg(image_bytes):
+        img_data = image_bytes
+        format_type = 'JPEG'
+        file_extension = os.path.splitext(image_filename)[1].lower() or '.jpg'
+    else:
+        if image_np is None:
+            image_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if image_np is None:
+                raise ValueError('Could not decode image.')
+        ok, encoded = cv2.imencode('.jpg', image_np, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise ValueError('Could not encode image as JPEG.')
+        img_data = encoded.tobytes()
+        format_type = 'JPEG'
+        file_extension = '.jpg'
 
-        if file_size > 16 * 1024 * 1024:
-            return {'success': False, 'message': 'Image file too large (max 16MB)'}
+    file_size = len(img_data)
+    if file_size > MAX_IMAGE_SIZE:
+        raise ValueError('Image file too large (max 16MB)')
 
+    return img_data, file_size, file_extension, format_type
+
+def store_uploaded_image(image_bytes, image_filename, image_np=None):
+    """Store an in-memory upload in the image store and the images table."""
+    try:
         try:
-            with get_db_connection() as (db, cursor):
+            with observe_stage('image_encode'):
+                img_data, file_size, file_extension, format_type = prepare_image_data(
+                    image_bytes, image_filename, image_np
+                )
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+
+        try:
+            with observe_stage('image_write'):
+                blob_data, storage_key, storage_backend = store_image_bytes(img_data)
+            with observe_stage('image_insert'), get_db_connection() as (db, cursor):
                 sql_insert = """INSERT INTO images 
-                                (filename, image_data, file_size, file_type, upload_date) 
-                                VALUES (%s, %s, %s, %s, %s)"""
-                values = (image_filename, img_data, file_size, file_extension, datetime.now())
+                                (filename, image_data, storage_key, storage_backend, file_size, file_type, upload_date) 
+                                VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+                upload_date = datetime.now()
+                values = (image_filename, blob_data, storage_key, storage_backend,
+                          file_size, file_extension, upload_date)
                 
                 cursor.execute(sql_insert, values)
                 db.commit()
 
                 logger.info(f"Uploaded {image_filename} as {format_type} ({file_size} bytes)")
                 image_id = cursor.lastrowid
+                publish_latest_image(image_id, img_data, file_extension, storage_key, upload_date)
+                precompute_thumbnail(storage_key, img_data)
                 return {
                     'success': True,
                     'message': f'Image uploaded successfully as {format_type}',
@@ -64,4 +103,55 @@ def db_upload_image(image_filename):
 
     except Exception as e:
         logger.error(f"Error uploading {image_filename}: {e}")
-        return {'success': False, 'message': f'Upload failed: {str(e)}'}
\ No newline at end of file
+        return {'success': False, 'message': f'Upload failed: {str(e)}'}
+
+def db_upload_image(image_filename):
+    """Upload a file from uploads/; kept for callers that still stage files on disk."""
+    image_path = os.path.join("uploads", image_filename)
+    if not os.path.exists(image_path):
+        return {'success': False, 'message': 'Image file not found'}
+
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    return store_uploaded_image(image_bytes, image_filename)
+
+def insert_images_batch(cursor, prepared):
+    """Insert prepared images with one multi-row INSERT on the caller's transaction.
+
+    ``prepared`` is a list of (filename, img_data, file_size, file_extension)
+    tuples with unique filenames. Returns the new image_id for each entry,
+    in order. The caller is responsible for committing.
+    """
+    if not prepared:
+        return []
+
+    upload_date = datetime.now()
+    rows = []
+    for filename, img_data, file_size, file_extension in prepared:
+        blob_data, storage_key, storage_backend = store_image_bytes(img_data)
+        rows.append((filename, blob_data, storage_key, storage_backend, file_size, file_extension, upload_date))
+        precompute_thumbnail(storage_key, img_data)
+
+    sql_insert = """INSERT INTO images 
+                    (filename, image_data, storage_key, storage_backend, file_size, file_type, upload_date) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+    cursor.executemany(sql_insert, rows)
+
+    # lastrowid is the first id of the multi-row insert; the PK range keeps the
+    # filename lookup from scanning the whole table.
+    first_id = cursor.lastrowid
+    filenames = [item[0] for item in prepared]
+    placeholders = ", ".join(["%s"] * len(filenames))
+    cursor.execute(
+        f"SELECT image_id, filename FROM images WHERE image_id >= %s AND filename IN ({placeholders})",
+        (first_id, *filenames)
+    )
+    ids_by_name = {row['filename']: row['image_id'] for row in cursor.fetchall()}
+    if len(ids_by_name) < len(filenames):
+        # Connector fell back to row-by-row inserts, so lastrowid is the last id
+        cursor.execute(
+            f"SELECT image_id, filename FROM images WHERE filename IN ({placeholders})",
+            tuple(filenames)
+        )
+        ids_by_name = {row['filename']: row['image_id'] for row in cursor.fetchall()}
+    return [ids_by_name.get(filename) for filename in filenames]
@@ -0,0 +1,408 @@
+"""Push of new history rows to dashboards (/api/events).
+
+The history table is the event log and history_id is the event id, so
+replay after a reconnect (``Last-Event-ID``) is a primary-key range scan
+and survives restarts. Each worker runs one broadcaster thread, only
+while it has subscribers:
+
+- Code that commits history rows calls publish_history_event(). That wakes
+  the local broadcaster and replaces the signal file (EVENTS_SIGNAL_FILE),
+  which the plate search index (plate_search.py) watches as well.
+- Every broadcaster stats the signal file every EVENTS_SIGNAL_CHECK_INTERVAL.
+  When it changes, or at least every EVENTS_POLL_INTERVAL, it reads
+  ``history_id > floor`` and fans the new rows out to its subscribers.
+
+Rows that change after they were sent (a queued OCR job filling in the
+plate, a frame fused into an open plate event) go out again as
+``history_update`` events. Each broadcaster remembers what it sent for the
+last EVENTS_UPDATE_WINDOW rows and re-reads that id range on every poll.
+
+Rows can commit out of id order (two uploads in flight). The floor only
+moves past a missing id once EVENTS_GAP_SECONDS have passed, and ids
+already sent are remembered, so a late commit is still delivered once.
+
+Each subscriber has a bounded buffer. A client too slow to keep up is not
+allowed to grow it: the buffer is dropped and the stream catches up from
+the database at the last id it delivered.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    from ..config import Config
+    from ..utils.database import get_db_connection
+    from ..utils.signal_file import default_signal_path, send_signal, signal_state
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import get_db_connection
+    from app.utils.signal_file import default_signal_path, send_signal, signal_state
+
+logger = logging.getLogger(__name__)
+
+EVENT_COLUMNS = "history_id, plate, subject, image_id, date"
+SINCE_SQL = f"SELECT {EVENT_COLUMNS} FROM history WHERE history_id > %s ORDER BY history_id LIMIT %s"
+MAX_ID_SQL = "SELECT MAX(history_id) AS history_id FROM history"
+RANGE_SQL = f"SELECT {EVENT_COLUMNS} FROM history WHERE history_id BETWEEN %s AND %s"
+POLL_BATCH = 500
+
+
+def history_signal_path():
+    return Config.EVENTS_SIGNAL_FILE or default_signal_path('carwatch-events')
+
+
+class HistoryUpdate(dict):
+    """Payload of a row that changed after it was sent (``event: history_update``)."""
+
+
+def event_payload(row):
+    date = row.get('date')
+    return {
+        'history_id': row['history_id'],
+        'plate': row.get('plate') or "",
+        'subject': row.get('subject'),
+        'image_id': row.get('image_id'),
+        'date': date.isoformat() if hasattr(date, 'isoformat') else date,
+    }
+
+
+def format_sse(event):
+    data = json.dumps(event, separators=(',', ':'))
+    if isinstance(event, HistoryUpdate):
+        # No id: an update must not move the client's Last-Event-ID back
+        return f"event: history_update\ndata: {data}\n\n"
+    return f"id: {event['history_id']}\nevent: history\ndata: {data}\n\n"
+
+
+def format_sse_reset(after_id):
+    """Tells a client that replay was cut at EVENTS_REPLAY_LIMIT; it should reload /api/history."""
+    return f"event: reset\ndata: {json.dumps({'after_id': after_id})}\n\n"
+
+
+def parse_last_event_id(value):
+    """Last-Event-ID header (or ?last_event_id=) as an int, None when absent or invalid."""
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+class Subscriber:
+    """One connected client: a bounded buffer filled by the broadcaster thread.
+
+    ``notify`` is called after every push; without one the subscriber sets
+    its own threading.Event, ``ready``, for a request thread to wait on.
+    """
+
+    def __init__(self, last_id, buffer_size, notify=None):
+        self.last_id = last_id or 0
+        self.buffer_size = buffer_size
+        self.dropped = 0
+        self.ready = None
+        if notify is None:
+            self.ready = threading.Event()
+            notify = self.ready.set
+        self._notify = notify
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._lagged = False
+        self._recent = deque()
+        self._recent_ids = set()
+
+    def push(self, events):
+        with self._lock:
+            if not self._lagged:
+                self._buffer.extend(events)
+                if len(self._buffer) > self.buffer_size:
+                    # Too slow; catch up from the database instead of growing
+                    self.dropped += len(self._buffer)
+                    self._buffer.clear()
+                    self._lagged = True
+        self._notify()
+
+    def take(self):
+        """(buffered events, lagged). When lagged, replay from last_id before continuing."""
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            lagged, self._lagged = self._lagged, False
+        return events, lagged
+
+    def accept(self, event):
+        """True the first time an event id is seen, so replay and live delivery never repeat one.
+
+        Updates pass for rows this client already has; newer rows reach it
+        with their current values anyway.
+        """
+        history_id = event['history_id']
+        if isinstance(event, HistoryUpdate):
+            return history_id <= self.last_id
+        if history_id in self._recent_ids:
+            return False
+        self._recent.append(history_id)
+        self._recent_ids.add(history_id)
+        while len(self._recent) > self.buffer_size * 4:
+            self._recent_ids.discard(self._recent.popleft())
+        self.last_id = max(self.last_id, history_id)
+        return True
+
+
+class EventBroadcaster:
+    """Polls new history rows for this worker's subscribers (see the module docstring)."""
+
+    def __init__(self, signal_file, signal_check_interval=0.1, poll_interval=2.0, gap_seconds=5.0, update_window=200):
+        self.signal_file = signal_file
+        self.signal_check_interval = signal_check_interval
+        self.poll_interval = poll_interval
+        self.gap_seconds = gap_seconds
+        self.update_window = update_window
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._floor = None
+        self._seen = set()
+        self._gap_since = None
+        self._sent = OrderedDict()
+        self.clients_total = 0
+        self.rejected = 0
+        self.polls = 0
+        self.events = 0
+        self.updates = 0
+        self.dropped = 0
+        self.errors = 0
+        self.signals_sent = 0
+
+    def subscribe(self, buffer_size, max_clients, notify=None):
+        """A Subscriber starting at the current end of history, or None at max_clients."""
+        with self._lock:
+            if len(self._subscribers) >= max_clients:
+                self.rejected += 1
+                return None
+            if self._floor is None:
+                self._start_floor()
+            subscriber = Subscriber(self._floor, buffer_size, notify)
+            self._subscribers.add(subscriber)
+            self.clients_total += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='events-broadcaster', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+                self.dropped += subscriber.dropped
+
+    def signal(self):
+        self._wake.set()
+        if send_signal(self.signal_file, time.time()):
+            with self._lock:
+                self.signals_sent += 1
+
+    def _start_floor(self):
+        """Start at the current end of history, watching the rows just before it for updates."""
+        with get_db_connection() as (db, cursor):
+            cursor.execute(MAX_ID_SQL)
+            row = cursor.fetchone()
+            floor = (row['history_id'] if row else None) or 0
+            cursor.execute(RANGE_SQL, (floor - self.update_window + 1, floor))
+            rows = cursor.fetchall()
+        self._floor, self._seen, self._gap_since = floor, set(), None
+        self._sent.clear()
+        self._remember(sorted((event_payload(row) for row in rows), key=lambda event: event['history_id']))
+
+    def _remember(self, events):
+        """Note what was sent for each row (caller holds the lock), keeping the last update_window."""
+        for event in events:
+            self._sent[event['history_id']] = (event['plate'], event['image_id'])
+            self._sent.move_to_end(event['history_id'])
+        while len(self._sent) > self.update_window:
+            self._sent.popitem(last=False)
+
+    def _run(self):
+        last_signal = signal_state(self.signal_file)
+        last_poll = 0.0
+        while True:
+            with self._lock:
+                active = bool(self._subscribers)
+                if not active:
+                    self._floor = None
+            # Idle workers sleep until the next subscribe()
+            woke = self._wake.wait(self.signal_check_interval if active else None)
+            self._wake.clear()
+            if not active:
+                continue
+
+            state = signal_state(self.signal_file)
+            if not (woke or state != last_signal or time.monotonic() - last_poll >= self.poll_interval):
+                continue
+            last_signal, last_poll = state, time.monotonic()
+            try:
+                if self._poll():
+                    self._wake.set()  # a full batch; there may be more
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.warning(f"Event poll failed: {e}")
+                time.sleep(self.poll_interval)
+
+    def _poll(self):
+        with self._lock:
+            floor = self._floor
+            watched = (min(self._sent), max(self._sent)) if self._sent else None
+        if floor is None:
+            return False
+        with get_db_connection() as (db, cursor):
+            cursor.execute(SINCE_SQL, (floor, POLL_BATCH))
+            rows = cursor.fetchall()
+            current = []
+            if watched is not None:
+                cursor.execute(RANGE_SQL, watched)
+                current = cursor.fetchall()
+
+        with self._lock:
+            self.polls += 1
+            if self._floor != floor:
+                return False  # everyone left and came back while we were querying
+            fresh = [event_payload(row) for row in rows if row['history_id'] not in self._seen]
+            self._seen.update(event['history_id'] for event in fresh)
+            updates = []
+            for row in current:
+                event = HistoryUpdate(event_payload(row))
+                sent = self._sent.get(event['history_id'])
+                if sent is not None and sent != (event['plate'], event['image_id']):
+                    updates.append(event)
+            self._remember(fresh + updates)
+            self._advance_floor()
+            subscribers = list(self._subscribers)
+            self.events += len(fresh)
+            self.updates += len(updates)
+
+        if fresh or updates:
+            for subscriber in subscribers:
+                subscriber.push(fresh + updates)
+        return len(rows) == POLL_BATCH
+
+    def _advance_floor(self):
+        """Move the floor over contiguous seen ids; skip a missing id after gap_seconds."""
+        while self._seen:
+            following = self._floor + 1
+            if following in self._seen:
+                self._seen.discard(following)
+                self._floor, self._gap_since = following, None
+                continue
+            now = time.monotonic()
+            if self._gap_since is None:
+                self._gap_since = now
+            elif now - self._gap_since >= self.gap_seconds:
+                # Rolled back, deleted or from auto_increment_increment > 1
+                self._floor, self._gap_since = min(self._seen) - 1, None
+                continue
+            break
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._subscribers),
+                'clients_total': self.clients_total,
+                'rejected': self.rejected,
+                'floor_history_id': self._floor,
+                'polls': self.polls,
+                'events': self.events,
+                'updates': self.updates,
+                'dropped_to_replay': self.dropped + sum(s.dropped for s in self._subscribers),
+                'errors': self.errors,
+                'signals_sent': self.signals_sent,
+                'signal_file': self.signal_file,
+            }
+
+
+_broadcaster = None
+_broadcaster_pid = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_event_broadcaster():
+    """This process's broadcaster, or None when EVENTS_ENABLED is off."""
+    global _broadcaster, _broadcaster_pid
+    if not Config.EVENTS_ENABLED:
+        return None
+    pid = os.getpid()
+    if _broadcaster_pid != pid:
+        with _broadcaster_lock:
+            if _broadcaster_pid != pid:
+                _broadcaster = EventBroadcaster(
+                    history_signal_path(),
+                    signal_check_interval=Config.EVENTS_SIGNAL_CHECK_INTERVAL,
+                    poll_interval=Config.EVENTS_POLL_INTERVAL,
+                    gap_seconds=Config.EVENTS_GAP_SECONDS,
+                    update_window=Config.EVENTS_UPDATE_WINDOW,
+                )
+                _broadcaster_pid = pid
+    return _broadcaster
+
+
+def get_event_stats():
+    if _broadcaster is None or _broadcaster_pid != os.getpid():
+        return {}
+    stats = _broadcaster.stats()
+    return stats if stats['clients_total'] or stats['signals_sent'] else {}
+
+
+def publish_history_event():
+    """Call after history rows are inserted or updated so every worker's subscribers (and plate index) hear about them."""
+    broadcaster = get_event_broadcaster()
+    if broadcaster is not None:
+        broadcaster.signal()
+    elif Config.PLATE_SEARCH_ENABLED:
+        send_signal(history_signal_path(), time.time())
+
+
+def replay_events(after_id, limit):
+    """Committed history rows after ``after_id`` as event payloads, oldest first."""
+    with get_db_connection() as (db, cursor):
+        cursor.execute(SINCE_SQL, (after_id, limit))
+        return [event_payload(row) for row in cursor.fetchall()]
+
+
+def sse_stream(broadcaster, subscriber, last_event_id, max_seconds):
+    """text/event-stream body for a WSGI request thread; ends after max_seconds (0 = never).
+
+    The client's EventSource reconnects on its own and sends Last-Event-ID,
+    so ending the stream only frees the thread; no event is lost.
+    """
+    try:
+        yield f"retry: {Config.EVENTS_RETRY_MS}\n\n"
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        pending_replay = last_event_id
+        while deadline is None or time.monotonic() < deadline:
+            if pending_replay is not None:
+                events = replay_events(pending_replay, Config.EVENTS_REPLAY_LIMIT)
+                for event in events:
+                    if subscriber.accept(event):
+                        yield format_sse(event)
+                if len(events) >= Config.EVENTS_REPLAY_LIMIT:
+                    yield format_sse_reset(subscriber.last_id)
+                pending_replay = None
+
+            if not subscriber.ready.wait(Config.EVENTS_HEARTBEAT_SECONDS):
+                yield ": ping\n\n"
+                continue
+            subscriber.ready.clear()
+            events, lagged = subscriber.take()
+            for event in events:
+                if subscriber.accept(event):
+                    yield format_sse(event)
+            if lagged:
+                pending_replay = subscriber.last_id
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
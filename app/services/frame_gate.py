@@ -0,0 +1,184 @@
+"""Cheap per-camera checks that run before plate detection.
+
+Two stages, both configured per camera id:
+
+* ROI: ``CAMERA_ROIS`` maps a camera to the part of the frame where plates
+  can appear (fractions of width/height, or pixels). Detection only sees
+  that region, and boxes are mapped back to full-frame coordinates.
+* Motion: a downscaled, blurred greyscale copy of the ROI is compared with
+  the camera's background: the previous frame by default, or a running
+  average when MOTION_BG_ALPHA < 1. When less than MOTION_MIN_AREA of it
+  changed, nothing new can be in front of the camera, so the previous
+  read for that camera is returned without running LPD/OCR. A full
+  detection is still forced every MOTION_MAX_SKIP_SECONDS.
+
+State lives in the worker process. A camera whose frames are spread over
+several gunicorn workers is gated per worker, so motion gets detected more
+often than strictly needed, never less.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from ..config import Config
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAMERA = 'default'
+
+
+def parse_rois(raw):
+    """``{"gate-1": [x1, y1, x2, y2], ...}``; values <= 1 are fractions of the frame."""
+    if not raw:
+        return {}
+    try:
+        rois = json.loads(raw)
+        return {str(camera): tuple(float(v) for v in bounds) for camera, bounds in rois.items()
+                if len(bounds) == 4}
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Ignoring invalid CAMERA_ROIS: {e}")
+        return {}
+
+
+class FrameGate:
+    def __init__(self, rois, width=160, threshold=25, min_area=0.01, alpha=1.0, max_skip_seconds=30):
+        self.rois = rois
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.alpha = alpha
+        self.max_skip_seconds = max_skip_seconds
+        self._lock = threading.Lock()
+        self._cameras = {}
+        self.frames = 0
+        self.detected = 0
+        self.skipped = 0
+        self.forced = 0
+        self._pixels_total = 0
+        self._pixels_detected = 0
+        self._inference_ms_total = 0.0
+
+    def region(self, camera_id, image_np):
+        """(ROI view of ``image_np``, (x offset, y offset)) for this camera."""
+        bounds = self.rois.get(camera_id or DEFAULT_CAMERA)
+        if bounds is None:
+            return image_np, (0, 0)
+
+        height, width = image_np.shape[:2]
+        scale = (width, height, width, height) if max(bounds) <= 1 else (1, 1, 1, 1)
+        x1, y1, x2, y2 = (int(round(v * s)) for v, s in zip(bounds, scale))
+        x1, x2 = max(0, min(x1, width)), max(0, min(x2, width))
+        y1, y2 = max(0, min(y1, height)), max(0, min(y2, height))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return image_np, (0, 0)
+        return image_np[y1:y2, x1:x2], (x1, y1)
+
+    def _motion_frame(self, region):
+        height, width = region.shape[:2]
+        target_w = min(self.width, width)
+        target_h = max(1, int(round(height * target_w / width)))
+        small = cv2.resize(region, (target_w, target_h), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def check(self, camera_id, region):
+        """Previous plates for this camera when the ROI is static, else None.
+
+        Always None when ``camera_id`` is None (queued OCR jobs and batch
+        uploads), whose order is not guaranteed. Uploads without a
+        ``camera_id`` parameter are gated as camera ``default``.
+        """
+        small = self._motion_frame(region)
+        now = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            self._pixels_total += region.shape[0] * region.shape[1]
+            if camera_id is None:
+                return None
+
+            state = self._cameras.get(camera_id)
+            if state is None or state['background'].shape != small.shape:
+                self._cameras[camera_id] = {
+                    'background': small.astype(np.float32), 'plates': None, 'last_detect': 0.0,
+                }
+                return None
+
+            background = state['background']
+            diff = cv2.absdiff(small, cv2.convertScaleAbs(background))
+            changed = np.count_nonzero(diff > self.threshold) / diff.size
+            cv2.accumulateWeighted(small, background, self.alpha)
+
+            if changed >= self.min_area or state['plates'] is None:
+                return None
+            if now - state['last_detect'] > self.max_skip_seconds:
+                self.forced += 1
+                return None
+
+            self.skipped += 1
+            return [dict(p) for p in state['plates']]
+
+    def record(self, camera_id, region, plates, elapsed_ms):
+        """Remember a full detection's result and cost."""
+        with self._lock:
+            self.detected += 1
+            self._pixels_detected += region.shape[0] * region.shape[1]
+            self._inference_ms_total += elapsed_ms
+            state = self._cameras.get(camera_id)
+            if state is not None:
+                state['plates'] = [dict(p) for p in plates]
+                state['last_detect'] = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            avg_ms = self._inference_ms_total / self.detected if self.detected else 0.0
+            return {
+                'cameras': len(self._cameras),
+                'rois': sorted(self.rois),
+                'frames': self.frames,
+                'detected': self.detected,
+                'skipped_no_motion': self.skipped,
+                'forced_detections': self.forced,
+                'skip_rate': round(self.skipped / self.frames, 4) if self.frames else 0.0,
+                'roi_pixel_fraction': round(self._pixels_detected / self._pixels_total, 4) if self._pixels_total else 1.0,
+                'inference_ms_avg': round(avg_ms, 2),
+                # Inference time the skipped frames would have cost at the current average
+                'estimated_ms_saved': round(self.skipped * avg_ms, 1),
+            }
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_frame_gate():
+    """This process's frame gate, or None when FRAME_GATE_ENABLED is off."""
+    global _gate
+    if not Config.FRAME_GATE_ENABLED:
+        return None
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = FrameGate(
+                    parse_rois(Config.CAMERA_ROIS),
+                    width=Config.MOTION_WIDTH,
+                    threshold=Config.MOTION_THRESHOLD,
+                    min_area=Config.MOTION_MIN_AREA,
+                    alpha=Config.MOTION_BG_ALPHA,
+                    max_skip_seconds=Config.MOTION_MAX_SKIP_SECONDS,
+                )
+    return _gate
+
+
+def get_frame_gate_stats():
+    return _gate.stats() if _gate is not None else {}
@@ -0,0 +1,99 @@
+import base64
+import datetime
+
+# Columns clients may request through ?fields=
+HISTORY_FIELDS = ('history_id', 'subject', 'plate', 'description', 'date', 'image_id', 'user_id')
+DEFAULT_FIELDS = ('subject', 'plate', 'description', 'date', 'image_id')
+
+
+def encode_cursor(date, history_id):
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = f"{date.isoformat()}|{history_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, history_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.datetime.fromisoformat(date_str), int(history_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}, expected ISO 8601 (e.g. 2025-06-26T08:00:00)')
+
+
+def parse_fields(value):
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in HISTORY_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown) or '(none)'}; allowed: {', '.join(HISTORY_FIELDS)}")
+    return fields
+
+
+def parse_history_filters(args):
+    """Validate plate/subject/date/user filters from request args."""
+    filters = {}
+    if args.get('plate'):
+        filters['plate'] = args['plate'].strip()
+    if args.get('subject'):
+        filters['subject'] = args['subject']
+    if args.get('date_from'):
+        filters['date_from'] = _parse_date(args['date_from'], 'date_from')
+    if args.get('date_to'):
+        filters['date_to'] = _parse_date(args['date_to'], 'date_to')
+    if args.get('user_id'):
+        try:
+            filters['user_id'] = int(args['user_id'])
+        except ValueError:
+            raise ValueError('Invalid user_id')
+    return filters
+
+
+def build_history_query(filters, fields, cursor=None, limit=None):
+    """SQL for history rows newest first, continuing after ``cursor``.
+
+    Rows are ordered by (date, history_id) so the keyset is unique and the
+    scan stays on idx_history_keyset no matter how deep the page is. The
+    cursor columns are always selected even if not requested.
+    """
+    columns = list(dict.fromkeys(('date', 'history_id') + tuple(fields)))
+    conditions = []
+    params = []
+
+    if 'plate' in filters:
+        escaped = filters['plate'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("h.plate LIKE %s")
+        params.append(escaped + '%')
+    if 'subject' in filters:
+        conditions.append("h.subject = %s")
+        params.append(filters['subject'])
+    if 'date_from' in filters:
+        conditions.append("h.date >= %s")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        conditions.append("h.date <= %s")
+        params.append(filters['date_to'])
+    if 'user_id' in filters:
+        conditions.append("h.user_id = %s")
+        params.append(filters['user_id'])
+    if cursor is not None:
+        cursor_date, cursor_id = cursor
+        conditions.append("(h.date < %s OR (h.date = %s AND h.history_id < %s))")
+        params.extend([cursor_date, cursor_date, cursor_id])
+
+    sql = f"SELECT {', '.join('h.' + c for c in columns)} FROM history h"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY h.date DESC, h.history_id DESC"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, tuple(params)
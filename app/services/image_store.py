@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+try:
+    from ..config import Config
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Interface for image byte storage; rows in `images` keep only the key."""
+
+    name = None
+
+    def put(self, data):
+        """Store ``data`` and return its key."""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the bytes stored under ``key`` or None if missing."""
+        raise NotImplementedError
+
+    def path(self, key):
+        """Local filesystem path for ``key``, or None if not file-backed."""
+        return None
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def keys(self):
+        """Iterate over (key, mtime) for every stored object."""
+        raise NotImplementedError
+
+
+class LocalImageStore(ImageStore):
+    """Content-addressed directory store.
+
+    Objects live at ``<root>/<h[0:2]>/<h[2:4]>/<sha256>`` so no directory grows
+    past a few thousand entries. Writes go to a temp file in the target
+    directory and are renamed into place, so readers never see partial files
+    and identical frames are stored once.
+    """
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def content_key(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, key):
+        if len(key) != 64 or not all(c in '0123456789abcdef' for c in key):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return os.path.join(self.root, key[0:2], key[2:4], key)
+
+    def put(self, data):
+        key = self.content_key(data)
+        target = self.path(key)
+        try:
+            # prune_orphans() goes by mtime; touch the file so an upload about
+            # to reference it is not swept before its images row commits
+            os.utime(target)
+            return key
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if len(filename) == 64 and not filename.startswith('.'):
+                    full_path = os.path.join(dirpath, filename)
+                    try:
+                        yield filename, os.path.getmtime(full_path)
+                    except FileNotFoundError:
+                        continue
+
+
+# IMAGE_STORE_BACKEND values; 'blob' keeps bytes in images.image_data
+STORE_BACKENDS = {
+    'local': lambda: LocalImageStore(Config.IMAGE_STORE_DIR),
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Configured store instance, or None when images stay in MySQL BLOBs."""
+    global _store
+    backend = Config.IMAGE_STORE_BACKEND
+    if backend == 'blob':
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if backend not in STORE_BACKENDS:
+                    raise ValueError(f"Unknown IMAGE_STORE_BACKEND: {backend}")
+                _store = STORE_BACKENDS[backend]()
+                logger.info(f"Image store: {backend}")
+    return _store
+
+
+def get_store_for_backend(backend):
+    """Store that holds rows written with ``storage_backend`` = ``backend``."""
+    store = get_image_store()
+    if store is not None and store.name == backend:
+        return store
+    if backend in STORE_BACKENDS:
+        return STORE_BACKENDS[backend]()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def store_image_bytes(img_data):
+    """Persist image bytes via the configured backend.
+
+    Returns (image_data, storage_key, storage_backend) ready for the images
+    INSERT: with a store configured image_data is None, otherwise the bytes
+    go to the legacy BLOB column and the key columns stay NULL.
+    """
+    store = get_image_store()
+    if store is None:
+        return img_data, None, None
+    return None, store.put(img_data), store.name
+
+
+def load_image_bytes(row):
+    """Bytes for an images row, from the store or the legacy BLOB column."""
+    if row.get('storage_key'):
+        data = get_store_for_backend(row.get('storage_backend') or 'local').get(row['storage_key'])
+        if data is None:
+            logger.error(f"Stored image missing for key {row['storage_key']}")
+        return data
+    return row.get('image_data')
@@ -0,0 +1,239 @@
+import ast
+import logging
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Boxes of one image as host arrays: xyxy (N, 4) float32, conf (N,) float32,
+# cls (N,) int64, plus the model's class-id -> name mapping.
+Detections = namedtuple('Detections', ['xyxy', 'conf', 'cls', 'names'])
+
+
+def empty_detections(names):
+    return Detections(
+        xyxy=np.zeros((0, 4), np.float32),
+        conf=np.zeros((0,), np.float32),
+        cls=np.zeros((0,), np.int64),
+        names=names,
+    )
+
+
+_torch_configured = False
+
+
+def _configure_torch():
+    """Import torch/ultralytics and register the YOLO classes as safe globals."""
+    global _torch_configured
+    if _torch_configured:
+        return
+
+    os.environ['TORCH_SERIALIZATION_WEIGHTS_ONLY'] = '0'
+
+    import torch
+
+    try:
+        from ultralytics.nn.tasks import DetectionModel
+        from ultralytics.nn.modules.head import Detect
+        from ultralytics.nn.modules.conv import Conv, Concat
+        from ultralytics.nn.modules.block import C2f, SPPF, Bottleneck, DFL
+
+        # Add PyTorch core modules needed for YOLO model loading
+        torch.serialization.add_safe_globals([
+            DetectionModel, Detect, Conv, C2f, SPPF, Bottleneck, Concat, DFL,
+            torch.nn.modules.container.Sequential,
+            torch.nn.modules.container.ModuleList,
+            torch.nn.modules.container.ModuleDict,
+            torch.nn.modules.activation.SiLU,
+            torch.nn.modules.batchnorm.BatchNorm2d,
+            torch.nn.modules.conv.Conv2d,
+            torch.nn.modules.pooling.MaxPool2d,
+            torch.nn.modules.upsampling.Upsample,
+        ])
+    except ImportError as e:
+        logger.error(f"Failed to import YOLO modules: {e}")
+        raise
+
+    logger.info("PyTorch safe globals configured for YOLO models")
+    _torch_configured = True
+
+
+def import_runtime(kind):
+    """Import the heavy inference framework for ``kind`` ahead of model loading."""
+    if kind == 'pytorch':
+        _configure_torch()
+        import ultralytics
+    elif kind == 'onnx':
+        import onnxruntime
+    else:
+        raise ValueError(f"Unknown INFERENCE_BACKEND: {kind}")
+
+
+class UltralyticsBackend:
+    """Runs a .pt checkpoint through PyTorch + ultralytics."""
+
+    name = 'pytorch'
+
+    def __init__(self, model_path, conf, iou):
+        _configure_torch()
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+        self.model = YOLO(model_path)
+        # Training size from the checkpoint; predictions letterbox to it
+        imgsz = self.model.overrides.get('imgsz') or 640
+        self.input_size = max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+    def predict(self, images):
+        results = self.model(images, conf=self.conf, iou=self.iou, verbose=False)
+        detections = []
+        for result in results:
+            # One device-to-host copy per tensor instead of .item()/.tolist() per box
+            boxes = result.boxes
+            detections.append(Detections(
+                xyxy=boxes.xyxy.cpu().numpy().astype(np.float32, copy=False).reshape(-1, 4),
+                conf=boxes.conf.cpu().numpy().astype(np.float32, copy=False).reshape(-1),
+                cls=boxes.cls.cpu().numpy().astype(np.int64).reshape(-1),
+                names=result.names,
+            ))
+        return detections
+
+
+class OnnxBackend:
+    """Runs a YOLOv8 ONNX export through ONNX Runtime.
+
+    Pre- and post-processing mirror ultralytics: letterbox to ``imgsz`` with
+    grey (114) padding, per-class NMS, boxes mapped back to the source frame.
+    Setting ``providers`` to OpenVINOExecutionProvider runs the same graph
+    through OpenVINO when onnxruntime-openvino is installed.
+    """
+
+    name = 'onnx'
+    MAX_WH = 7680  # class offset for batched per-class NMS, as in ultralytics
+    MAX_DET = 300
+
+    def __init__(self, model_path, conf, iou, intra_op_threads=0, inter_op_threads=0,
+                 providers=('CPUExecutionProvider',)):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.model_path = model_path
+        self.conf = conf
+        self.iou = iou
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=list(providers))
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, width = model_input.shape
+        self.dynamic_batch = not isinstance(batch_dim, int)
+        self.imgsz = (
+            height if isinstance(height, int) else 640,
+            width if isinstance(width, int) else 640,
+        )
+        self.input_size = max(self.imgsz)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {}
+
+    def _letterbox(self, image_np):
+        target_h, target_w = self.imgsz
+        h, w = image_np.shape[:2]
+        ratio = min(target_h / h, target_w / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        pad_w, pad_h = (target_w - new_w) / 2, (target_h - new_h) / 2
+
+        if (w, h) != (new_w, new_h):
+            image_np = cv2.resize(image_np, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+        left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+        padded = cv2.copyMakeBorder(image_np, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                    value=(114, 114, 114))
+        return padded, ratio, (left, top)
+
+    def _postprocess(self, output, ratio, pad, shape):
+        # output: (4 + num_classes, num_anchors) with boxes as cx, cy, w, h
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+        keep = conf > self.conf
+        if not keep.any():
+            return empty_detections(self.names)
+
+        boxes, conf, cls = predictions[keep, :4], conf[keep], cls[keep]
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        offset = cls[:, None].astype(np.float32) * self.MAX_WH
+        shifted = xyxy + offset
+        nms_boxes = np.column_stack((shifted[:, :2], shifted[:, 2:] - shifted[:, :2]))
+        indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), conf.tolist(), self.conf, self.iou)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)[:self.MAX_DET]
+
+        xyxy = xyxy[indices]
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= ratio
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return Detections(
+            xyxy=xyxy.astype(np.float32),
+            conf=conf[indices].astype(np.float32),
+            cls=cls[indices].astype(np.int64),
+            names=self.names,
+        )
+
+    def predict(self, images):
+        if not isinstance(images, list):
+            images = [images]
+
+        prepared = [self._letterbox(image_np) for image_np in images]
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        tensors = [padded[:, :, ::-1].transpose(2, 0, 1) for padded, _, _ in prepared]
+        if self.dynamic_batch:
+            batch = np.ascontiguousarray(np.stack(tensors), dtype=np.float32) / 255.0
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: np.ascontiguousarray(t[None], dtype=np.float32) / 255.0})[0]
+                for t in tensors
+            ])
+
+        return [
+            self._postprocess(output, ratio, pad, image_np.shape)
+            for output, (_, ratio, pad), image_np in zip(outputs, prepared, images)
+        ]
+
+
+def onnx_path_for(pt_path, int8=False):
+    """models/best_LPD.pt -> models/best_LPD.onnx (or best_LPD.int8.onnx)."""
+    base = os.path.splitext(pt_path)[0]
+    return f"{base}.int8.onnx" if int8 else f"{base}.onnx"
+
+
+def create_backend(kind, pt_path, conf, iou, config):
+    """Instantiate the configured inference backend for one model."""
+    if kind == 'pytorch':
+        return UltralyticsBackend(pt_path, conf, iou)
+    if kind == 'onnx':
+        return OnnxBackend(
+            onnx_path_for(pt_path, int8=config.ONNX_INT8),
+            conf, iou,
+            intra_op_threads=config.ONNX_INTRA_OP_THREADS,
+            inter_op_threads=config.ONNX_INTER_OP_THREADS,
+            providers=tuple(p.strip() for p in config.ONNX_PROVIDERS.split(',') if p.strip()),
+        )
+    raise ValueError(f"Unknown INFERENCE_BACKEND: {kind}")
@@ -0,0 +1,308 @@
+"""Model-owning inference processes shared by all gunicorn workers.
+
+A supervisor process forks ``INFERENCE_POOL_PROCESSES`` children that each
+load the LPD and OCR models once, cap their BLAS/torch/ONNX thread count
+and (optionally) pin themselves to their own cores. They all ``accept()``
+on one Unix socket, so an idle child picks up the next request and a busy
+pool simply queues in the socket backlog.
+
+Web workers never import torch in this mode. For each call they copy the
+frames into one ``multiprocessing.shared_memory`` segment and send only its
+name plus shapes over the socket; the detections (a few small arrays) come
+back pickled.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+try:
+    from ..config import Config
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+class InferencePoolError(RuntimeError):
+    """The pool could not be reached or the model call failed inside it."""
+
+
+def pool_size():
+    """(processes, threads per process) after applying the auto defaults."""
+    threads = max(1, Config.INFERENCE_POOL_THREADS)
+    processes = Config.INFERENCE_POOL_PROCESSES
+    if processes <= 0:
+        processes = max(1, (os.cpu_count() or 1) // threads)
+    return processes, threads
+
+
+# --- client side (web workers) -------------------------------------------------
+
+class InferencePoolClient:
+    """Sends frames to the pool through shared memory and waits for detections."""
+
+    def __init__(self, address, timeout):
+        self.address = address
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._frames = 0
+        self._errors = 0
+        self._bytes = 0
+        self._ms_total = 0.0
+
+    def predict(self, model, images):
+        """Detections for each image in ``images`` from the named model ('lpd' or 'ocr')."""
+        if not isinstance(images, list):
+            images = [images]
+
+        specs, offset = [], 0
+        for image_np in images:
+            specs.append((offset, image_np.shape, image_np.dtype.str))
+            offset += image_np.nbytes
+
+        started = time.monotonic()
+        shm = SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for image_np, (start, shape, dtype) in zip(images, specs):
+                # copyto also compacts crops, which are strided views of the frame
+                np.copyto(np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start), image_np)
+
+            try:
+                with Client(self.address, family='AF_UNIX') as conn:
+                    conn.send((model, shm.name, specs))
+                    if not conn.poll(self.timeout):
+                        raise InferencePoolError(f"inference pool did not answer within {self.timeout}s")
+                    ok, payload = conn.recv()
+            except (OSError, EOFError) as e:
+                raise InferencePoolError(f"inference pool unavailable at {self.address}: {e}") from e
+        except Exception:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+        with self._stats_lock:
+            self._calls += 1
+            self._frames += len(images)
+            self._bytes += offset
+            self._ms_total += (time.monotonic() - started) * 1000
+            if not ok:
+                self._errors += 1
+        if not ok:
+            raise InferencePoolError(payload)
+        return payload
+
+    def input_size(self, model):
+        """Long side of the named model's input, as loaded in the pool."""
+        try:
+            with Client(self.address, family='AF_UNIX') as conn:
+                conn.send((model, None, None))
+                if not conn.poll(self.timeout):
+                    raise InferencePoolError(f"inference pool did not answer within {self.timeout}s")
+                ok, payload = conn.recv()
+        except (OSError, EOFError) as e:
+            raise InferencePoolError(f"inference pool unavailable at {self.address}: {e}") from e
+        if not ok:
+            raise InferencePoolError(payload)
+        return payload
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'address': self.address,
+                'calls': self._calls,
+                'frames': self._frames,
+                'errors': self._errors,
+                'shared_memory_bytes': self._bytes,
+                'avg_call_ms': round(self._ms_total / self._calls, 3) if self._calls else 0.0,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_pool_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferencePoolClient(Config.INFERENCE_POOL_SOCKET, Config.INFERENCE_TIMEOUT)
+    return _client
+
+
+def get_pool_client_stats():
+    return _client.stats() if _client is not None else {}
+
+
+# --- server side (inference processes) -----------------------------------------
+
+def _limit_threads(threads, cpus):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not pin inference process to CPUs {sorted(cpus)}: {e}")
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+
+def _load_models(threads):
+    from .inference_backends import create_backend
+    from .ocr_service import MODEL_SPECS
+
+    # Same settings as the web workers would use, but with this process's thread budget
+    config = type('PoolConfig', (Config,), {'ONNX_INTRA_OP_THREADS': threads, 'ONNX_INTER_OP_THREADS': 1})
+    models = {
+        name: create_backend(Config.INFERENCE_BACKEND, path, conf, iou, config)
+        for name, (path, conf, iou) in MODEL_SPECS.items()
+    }
+    if Config.INFERENCE_BACKEND == 'pytorch':
+        import torch
+        torch.set_num_threads(threads)
+    return models
+
+
+def _attach(name):
+    shm = SharedMemory(name=name)
+    # The client owns and unlinks the segment; without this the resource
+    # tracker would unlink it again (and warn) when this process exits.
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+def _handle(conn, models):
+    model, shm_name, specs = conn.recv()
+    if model not in models:
+        conn.send((False, f"unknown model {model!r}"))
+        return
+    if shm_name is None:
+        # InferencePoolClient.input_size()
+        conn.send((True, models[model].input_size))
+        return
+
+    shm = _attach(shm_name)
+    try:
+        images = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start) for start, shape, dtype in specs]
+        try:
+            result = (True, models[model].predict(images))
+        except Exception as e:
+            logger.error(f"Inference pool {model} call on {len(images)} frame(s) failed: {e}")
+            result = (False, f"{model} inference failed: {e}")
+        del images  # release the buffer exports before closing the mapping
+    finally:
+        shm.close()
+    conn.send(result)
+
+
+def _serve(listener, index, threads, cpus):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_threads(threads, cpus)
+    models = _load_models(threads)
+    logger.info(f"Inference process {index} (pid {os.getpid()}) ready with {threads} thread(s)")
+
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError as e:
+            logger.error(f"Inference process {index} accept failed: {e}")
+            time.sleep(0.1)
+            continue
+        try:
+            _handle(conn, models)
+        except (EOFError, OSError) as e:
+            # Client gave up (timeout, worker recycled) before we answered
+            logger.warning(f"Inference process {index} lost its client: {e}")
+        except Exception as e:
+            logger.error(f"Inference process {index} request failed: {e}")
+        finally:
+            conn.close()
+
+
+def _cpu_sets(processes, threads):
+    if not Config.INFERENCE_POOL_PIN_CPUS or not hasattr(os, 'sched_getaffinity'):
+        return [None] * processes
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) < processes * threads:
+        logger.warning("Not enough CPUs to pin every inference process; leaving affinity unset")
+        return [None] * processes
+    return [set(available[i * threads:(i + 1) * threads]) for i in range(processes)]
+
+
+def run_pool():
+    """Supervise the inference processes until SIGTERM/SIGINT, restarting any that die."""
+    processes, threads = pool_size()
+    address = Config.INFERENCE_POOL_SOCKET
+    if os.path.exists(address):
+        os.remove(address)
+    listener = Listener(address, family='AF_UNIX', backlog=Config.INFERENCE_POOL_BACKLOG)
+    os.chmod(address, 0o600)
+
+    ctx = get_context('fork')
+    cpu_sets = _cpu_sets(processes, threads)
+    children = {}
+
+    def start(index):
+        child = ctx.Process(target=_serve, args=(listener, index, threads, cpu_sets[index]),
+                            name=f"carwatch-inference-{index}", daemon=True)
+        child.start()
+        children[index] = child
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    for index in range(processes):
+        start(index)
+    logger.info(f"Inference pool listening on {address}: {processes} process(es) x {threads} thread(s)")
+
+    try:
+        while not stopping.wait(1.0):
+            for index, child in list(children.items()):
+                if not child.is_alive():
+                    logger.error(f"Inference process {index} exited with {child.exitcode}; restarting")
+                    start(index)
+    finally:
+        for child in children.values():
+            child.terminate()
+        for child in children.values():
+            child.join(5)
+        listener.close()
+        if os.path.exists(address):
+            os.remove(address)
+
+
+def start_pool_process():
+    """Fork the pool supervisor (used from gunicorn's on_starting hook)."""
+    process = get_context('fork').Process(target=run_pool, name='carwatch-inference-pool', daemon=False)
+    process.start()
+    return process
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_pool()
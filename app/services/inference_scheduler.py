@@ -0,0 +1,139 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) for the queue-wait histogram; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class BatchScheduler:
+    """Collects single-item requests from many threads into batched calls.
+
+    ``run_batch`` receives a list of submitted items and must return a list of
+    results in the same order. A single daemon thread per process owns the
+    model call, so concurrent request threads never run the model in parallel.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=8, max_wait_ms=5):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._batch_sizes = {}
+        self._wait_hist = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_ms_total = 0.0
+        with _registry_lock:
+            _registry[name] = self
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid != pid or self._thread is None:
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._loop, name=f"{self.name}-batcher", daemon=True
+                )
+                self._pid = pid
+                self._thread.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future for its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for _, _, enqueued in batch:
+                waited_ms = (started - enqueued) * 1000
+                self._wait_ms_total += waited_ms
+                for i, bound in enumerate(WAIT_BUCKETS_MS):
+                    if waited_ms <= bound:
+                        self._wait_hist[i] += 1
+                        break
+                else:
+                    self._wait_hist[-1] += 1
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            self._record(batch, started)
+            pending = [(item, future) for item, future, _ in batch if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                results = self.run_batch([item for item, _ in pending])
+                if len(results) != len(pending):
+                    raise RuntimeError(
+                        f"{self.name}: batch returned {len(results)} results for {len(pending)} inputs"
+                    )
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(pending)} failed: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+
+    def stats(self):
+        with self._stats_lock:
+            wait_hist = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self._wait_hist)}
+            wait_hist['gt_{}ms'.format(WAIT_BUCKETS_MS[-1])] = self._wait_hist[-1]
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': self._queue.qsize(),
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'avg_batch_size': round(self._items / self._batches, 3) if self._batches else 0.0,
+                'batch_size_hist': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                'queue_wait_ms_avg': round(self._wait_ms_total / self._items, 3) if self._items else 0.0,
+                'queue_wait_hist': wait_hist,
+            }
+
+
+def get_scheduler_stats():
+    """Stats for every scheduler created in this process, keyed by name."""
+    with _registry_lock:
+        schedulers = dict(_registry)
+    return {name: scheduler.stats() for name, scheduler in schedulers.items()}
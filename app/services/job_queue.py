@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from ..config import Config
+    from ..utils.database import get_db_connection
+    from .ocr_service import read_plates
+    from .image_store import load_image_bytes
+    from .events import publish_history_event
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import get_db_connection
+    from app.services.ocr_service import read_plates
+    from app.services.image_store import load_image_bytes
+    from app.services.events import publish_history_event
+
+logger = logging.getLogger(__name__)
+
+JOB_FINAL_STATES = ('done', 'failed')
+
+_wakeup = threading.Event()
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def enqueue_ocr_job(cursor, image_id, history_id):
+    """Insert a queued job on the caller's transaction and return its id.
+
+    The caller commits, then calls wake_workers() so a local worker picks the
+    job up immediately instead of on its next poll.
+    """
+    cursor.execute(
+        "INSERT INTO ocr_jobs (image_id, history_id, status) VALUES (%s, %s, 'queued')",
+        (image_id, history_id)
+    )
+    return cursor.lastrowid
+
+
+def wake_workers():
+    _wakeup.set()
+
+
+def get_job(job_id):
+    with get_db_connection() as (db, cursor):
+        cursor.execute(
+            """SELECT job_id, image_id, history_id, status, plate, error, attempts, created_at, updated_at
+               FROM ocr_jobs WHERE job_id = %s""",
+            (job_id,)
+        )
+        return cursor.fetchone()
+
+
+def _claim_next_job():
+    """Atomically move the oldest runnable job to 'running' and return it."""
+    stale_seconds = int(Config.OCR_JOB_STALE_SECONDS)
+    with get_db_connection() as (db, cursor):
+        # A job that keeps killing its worker never reaches _fail_job(); give up
+        # on it once it has used every attempt
+        cursor.execute(
+            """UPDATE ocr_jobs SET status = 'failed', error = 'worker exited while processing the job'
+               WHERE status = 'running' AND updated_at < NOW() - INTERVAL %s SECOND AND attempts >= %s""",
+            (stale_seconds, Config.OCR_JOB_MAX_ATTEMPTS)
+        )
+        if cursor.rowcount:
+            logger.warning(f"Marked {cursor.rowcount} stale OCR job(s) failed after {Config.OCR_JOB_MAX_ATTEMPTS} attempts")
+            db.commit()
+
+        # Jobs left 'running' by a recycled or killed worker become claimable again
+        cursor.execute(
+            """SELECT job_id, image_id, history_id, attempts FROM ocr_jobs
+               WHERE status = 'queued'
+                  OR (status = 'running' AND updated_at < NOW() - INTERVAL %s SECOND AND attempts < %s)
+               ORDER BY job_id
+               LIMIT 1
+               FOR UPDATE SKIP LOCKED""",
+            (stale_seconds, Config.OCR_JOB_MAX_ATTEMPTS)
+        )
+        job = cursor.fetchone()
+        if not job:
+            db.rollback()
+            return None
+
+        cursor.execute(
+            "UPDATE ocr_jobs SET status = 'running', attempts = attempts + 1 WHERE job_id = %s",
+            (job['job_id'],)
+        )
+        db.commit()
+        job['attempts'] += 1
+        return job
+
+
+def read_plate_from_bytes(image_bytes):
+    """Decode an encoded image and run plate detection plus OCR on it."""
+    img_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img_np is None:
+        raise ValueError("Could not decode image.")
+
+    # Best plate first, as detect_and_crop_plate would pick; goes through the plate cache
+    plates = read_plates(img_np)
+    return plates[0]['plate'] if plates else ""
+
+
+def _process_job(job):
+    with get_db_connection() as (db, cursor):
+        cursor.execute(
+            "SELECT image_data, storage_key, storage_backend FROM images WHERE image_id = %s",
+            (job['image_id'],)
+        )
+        row = cursor.fetchone()
+    image_bytes = load_image_bytes(row) if row else None
+    if not image_bytes:
+        raise ValueError(f"Image {job['image_id']} not found")
+
+    plate_number = read_plate_from_bytes(image_bytes)
+
+    with get_db_connection() as (db, cursor):
+        if job['history_id']:
+            cursor.execute(
+                "UPDATE history SET plate = %s WHERE history_id = %s",
+                (plate_number, job['history_id'])
+            )
+        cursor.execute(
+            "UPDATE ocr_jobs SET status = 'done', plate = %s, error = NULL WHERE job_id = %s",
+            (plate_number, job['job_id'])
+        )
+        db.commit()
+    if job['history_id']:
+        publish_history_event()
+    logger.info(f"OCR job {job['job_id']} done: {plate_number!r}")
+
+
+def _fail_job(job, error):
+    retry = job['attempts'] < Config.OCR_JOB_MAX_ATTEMPTS
+    try:
+        with get_db_connection() as (db, cursor):
+            cursor.execute(
+                "UPDATE ocr_jobs SET status = %s, error = %s WHERE job_id = %s",
+                ('queued' if retry else 'failed', str(error)[:255], job['job_id'])
+            )
+            db.commit()
+    except Exception as e:
+        logger.error(f"Could not record failure of OCR job {job['job_id']}: {e}")
+
+
+def _worker_loop():
+    while True:
+        try:
+            job = _claim_next_job()
+        except Exception as e:
+            logger.error(f"OCR job claim failed: {e}")
+            job = None
+
+        if job is None:
+            _wakeup.wait(Config.OCR_JOB_POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        try:
+            _process_job(job)
+        except Exception as e:
+            logger.error(f"OCR job {job['job_id']} failed (attempt {job['attempts']}): {e}")
+            _fail_job(job, e)
+
+
+def ensure_job_workers():
+    """Start this process's OCR worker threads if they are not running yet."""
+    global _workers, _workers_pid
+    pid = os.getpid()
+    if _workers_pid == pid or Config.OCR_JOB_WORKERS <= 0:
+        return
+    with _workers_lock:
+        if _workers_pid == pid:
+            return
+        # Threads started in the preloaded master do not exist after fork
+        _workers = []
+        for i in range(Config.OCR_JOB_WORKERS):
+            thread = threading.Thread(target=_worker_loop, name=f"ocr-job-worker-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+        _workers_pid = pid
+        logger.info(f"Started {len(_workers)} OCR job worker(s) in pid {pid}")
+
+
+def wait_for_job(job_id, timeout):
+    """Poll a job until it reaches a final state or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    job = get_job(job_id)
+    while job and job['status'] not in JOB_FINAL_STATES and time.monotonic() < deadline:
+        time.sleep(min(Config.OCR_JOB_LONG_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+        job = get_job(job_id)
+    return job
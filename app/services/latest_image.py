@@ -0,0 +1,205 @@
+"""Per-process cache of the newest image, for /api/fetch_img.
+
+Every dashboard polls fetch_img for the latest capture. The cache keeps
+that image's id, bytes and ETag in memory, so a poll normally costs one
+stat() and, when the client already has the image, a 304 with no body.
+
+Workers stay coherent without talking to each other: a process that
+commits an image refreshes its own entry and replaces the signal file
+(LATEST_IMAGE_SIGNAL_FILE). Other workers notice the file changed and
+re-read MAX(image_id), a primary-key lookup, before serving their entry
+again; the bytes are only reloaded when that id moved. They also re-read
+it at least every LATEST_IMAGE_RECHECK_SECONDS, which covers writers that
+do not signal (another host, a manual INSERT, a deleted image).
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from ..config import Config
+    from ..utils.database import get_db_connection
+    from ..utils.signal_file import default_signal_path, send_signal, signal_state
+    from .image_store import load_image_bytes
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import get_db_connection
+    from app.utils.signal_file import default_signal_path, send_signal, signal_state
+    from app.services.image_store import load_image_bytes
+
+logger = logging.getLogger(__name__)
+
+LatestImage = namedtuple('LatestImage', ['image_id', 'data', 'file_type', 'etag', 'last_modified'])
+
+VERSION_SQL = "SELECT MAX(image_id) AS image_id FROM images"
+LATEST_SQL = """SELECT image_id, storage_key, storage_backend, file_type, upload_date
+                FROM images ORDER BY upload_date DESC, image_id DESC LIMIT 1"""
+BLOB_SQL = "SELECT image_data FROM images WHERE image_id = %s"
+
+
+def build_entry(row, image_data):
+    """LatestImage for an images row and its bytes (None when the bytes are missing)."""
+    if not image_data:
+        return None
+    etag = row.get('storage_key') or hashlib.sha256(image_data).hexdigest()
+    return LatestImage(row['image_id'], image_data, row.get('file_type'), etag, row.get('upload_date'))
+
+
+class LatestImageCache:
+    """The newest image plus the MAX(image_id) and signal file state it was checked against."""
+
+    def __init__(self, signal_file, recheck_seconds=5.0):
+        self.signal_file = signal_file
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._entry = None
+        self._version = None
+        self._signal_seen = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.version_checks = 0
+        self.reloads = 0
+        self.local_refreshes = 0
+        self.signals_sent = 0
+
+    def lookup(self):
+        """(entry, signal): entry is set only when it can be served without the database.
+
+        Pass ``signal`` back to confirm()/store(); it is read before the
+        database so a signal sent while the query runs is not lost.
+        """
+        signal = signal_state(self.signal_file)
+        with self._lock:
+            if (self._entry is not None and signal == self._signal_seen
+                    and time.monotonic() - self._checked_at < self.recheck_seconds):
+                self.hits += 1
+                return self._entry, signal
+        return None, signal
+
+    def confirm(self, version, signal):
+        """The cached entry if ``version`` (the current MAX(image_id)) is what it was loaded at."""
+        with self._lock:
+            self.version_checks += 1
+            if self._entry is None or version != self._version:
+                return None
+            self._signal_seen = signal
+            self._checked_at = time.monotonic()
+            return self._entry
+
+    def store(self, entry, version, signal):
+        with self._lock:
+            self.reloads += 1
+            self._entry, self._version = entry, version
+            self._signal_seen = signal
+            self._checked_at = time.monotonic()
+
+    def refresh(self, entry):
+        """Adopt an image this process just committed, unless a newer one is cached.
+
+        The signal file state is left alone, so the next lookup still checks
+        MAX(image_id) once in case another worker committed in between.
+        """
+        with self._lock:
+            if self._version is not None and entry.image_id <= self._version:
+                return
+            self.local_refreshes += 1
+            self._entry, self._version = entry, entry.image_id
+
+    def signal(self, image_id):
+        """Tell the other workers a new image was committed."""
+        if send_signal(self.signal_file, image_id):
+            with self._lock:
+                self.signals_sent += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'image_id': self._entry.image_id if self._entry is not None else None,
+                'size_bytes': len(self._entry.data) if self._entry is not None else 0,
+                'signal_file': self.signal_file,
+                'recheck_seconds': self.recheck_seconds,
+                'hits': self.hits,
+                'version_checks': self.version_checks,
+                'reloads': self.reloads,
+                'local_refreshes': self.local_refreshes,
+                'signals_sent': self.signals_sent,
+            }
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_latest_image_cache():
+    """This process's latest-image cache, or None when LATEST_IMAGE_CACHE_ENABLED is off."""
+    global _cache, _cache_pid
+    if not Config.LATEST_IMAGE_CACHE_ENABLED:
+        return None
+    pid = os.getpid()
+    if _cache_pid != pid:
+        with _cache_lock:
+            if _cache_pid != pid:
+                signal_file = Config.LATEST_IMAGE_SIGNAL_FILE or default_signal_path('carwatch-latest-image')
+                _cache = LatestImageCache(signal_file, Config.LATEST_IMAGE_RECHECK_SECONDS)
+                _cache_pid = pid
+    return _cache
+
+
+def get_latest_image_cache_stats():
+    return _cache.stats() if _cache is not None and _cache_pid == os.getpid() else {}
+
+
+def get_latest_image():
+    """The newest image as a LatestImage, or None when there is none (or its bytes are missing)."""
+    cache = get_latest_image_cache()
+    signal = version = None
+    if cache is not None:
+        entry, signal = cache.lookup()
+        if entry is not None:
+            return entry
+
+    with get_db_connection() as (db, cursor):
+        if cache is not None:
+            cursor.execute(VERSION_SQL)
+            row = cursor.fetchone()
+            version = row['image_id'] if row else None
+            entry = cache.confirm(version, signal)
+            if entry is not None:
+                return entry
+
+        cursor.execute(LATEST_SQL)
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if row.get('storage_key'):
+            image_data = load_image_bytes(row)
+        else:
+            cursor.execute(BLOB_SQL, (row['image_id'],))
+            blob = cursor.fetchone()
+            image_data = blob['image_data'] if blob else None
+
+    entry = build_entry(row, image_data)
+    if cache is not None and entry is not None:
+        cache.store(entry, version, signal)
+    return entry
+
+
+def publish_latest_image(image_id, image_data=None, file_type=None, storage_key=None, upload_date=None):
+    """Call after an image row is committed: refresh this worker's entry and signal the others.
+
+    Without ``image_data`` the local entry is simply re-checked on the next
+    poll, like any other worker's.
+    """
+    cache = get_latest_image_cache()
+    if cache is None or image_id is None:
+        return
+    if image_data:
+        row = {'image_id': image_id, 'storage_key': storage_key, 'file_type': file_type, 'upload_date': upload_date}
+        cache.refresh(build_entry(row, image_data))
+    cache.signal(image_id)
@@ -0,0 +1,268 @@
+"""Prometheus metrics: per-stage, per-endpoint and per-query latency plus read counters.
+
+Every gunicorn worker keeps its own samples. With METRICS_MULTIPROC_DIR
+set (gunicorn.conf.py points it at /tmp/carwatch-metrics), prometheus_client
+writes them to one mmap file per process, and ``/metrics`` sums the files
+of all workers. Dead workers' counters and histograms are kept, and their
+gauges are dropped by the child_exit hook. Without the directory (the
+Flask dev server) samples stay in this process. When prometheus_client is
+missing or METRICS_ENABLED=False, every metric is a no-op.
+"""
+import functools
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+try:
+    from ..config import Config
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = Config.METRICS_MULTIPROC_DIR if Config.METRICS_ENABLED else ''
+if MULTIPROC_DIR:
+    # prometheus_client picks its value storage from this variable at import time
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = MULTIPROC_DIR
+
+try:
+    if not Config.METRICS_ENABLED:
+        raise ImportError('METRICS_ENABLED=False')
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    METRICS_AVAILABLE = True
+except ImportError:
+    prometheus_client = None
+    METRICS_AVAILABLE = False
+
+# Seconds; the pipeline runs from ~1 ms (cache hit) to seconds (CPU inference)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+MODEL_STATES = ('not_loaded', 'loading', 'loaded', 'warming', 'ready', 'failed')
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if METRICS_AVAILABLE:
+    STAGE_SECONDS = Histogram(
+        'carwatch_stage_seconds', 'Time spent in each upload/OCR pipeline stage',
+        ['stage'], buckets=STAGE_BUCKETS)
+    REQUEST_SECONDS = Histogram(
+        'carwatch_http_request_seconds', 'Request latency by route',
+        ['method', 'endpoint', 'status'], buckets=STAGE_BUCKETS)
+    QUERY_SECONDS = Histogram(
+        'carwatch_db_query_seconds', 'Database statement latency by statement type and table',
+        ['query'], buckets=QUERY_BUCKETS)
+    PLATES_READ = Counter('carwatch_plates_read', 'Plates read with at least one character')
+    EMPTY_READS = Counter('carwatch_empty_reads', 'Frames read without any plate text')
+    OCR_FAILURES = Counter(
+        'carwatch_ocr_failures', 'Reads that failed: "error" raised, "timeout" inference timed out, "no_characters" found a plate but no text',
+        ['reason'])
+    IN_FLIGHT = Gauge(
+        'carwatch_http_requests_in_progress', 'Requests being served', multiprocess_mode='livesum')
+    MODEL_STATE = Gauge(
+        'carwatch_model_state', 'Workers whose models are in each load state', ['state'],
+        multiprocess_mode='livesum')
+else:
+    STAGE_SECONDS = REQUEST_SECONDS = QUERY_SECONDS = _NoopMetric()
+    PLATES_READ = EMPTY_READS = OCR_FAILURES = IN_FLIGHT = MODEL_STATE = _NoopMetric()
+
+
+@contextmanager
+def observe_stage(stage):
+    """Time the enclosed block as one pipeline stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def count_reads(plates):
+    """Count a frame's reads: plates with text, or one empty read when none had any."""
+    texts = [plate['plate'] for plate in plates]
+    read = sum(1 for text in texts if text)
+    if read:
+        PLATES_READ.inc(read)
+    else:
+        EMPTY_READS.inc()
+    if len(texts) > read:
+        OCR_FAILURES.labels('no_characters').inc(len(texts) - read)
+
+
+def set_model_state(state):
+    for name in MODEL_STATES:
+        MODEL_STATE.labels(name).set(1 if name == state else 0)
+
+
+_STATEMENT = re.compile(r'^\s*(\w+)')
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def query_label(sql):
+    """'select:history', 'insert:images', ... so the label set stays small."""
+    statement = _STATEMENT.match(sql)
+    table = _TABLE.search(sql)
+    return f"{statement.group(1).lower() if statement else 'other'}:{table.group(1).lower() if table else '-'}"
+
+
+class TimedCursor:
+    """Cursor proxy that records every execute()/executemany() in QUERY_SECONDS."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            QUERY_SECONDS.labels(query_label(operation)).observe(time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            QUERY_SECONDS.labels(query_label(operation)).observe(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class AsyncTimedCursor(TimedCursor):
+    """TimedCursor for aiomysql, whose execute()/executemany() are coroutines."""
+
+    async def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            QUERY_SECONDS.labels(query_label(operation)).observe(time.perf_counter() - started)
+
+    async def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            QUERY_SECONDS.labels(query_label(operation)).observe(time.perf_counter() - started)
+
+
+def timed_cursor(cursor, async_cursor=False):
+    if not METRICS_AVAILABLE:
+        return cursor
+    return AsyncTimedCursor(cursor) if async_cursor else TimedCursor(cursor)
+
+
+def _endpoint(rule):
+    # The URL rule, not the path, so /api/get_image/<int:image_id> is one series
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """Record latency and in-flight count for every request the Flask app serves."""
+    if not METRICS_AVAILABLE:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.labels(request.method, _endpoint(request.url_rule),
+                                   str(response.status_code)).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request(exc=None):
+        # after_request did not run (the response could not be built)
+        if g.pop('metrics_started', None) is not None:
+            IN_FLIGHT.dec()
+
+
+def init_async_app(app):
+    """init_app() for the Quart app of the ASGI serving mode."""
+    if not METRICS_AVAILABLE:
+        return
+    from quart import g, request
+
+    @app.before_request
+    async def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    async def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.labels(request.method, _endpoint(request.url_rule),
+                                   str(response.status_code)).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    async def end_request(exc=None):
+        if g.pop('metrics_started', None) is not None:
+            IN_FLIGHT.dec()
+
+
+def render_metrics():
+    """(body, content type) in Prometheus text format, summed over all workers."""
+    if not METRICS_AVAILABLE:
+        return None, None
+    if MULTIPROC_DIR:
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def reset_multiproc_dir():
+    """Delete samples left by a previous server run (called by the gunicorn master)."""
+    if not MULTIPROC_DIR or not os.path.isdir(MULTIPROC_DIR):
+        return
+    for name in os.listdir(MULTIPROC_DIR):
+        if name.endswith('.db'):
+            try:
+                os.remove(os.path.join(MULTIPROC_DIR, name))
+            except OSError as e:
+                logger.warning(f"Could not remove stale metrics file {name}: {e}")
+
+
+def mark_worker_dead(pid):
+    """Drop a dead worker's live gauges (in-flight requests, model state)."""
+    if METRICS_AVAILABLE and MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
@@ -1,121 +1,466 @@
 import os
 import logging
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-os.environ['TORCH_SERIALIZATION_WEIGHTS_ONLY'] = '0'
+import cv2
+import numpy as np
 
-import torch
-from ultralytics import YOLO
+logger = logging.getLogger(__name__)
 
 try:
-    from ultralytics.nn.tasks import DetectionModel
-    from ultralytics.nn.modules.head import Detect
-    from ultralytics.nn.modules.conv import Conv, Concat
-    from ultralytics.nn.modules.block import C2f, SPPF, Bottleneck, DFL
-    
-    # Add PyTorch core modules needed for YOLO model loading
-    torch.serialization.add_safe_globals([
-        DetectionModel, Detect, Conv, C2f, SPPF, Bottleneck, Concat, DFL,
-        torch.nn.modules.container.Sequential,
-        torch.nn.modules.container.ModuleList,
-        torch.nn.modules.container.ModuleDict,
-        torch.nn.modules.activation.SiLU,
-        torch.nn.modules.batchnorm.BatchNorm2d,
-        torch.nn.modules.conv.Conv2d,
-        torch.nn.modules.pooling.MaxPool2d,
-        torch.nn.modules.upsampling.Upsample,
-    ])
-except ImportError as e:
-    logger = logging.getLogger(__name__)
-    logging.error(f"Failed to import YOLO modules: {e}")
-    raise
-
-logger = logging.getLogger(__name__)
-logger.info("PyTorch safe globals configured for YOLO models")
+    from ..config import Config
+    from .inference_scheduler import BatchScheduler
+    from .inference_backends import create_backend, import_runtime
+    from .inference_pool import InferencePoolError, get_pool_client
+    from .plate_cache import get_plate_cache
+    from .frame_gate import get_frame_gate
+    from .metrics import observe_stage, count_reads, set_model_state, OCR_FAILURES
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.services.inference_scheduler import BatchScheduler
+    from app.services.inference_backends import create_backend, import_runtime
+    from app.services.inference_pool import InferencePoolError, get_pool_client
+    from app.services.plate_cache import get_plate_cache
+    from app.services.frame_gate import get_frame_gate
+    from app.services.metrics import observe_stage, count_reads, set_model_state, OCR_FAILURES
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 LPD_MODEL_PATH = os.path.join(BASE_DIR, "models", "best_LPD.pt")
 OCR_MODEL_PATH = os.path.join(BASE_DIR, "models", "best_OCR.pt")
 
+LPD_CONF, LPD_IOU = 0.5, 0.5
+OCR_CONF, OCR_IOU = 0.1, 0.3
+PLATE_PADDING = 10
+
+MODEL_SPECS = {
+    'lpd': (LPD_MODEL_PATH, LPD_CONF, LPD_IOU),
+    'ocr': (OCR_MODEL_PATH, OCR_CONF, OCR_IOU),
+}
+
 lpd_model = None
 ocr_model = None
 
+
+class ModelUnavailableError(RuntimeError):
+    """The LPD/OCR models could not be loaded in this process."""
+
+
+class InferenceTimeoutError(ModelUnavailableError):
+    """A batched or pooled inference call did not answer within INFERENCE_TIMEOUT."""
+
+
+_model_lock = threading.Lock()
+_warmup_lock = threading.Lock()
+_warmup_pid = None
+_warmup_started = 0.0
+WARMUP_RETRY_SECONDS = 30
+_model_status = {'state': 'not_loaded', 'error': None, 'pid': None, 'timings_ms': {}}
+_lpd_input_size = None
+
+def _set_model_state(state, **fields):
+    _model_status.update(state=state, **fields)
+    set_model_state(state)
+
+def _record_phase(phase, started):
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    _model_status['timings_ms'][phase] = elapsed_ms
+    logger.info(f"Model startup phase {phase}: {elapsed_ms}ms")
+
 def load_yolo_models():
+    """Import the inference runtime and load both models once per process.
+
+    Called lazily before the first prediction, so importing this module (and
+    therefore create_app()) stays cheap. Raises ModelUnavailableError when a
+    model cannot be loaded; the next call tries again.
+    """
     global lpd_model, ocr_model
-    if lpd_model is None:
+    if lpd_model is not None and ocr_model is not None:
+        return
+
+    with _model_lock:
+        if lpd_model is not None and ocr_model is not None:
+            return
+
+        backend = Config.INFERENCE_BACKEND
+        _set_model_state('loading', error=None, pid=os.getpid())
         try:
-            lpd_model = YOLO(LPD_MODEL_PATH)
-            logger.info(f"LPD model loaded: {LPD_MODEL_PATH}")
+            started = time.perf_counter()
+            import_runtime(backend)
+            _record_phase('imports', started)
+
+            started = time.perf_counter()
+            lpd = create_backend(backend, LPD_MODEL_PATH, LPD_CONF, LPD_IOU, Config)
+            _record_phase('weights_lpd', started)
+            logger.info(f"LPD model loaded ({backend}): {lpd.model_path}")
+
+            started = time.perf_counter()
+            ocr = create_backend(backend, OCR_MODEL_PATH, OCR_CONF, OCR_IOU, Config)
+            _record_phase('weights_ocr', started)
+            logger.info(f"OCR model loaded ({backend}): {ocr.model_path}")
         except Exception as e:
-            logger.error(f"Failed to load LPD model: {e}")
-            exit()
+            _set_model_state('failed', error=str(e))
+            logger.error(f"Failed to load models: {e}")
+            raise ModelUnavailableError(f"OCR models are not available: {e}") from e
+
+        lpd_model, ocr_model = lpd, ocr
+        _set_model_state('loaded')
 
-    if ocr_model is None:
+if Config.INFERENCE_POOL_ENABLED:
+    # Models live in the inference pool processes; this process only ships frames
+    def _predict_pool(model, images):
         try:
-            ocr_model = YOLO(OCR_MODEL_PATH)
-            logger.info(f"OCR model loaded: {OCR_MODEL_PATH}")
+            return get_pool_client().predict(model, images)
+        except InferencePoolError as e:
+            raise ModelUnavailableError(str(e)) from e
+
+    def _predict_lpd_batch(images):
+        return _predict_pool('lpd', images)
+
+    def _predict_ocr_batch(images):
+        return _predict_pool('ocr', images)
+else:
+    def _predict_lpd_batch(images):
+        load_yolo_models()
+        return lpd_model.predict(images)
+
+    def _predict_ocr_batch(images):
+        load_yolo_models()
+        return ocr_model.predict(images)
+
+def warm_up_models():
+    """Load the models and run one dummy LPD + OCR pass at a fixed input size.
+
+    The first real forward pass otherwise pays for kernel selection and
+    allocator growth. In pool mode this waits until the pool answers.
+    """
+    started = time.perf_counter()
+    size = Config.MODEL_WARMUP_SIZE
+    frame = np.zeros((size, size, 3), np.uint8)
+    crop = np.zeros((max(1, size // 4), max(1, size // 2), 3), np.uint8)
+
+    while True:
+        try:
+            if not Config.INFERENCE_POOL_ENABLED:
+                load_yolo_models()
+            _set_model_state('warming', pid=os.getpid())
+            phase_started = time.perf_counter()
+            _predict_lpd_batch([frame])
+            _predict_ocr_batch([crop])
+            _record_phase('first_inference', phase_started)
+            break
+        except ModelUnavailableError:
+            return
         except Exception as e:
-            logger.error(f"Failed to load OCR model: {e}")
-            exit()
+            if not Config.INFERENCE_POOL_ENABLED:
+                _set_model_state('failed', error=str(e))
+                logger.error(f"Model warm-up failed: {e}")
+                return
+            # The pool may still be loading its own models
+            _model_status['error'] = str(e)
+            time.sleep(2)
+
+    _record_phase('total', started)
+    _set_model_state('ready', error=None)
+
+def start_model_warmup():
+    """Start warm_up_models() on a background thread, once per process.
+
+    A failed warm-up is retried after WARMUP_RETRY_SECONDS, so a model file
+    that shows up later (or a pool that restarts) brings the worker back.
+    """
+    global _warmup_pid, _warmup_started
+    pid = os.getpid()
+    if not Config.MODEL_WARMUP or (_warmup_pid == pid and not _warmup_retry_due()):
+        return
+    with _warmup_lock:
+        if _warmup_pid == pid and not _warmup_retry_due():
+            return
+        _warmup_pid = pid
+        _warmup_started = time.monotonic()
+    threading.Thread(target=warm_up_models, name="model-warmup", daemon=True).start()
+
+def _warmup_retry_due():
+    return (_model_status['state'] == 'failed'
+            and time.monotonic() - _warmup_started > WARMUP_RETRY_SECONDS)
+
+def get_model_status():
+    """Readiness of the models in this process plus per-phase startup timings.
+
+    Without MODEL_WARMUP the models load on the first request, so the worker
+    counts as ready as long as that load has not failed.
+    """
+    status = dict(_model_status, timings_ms=dict(_model_status['timings_ms']))
+    status['backend'] = 'pool' if Config.INFERENCE_POOL_ENABLED else Config.INFERENCE_BACKEND
+    if Config.MODEL_WARMUP:
+        status['ready'] = status['state'] == 'ready'
+    else:
+        status['ready'] = status['state'] != 'failed'
+    return status
+
+lpd_scheduler = None
+ocr_scheduler = None
+if Config.INFERENCE_BATCHING:
+    lpd_scheduler = BatchScheduler(
+        'lpd', _predict_lpd_batch,
+        max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=Config.INFERENCE_MAX_WAIT_MS,
+    )
+    ocr_scheduler = BatchScheduler(
+        'ocr', _predict_ocr_batch,
+        max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=Config.INFERENCE_MAX_WAIT_MS,
+    )
+    logger.info(
+        f"Batched inference enabled (max batch {Config.INFERENCE_MAX_BATCH_SIZE}, "
+        f"max wait {Config.INFERENCE_MAX_WAIT_MS}ms)"
+    )
+
+def _await_results(scheduler, futures):
+    """Results of scheduler futures, or InferenceTimeoutError after INFERENCE_TIMEOUT."""
+    try:
+        return [future.result(timeout=Config.INFERENCE_TIMEOUT) for future in futures]
+    except FutureTimeoutError:
+        # The scheduler skips cancelled items that have not been batched yet
+        for future in futures:
+            future.cancel()
+        raise InferenceTimeoutError(
+            f"{scheduler.name} inference did not finish within {Config.INFERENCE_TIMEOUT}s"
+        ) from None
+
+def _run_lpd(image_np):
+    if lpd_scheduler is not None:
+        return _await_results(lpd_scheduler, [lpd_scheduler.submit(image_np)])[0]
+    return _predict_lpd_batch(image_np)[0]
+
+def _run_ocr(image_np):
+    if ocr_scheduler is not None:
+        return _await_results(ocr_scheduler, [ocr_scheduler.submit(image_np)])[0]
+    return _predict_ocr_batch(image_np)[0]
+
+def lpd_input_size():
+    """Long side of the detector's input: LPD_INPUT_SIZE when set, else the loaded model's.
 
-load_yolo_models()
+    With the inference pool the model lives in another process, so the
+    pool is asked once.
+    """
+    global _lpd_input_size
+    if Config.LPD_INPUT_SIZE:
+        return Config.LPD_INPUT_SIZE
+    if _lpd_input_size is None:
+        if Config.INFERENCE_POOL_ENABLED:
+            _lpd_input_size = get_pool_client().input_size('lpd')
+        else:
+            load_yolo_models()
+            _lpd_input_size = lpd_model.input_size
+    return _lpd_input_size
+
+def _lpd_input(image_np):
+    """Frame shrunk to the detector's input size on its long side, plus the scale used.
+
+    The detector letterboxes to its input size anyway; doing it here with
+    INTER_AREA is cheaper and keeps full-resolution frames out of the batch
+    queue and the inference pool's shared memory. OCR still crops from the
+    original frame.
+    """
+    longest = max(image_np.shape[:2])
+    size = lpd_input_size()
+    if longest <= size:
+        return image_np, 1.0
+    scale = size / longest
+    return cv2.resize(image_np, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), scale
+
+def _to_frame(detections, scale=1.0, origin=(0, 0)):
+    """Map boxes found on a downscaled ROI back to full-frame pixels."""
+    if scale == 1.0 and origin == (0, 0):
+        return detections
+    ox, oy = origin
+    xyxy = detections.xyxy / np.float32(scale) + np.array([ox, oy, ox, oy], np.float32)
+    return detections._replace(xyxy=xyxy)
+
+def _detect(image_np, origin=(0, 0)):
+    with observe_stage('lpd'):
+        small, scale = _lpd_input(image_np)
+        return _to_frame(_run_lpd(small), scale, origin)
+
+def _padded_boxes(xyxy, image_shape):
+    """Integer crop boxes grown by PLATE_PADDING and clipped to the image."""
+    height, width = image_shape[:2]
+    boxes = xyxy.astype(np.int64)
+    boxes[:, :2] -= PLATE_PADDING
+    boxes[:, 2:] += PLATE_PADDING
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes
+
+def _plate_crops(detections, image_np):
+    """Every detected plate, highest confidence first, as crop + metadata."""
+    if len(detections.conf) == 0:
+        return []
+
+    order = np.argsort(-detections.conf, kind='stable')
+    boxes = _padded_boxes(detections.xyxy[order], image_np.shape)
+    return [
+        {'crop': image_np[y1:y2, x1:x2], 'confidence': float(conf), 'box': [int(x1), int(y1), int(x2), int(y2)]}
+        for (x1, y1, x2, y2), conf in zip(boxes, detections.conf[order])
+    ]
+
+def _best_plate_crop(detections, image_np):
+    if len(detections.conf) == 0:
+        logger.info("No license plate detected")
+        return None
+
+    best = int(np.argmax(detections.conf))
+    x1, y1, x2, y2 = _padded_boxes(detections.xyxy[best:best + 1], image_np.shape)[0]
+    logger.info(f"Plate detected with confidence: {detections.conf[best]:.2f}")
+    return image_np[y1:y2, x1:x2]
+
+def _characters_with_confidences(detections):
+    """Plate string read left to right plus each character's OCR confidence."""
+    if len(detections.conf) == 0:
+        logger.info("No characters detected")
+        return "", []
+
+    x_centers = (detections.xyxy[:, 0] + detections.xyxy[:, 2]) * 0.5
+    order = np.argsort(x_centers, kind='stable')
+    names = detections.names
+    ocr_string = "".join(names[class_id] for class_id in detections.cls[order].tolist())
+    logger.info(f"OCR result: {ocr_string}")
+    return ocr_string, [round(float(conf), 4) for conf in detections.conf[order]]
+
+def _characters_from_result(detections):
+    return _characters_with_confidences(detections)[0]
 
 def detect_and_crop_plate(image_np):
     if image_np is None:
         logger.error("No image data for plate detection")
         return None
 
-    results = lpd_model(image_np, conf=0.5, iou=0.5, verbose=False)
-    best_plate_crop = None
-    best_confidence = -1
-
-    for r in results:
-        if len(r.boxes) > 0:
-            for box in r.boxes:
-                confidence = box.conf.item()
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                    
-                    padding = 10
-                    x1 = max(0, x1 - padding)
-                    y1 = max(0, y1 - padding)
-                    x2 = min(image_np.shape[1], x2 + padding)
-                    y2 = min(image_np.shape[0], y2 + padding)
-                    
-                    best_plate_crop = image_np[y1:y2, x1:x2]
-
-    if best_plate_crop is not None:
-        logger.info(f"Plate detected with confidence: {best_confidence:.2f}")
-    else:
-        logger.info("No license plate detected")
-    
-    return best_plate_crop
+    return _best_plate_crop(_detect(image_np), image_np)
 
-def recognize_characters_with_yolo(cropped_plate_img):
+def recognize_characters_with_yolo(cropped_plate_img, with_confidences=False):
+    """Plate string for a crop; with_confidences=True returns (string, [conf per char])."""
     if cropped_plate_img is None:
-        return ""
-
-    results = ocr_model(cropped_plate_img, conf=0.1, iou=0.3, verbose=False)
-    detected_chars = []
-
-    for r in results:
-        if len(r.boxes) > 0:
-            for box in r.boxes:
-                coords = box.xyxy.tolist()[0]
-                confidence = box.conf.item()
-                class_id = int(box.cls.item())
-                class_name = r.names[class_id]
-
-                detected_chars.append({
-                    'char': class_name,
-                    'x_center': (coords[0] + coords[2]) / 2,
-                    'confidence': confidence
-                })
-
-            detected_chars.sort(key=lambda x: x['x_center'])
-            ocr_string = "".join([d['char'] for d in detected_chars])
-            logger.info(f"OCR result: {ocr_string}")
-            return ocr_string
-    
-    logger.info("No characters detected")
-    return ""
\ No newline at end of file
+        return ("", []) if with_confidences else ""
+
+    text, confidences = _characters_with_confidences(_run_ocr(cropped_plate_img))
+    return (text, confidences) if with_confidences else text
+
+def detect_plates(image_np, camera_id=None):
+    """All plates above the LPD threshold, highest confidence first.
+
+    Each entry has 'crop' (a view into ``image_np``), 'confidence' and the
+    padded 'box' as [x1, y1, x2, y2]. With FRAME_GATE_ENABLED only the
+    camera's ROI is searched; boxes are still in full-frame pixels.
+    """
+    if image_np is None:
+        logger.error("No image data for plate detection")
+        return []
+
+    gate = get_frame_gate()
+    region, origin = gate.region(camera_id, image_np) if gate is not None else (image_np, (0, 0))
+    plates = _plate_crops(_detect(region, origin), image_np)
+    logger.info(f"{len(plates)} plate(s) detected")
+    return plates
+
+def read_plates(image_np, camera_id=None):
+    """Detect every plate in a frame and OCR all crops in one batch.
+
+    Returns [{'plate', 'confidence', 'box', 'char_confidences'}, ...] ordered by detection
+    confidence, so the first entry is what detect_and_crop_plate would pick.
+    With PLATE_CACHE_ENABLED a frame that perceptually matches one read in
+    the last PLATE_CACHE_TTL seconds returns that read without inference.
+    With FRAME_GATE_ENABLED a frame whose ROI shows no motion since the
+    camera's last frame returns that camera's previous read.
+    """
+    try:
+        results = _read_plates(image_np, camera_id)
+    except InferenceTimeoutError:
+        OCR_FAILURES.labels('timeout').inc()
+        raise
+    except Exception:
+        OCR_FAILURES.labels('error').inc()
+        raise
+    count_reads(results)
+    return results
+
+def _read_plates(image_np, camera_id):
+    if image_np is None:
+        logger.error("No image data for plate detection")
+        return []
+
+    cache = get_plate_cache()
+    if cache is not None:
+        with observe_stage('plate_cache'):
+            cache_key = cache.key(image_np)
+            cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Plate cache hit: {[p['plate'] for p in cached]}")
+            return [dict(p) for p in cached]
+
+    gate = get_frame_gate()
+    if gate is not None:
+        with observe_stage('frame_gate'):
+            region, _ = gate.region(camera_id, image_np)
+            previous = gate.check(camera_id, region)
+        if previous is not None:
+            logger.info(f"No motion on camera {camera_id}; reusing {[p['plate'] for p in previous]}")
+            return previous
+
+    started = time.perf_counter()
+    plates = detect_plates(image_np, camera_id)
+    reads = _read_characters_batch([p['crop'] for p in plates]) if plates else []
+    results = [
+        {'plate': text, 'confidence': p['confidence'], 'box': p['box'], 'char_confidences': confidences}
+        for p, (text, confidences) in zip(plates, reads)
+    ]
+
+    if gate is not None:
+        gate.record(camera_id, region, results, (time.perf_counter() - started) * 1000)
+    if cache is not None:
+        cache.put(cache_key, [dict(p) for p in results])
+    return results
+
+def _run_many(scheduler, predict_batch, images):
+    if scheduler is not None:
+        # Let the scheduler merge these with concurrent single-frame requests
+        return _await_results(scheduler, [scheduler.submit(image_np) for image_np in images])
+
+    results = []
+    step = Config.INFERENCE_MAX_BATCH_SIZE
+    for i in range(0, len(images), step):
+        results.extend(predict_batch(images[i:i + step]))
+    return results
+
+def detect_and_crop_plates_batch(images):
+    """Best plate crop per image, running LPD over the list in batches."""
+    crops = [None] * len(images)
+    valid = [i for i, image_np in enumerate(images) if image_np is not None]
+    if not valid:
+        return crops
+
+    with observe_stage('lpd'):
+        inputs = [_lpd_input(images[i]) for i in valid]
+        results = _run_many(lpd_scheduler, _predict_lpd_batch, [small for small, _ in inputs])
+    for i, result, (_, scale) in zip(valid, results, inputs):
+        crops[i] = _best_plate_crop(_to_frame(result, scale), images[i])
+    return crops
+
+def _read_characters_batch(cropped_plates):
+    reads = [("", [])] * len(cropped_plates)
+    valid = [i for i, crop in enumerate(cropped_plates) if crop is not None]
+    if not valid:
+        return reads
+
+    with observe_stage('ocr'):
+        results = _run_many(ocr_scheduler, _predict_ocr_batch, [cropped_plates[i] for i in valid])
+    for i, result in zip(valid, results):
+        reads[i] = _characters_with_confidences(result)
+    return reads
+
+def recognize_characters_batch(cropped_plates):
+    """Plate string per crop, running OCR over the list in batches."""
+    return [text for text, _ in _read_characters_batch(cropped_plates)]
@@ -0,0 +1,169 @@
+"""Bounded bcrypt executor for the /auth routes.
+
+At BCRYPT_ROUNDS=12 one hash or check costs ~250 ms of CPU. Running it
+inline let a login burst occupy every request thread and, since the
+routes hashed inside ``get_db_connection()``, every pooled connection too.
+Now the routes read what they need, give the connection back, and hand
+bcrypt to a fixed pool of PASSWORD_HASH_WORKERS threads (bcrypt releases
+the GIL, so they run in parallel). At most PASSWORD_HASH_MAX_QUEUE more
+calls may wait. Beyond that the caller gets HasherBusyError, which the
+routes turn into 429 with Retry-After.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ..config import Config
+    from ..utils.auth import hash_password, check_password, password_needs_rehash
+    from ..utils.database import get_db_connection
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.auth import hash_password, check_password, password_needs_rehash
+    from app.utils.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open-ended
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500)
+
+
+class HasherBusyError(RuntimeError):
+    """Every worker is busy and the wait queue is full."""
+
+
+class PasswordHasher:
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._ops = {}
+
+    def _record(self, op, wait_ms, run_ms):
+        with self._lock:
+            stats = self._ops.setdefault(op, {
+                'calls': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0,
+                'run_ms_total': 0.0, 'run_ms_max': 0.0, 'latency_hist': {},
+            })
+            stats['calls'] += 1
+            stats['wait_ms_total'] += wait_ms
+            stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+            stats['run_ms_total'] += run_ms
+            stats['run_ms_max'] = max(stats['run_ms_max'], run_ms)
+            total = wait_ms + run_ms
+            bucket = next((f"<={b}" for b in LATENCY_BUCKETS_MS if total <= b), f">{LATENCY_BUCKETS_MS[-1]}")
+            stats['latency_hist'][bucket] = stats['latency_hist'].get(bucket, 0) + 1
+
+    def _submit(self, op, fn, *args, limit=None):
+        with self._lock:
+            if self._pending >= (self.workers + self.max_queue if limit is None else limit):
+                self.rejected += 1
+                raise HasherBusyError(f"Password hashing is saturated ({self._pending} pending)")
+            self._pending += 1
+        submitted = time.monotonic()
+
+        def run():
+            started = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.monotonic()
+                self._record(op, (started - submitted) * 1000, (finished - started) * 1000)
+                with self._lock:
+                    self._pending -= 1
+
+        return self._executor.submit(run)
+
+    def hash(self, password):
+        return self._submit('hash', hash_password, password).result()
+
+    def verify(self, password, hashed):
+        return self._submit('verify', check_password, password, hashed).result()
+
+    async def hash_async(self, password):
+        return await asyncio.wrap_future(self._submit('hash', hash_password, password))
+
+    async def verify_async(self, password, hashed):
+        return await asyncio.wrap_future(self._submit('verify', check_password, password, hashed))
+
+    def rehash_if_needed(self, user_id, password, hashed):
+        """After a successful login, re-hash at the current BCRYPT_ROUNDS in the background.
+
+        Best effort: it only uses an idle worker, never a queue slot a login
+        could need, and when none is free the next login tries again.
+        """
+        if not password_needs_rehash(hashed):
+            return
+        try:
+            future = self._submit('hash', hash_password, password, limit=self.workers)
+        except HasherBusyError:
+            return
+
+        def store(done):
+            try:
+                with get_db_connection() as (db, cursor):
+                    # Only replace the hash we verified, never a password changed meanwhile
+                    cursor.execute("UPDATE users SET password = %s WHERE user_id = %s AND password = %s",
+                                   (done.result(), user_id, hashed))
+                    db.commit()
+                with self._lock:
+                    self.rehashed += 1
+                logger.info(f"Re-hashed password for user {user_id} at {Config.BCRYPT_ROUNDS} rounds")
+            except Exception as e:
+                logger.warning(f"Could not re-hash password for user {user_id}: {e}")
+
+        future.add_done_callback(store)
+
+    def stats(self):
+        with self._lock:
+            ops = {}
+            for op, stats in self._ops.items():
+                calls = stats['calls']
+                ops[op] = {
+                    'calls': calls,
+                    'wait_ms_avg': round(stats['wait_ms_total'] / calls, 2),
+                    'wait_ms_max': round(stats['wait_ms_max'], 2),
+                    'run_ms_avg': round(stats['run_ms_total'] / calls, 2),
+                    'run_ms_max': round(stats['run_ms_max'], 2),
+                    'latency_hist': dict(stats['latency_hist']),
+                }
+            return {
+                'rounds': Config.BCRYPT_ROUNDS,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self._pending,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'ops': ops,
+            }
+
+
+_hasher = None
+_hasher_pid = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """This process's hasher (recreated after a fork: executor threads do not survive it)."""
+    global _hasher, _hasher_pid
+    pid = os.getpid()
+    if _hasher is None or _hasher_pid != pid:
+        with _hasher_lock:
+            if _hasher is None or _hasher_pid != pid:
+                workers = Config.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+                _hasher = PasswordHasher(workers, Config.PASSWORD_HASH_MAX_QUEUE)
+                _hasher_pid = pid
+    return _hasher
+
+
+def get_password_hasher_stats():
+    return _hasher.stats() if _hasher is not None and _hasher_pid == os.getpid() else {}
@@ -0,0 +1,188 @@
+"""Fold bursts of frames from one camera into a single history event.
+
+A car waiting at the barrier triggers the camera several times within a few
+seconds. With PLATE_EVENTS_ENABLED each frame's best plate read is added to
+the camera's open event (a ``plate_events`` row, locked FOR UPDATE so every
+gunicorn worker sees the same window). The reads are fused by positional
+voting, and the event's one ``history`` row is updated in place. A new
+event, and a new history row, starts when the camera was idle for
+PLATE_EVENTS_WINDOW seconds, the event is older than
+PLATE_EVENTS_MAX_DURATION, or the read clearly belongs to another car.
+"""
+import difflib
+import json
+import logging
+import os
+
+try:
+    from ..config import Config
+    from ..utils.database import get_db_connection
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# history.plate is varchar(12)
+MAX_PLATE_LENGTH = 12
+# plate_events key columns (migration 004)
+MAX_CAMERA_ID_LENGTH = 64
+MAX_STATUS_LENGTH = 16
+
+
+def _read_weight(read):
+    confidences = read.get('char_confidences') or []
+    mean_char = sum(confidences) / len(confidences) if confidences else 0.5
+    return read.get('confidence', 0.0) * mean_char
+
+
+def fuse_reads(reads):
+    """Positional vote over several reads of the same plate.
+
+    ``reads`` are read_plates() entries ('plate', 'confidence',
+    'char_confidences'). The plate length is chosen first, weighted by
+    detection confidence times mean character confidence. Then each position
+    takes the character with the highest summed OCR confidence among the
+    reads of that length. Returns (plate, confidence), where confidence is
+    the mean winning-character confidence per read of that length.
+    """
+    candidates = [read for read in reads if read.get('plate')]
+    if not candidates:
+        return "", 0.0
+
+    length_scores = {}
+    for read in candidates:
+        length = len(read['plate'])
+        length_scores[length] = length_scores.get(length, 0.0) + _read_weight(read)
+    length = max(length_scores, key=lambda size: (length_scores[size], size))
+    same_length = [read for read in candidates if len(read['plate']) == length]
+
+    chars, position_confidences = [], []
+    for position in range(length):
+        scores = {}
+        for read in same_length:
+            confidences = read.get('char_confidences') or []
+            score = confidences[position] if position < len(confidences) else read.get('confidence', 0.0)
+            char = read['plate'][position]
+            scores[char] = scores.get(char, 0.0) + score
+        char = max(scores, key=scores.get)
+        chars.append(char)
+        position_confidences.append(scores[char] / len(same_length))
+
+    return "".join(chars), round(sum(position_confidences) / length, 4)
+
+
+def same_vehicle(event_plate, plate):
+    """False only when both reads are non-empty and clearly different plates."""
+    if not event_plate or not plate:
+        return True
+    ratio = difflib.SequenceMatcher(None, event_plate, plate).ratio()
+    return ratio >= Config.PLATE_EVENTS_MIN_SIMILARITY
+
+
+def record_frame(camera_id, status, read, subject, description, store_image):
+    """Add one frame to the camera's open event, or start a new event.
+
+    ``read`` is the frame's best read_plates() entry or None. ``store_image``
+    is called with the cursor when this frame should become the event's
+    image (first frame, or a more confident plate than before). It must
+    insert the image on that cursor and return its image_id. The images row
+    it replaces is deleted in the same transaction; its file is left to
+    prune_orphans(), since identical bytes may back another row. Returns
+    the event as a dict.
+    """
+    camera_id = camera_id[:MAX_CAMERA_ID_LENGTH]
+    status = status[:MAX_STATUS_LENGTH]
+    plate = (read or {}).get('plate', '')
+    confidence = (read or {}).get('confidence', 0.0)
+
+    with get_db_connection() as (db, cursor):
+        # Creates the row on a camera's first frame. On a duplicate key this takes
+        # the row's exclusive lock at once; INSERT IGNORE would take a shared
+        # lock, and two workers upgrading it with FOR UPDATE would deadlock.
+        cursor.execute(
+            """INSERT INTO plate_events (camera_id, status, frame_reads, first_seen, last_seen)
+               VALUES (%s, %s, '[]', NOW(3), NOW(3))
+               ON DUPLICATE KEY UPDATE camera_id = camera_id""",
+            (camera_id, status)
+        )
+        cursor.execute(
+            """SELECT history_id, image_id, plate, best_confidence, frames, frame_reads,
+                      TIMESTAMPDIFF(MICROSECOND, last_seen, NOW(3)) / 1000000 AS idle_seconds,
+                      TIMESTAMPDIFF(MICROSECOND, first_seen, NOW(3)) / 1000000 AS age_seconds
+               FROM plate_events WHERE camera_id = %s AND status = %s FOR UPDATE""",
+            (camera_id, status)
+        )
+        event = cursor.fetchone()
+
+        is_open = (
+            event['frames'] > 0
+            and event['history_id'] is not None
+            and float(event['idle_seconds']) <= Config.PLATE_EVENTS_WINDOW
+            and float(event['age_seconds']) <= Config.PLATE_EVENTS_MAX_DURATION
+            and same_vehicle(event['plate'], plate)
+        )
+        if is_open:
+            reads = json.loads(event['frame_reads'])
+            history_id, image_id = event['history_id'], event['image_id']
+            best_confidence, frames = event['best_confidence'], event['frames']
+        else:
+            reads, history_id, image_id, best_confidence, frames = [], None, None, 0.0, 0
+
+        if plate:
+            reads.append({
+                'plate': plate,
+                'confidence': round(confidence, 4),
+                'char_confidences': read.get('char_confidences') or [],
+            })
+            # Keep the most convincing reads once the window gets long
+            reads = sorted(reads, key=_read_weight, reverse=True)[:Config.PLATE_EVENTS_MAX_READS]
+        fused_plate, fused_confidence = fuse_reads(reads)
+        fused_plate = fused_plate[:MAX_PLATE_LENGTH]
+
+        image_stored, superseded_image_id = False, None
+        if image_id is None or confidence > best_confidence:
+            new_image_id = store_image(cursor)
+            if new_image_id:
+                superseded_image_id = image_id
+                image_id, best_confidence, image_stored = new_image_id, confidence, True
+
+        if history_id is None:
+            cursor.execute(
+                "INSERT INTO history (plate, subject, description, image_id) VALUES (%s, %s, %s, %s)",
+                (fused_plate, subject, description, image_id)
+            )
+            history_id = cursor.lastrowid
+        else:
+            cursor.execute(
+                "UPDATE history SET plate = %s, image_id = %s WHERE history_id = %s",
+                (fused_plate, image_id, history_id)
+            )
+
+        frames += 1
+        cursor.execute(
+            """UPDATE plate_events
+               SET history_id = %s, image_id = %s, plate = %s, best_confidence = %s, frames = %s, frame_reads = %s,
+                   first_seen = IF(%s, first_seen, NOW(3)), last_seen = NOW(3)
+               WHERE camera_id = %s AND status = %s""",
+            (history_id, image_id, fused_plate, best_confidence, frames, json.dumps(reads),
+             is_open, camera_id, status)
+        )
+        if superseded_image_id is not None:
+            # Only this event's history row pointed at it, and that now has the new image
+            cursor.execute("DELETE FROM images WHERE image_id = %s", (superseded_image_id,))
+        db.commit()
+
+    if is_open:
+        logger.info(f"Camera {camera_id}: frame {frames} merged into history {history_id} as {fused_plate!r}")
+    return {
+        'history_id': history_id,
+        'image_id': image_id,
+        'plate': fused_plate,
+        'confidence': fused_confidence,
+        'frames': frames,
+        'new_event': not is_open,
+        'image_stored': image_stored,
+    }
@@ -0,0 +1,343 @@
+"""In-memory index of distinct plates for /api/plates/search.
+
+The OCR misreads plates in predictable ways: O/0, B/8 and I/1 (and a few
+more lookalikes) swap, and characters get dropped. Plates are normalised
+to upper-case letters and digits, then folded so every lookalike group
+maps to one character; ``B1234OX`` and ``81234OX`` fold to the same
+string.
+
+- Candidates come from an inverted index of the folded plates' bigrams.
+  A search counts the bigrams each plate shares with the query (numpy
+  over the postings), so its cost depends on those postings, not on the
+  size of history. One edit changes at most two bigrams, so a plate
+  within ``max_distance`` shares at least ``len(bigrams) - 2 * distance``.
+- Candidates are ranked by an edit distance in which a lookalike
+  substitution costs CONFUSION_COST and any other edit costs 1.
+
+The index is built once from a ``GROUP BY plate`` over history: in
+gunicorn's master when the app is preloaded, so workers inherit it at
+fork, otherwise on a background thread in each worker.
+Before a search, a worker reads ``history_id > floor`` when the history
+signal file (see events.py) changed or PLATE_SEARCH_REFRESH_SECONDS
+passed. It re-reads the last PLATE_SEARCH_LOOKBACK_ROWS rows too, which
+picks up plates set later by UPDATE (async OCR jobs, multi-frame events).
+A plate that no longer has rows stays indexed but is dropped from
+results, since it has no recent events.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+
+import numpy as np
+
+try:
+    from ..config import Config
+    from ..utils.database import get_db_connection
+    from ..utils.signal_file import signal_state
+    from .events import event_payload, history_signal_path
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import get_db_connection
+    from app.utils.signal_file import signal_state
+    from app.services.events import event_payload, history_signal_path
+
+logger = logging.getLogger(__name__)
+
+# First character of each group is the one the others fold to
+CONFUSION_GROUPS = ('0ODQ', '1IL', '8B', '5S', '2Z', '6G')
+FOLD = {ch: group[0] for group in CONFUSION_GROUPS for ch in group}
+FOLD_CODES = np.arange(256, dtype=np.uint8)
+FOLD_CODES[[ord(ch) for ch in FOLD]] = [ord(folded) for folded in FOLD.values()]
+CONFUSION_COST = 0.25
+MAX_CANDIDATES = 2000
+BUILD_FETCH_SIZE = 10000
+REFRESH_BATCH = 5000
+BUILD_RETRY_SECONDS = 30
+
+BUILD_SQL = "SELECT plate, MAX(history_id) AS last_id FROM history WHERE plate <> '' GROUP BY plate"
+MAX_ID_SQL = "SELECT MAX(history_id) AS history_id FROM history"
+SINCE_SQL = "SELECT history_id, plate FROM history WHERE history_id > %s ORDER BY history_id LIMIT %s"
+RECENT_EVENTS_SQL = """SELECT history_id, plate, subject, image_id, date FROM history
+                       WHERE plate = %s ORDER BY date DESC, history_id DESC LIMIT %s"""
+
+_NOT_PLATE = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_plate(value):
+    return _NOT_PLATE.sub('', (value or '').upper())
+
+
+def fold_plate(normalized):
+    return ''.join(FOLD.get(ch, ch) for ch in normalized)
+
+
+def plate_bigrams(folded):
+    padded = f"^{folded}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def plate_distances(query, plates):
+    """Edit distance from ``query`` to each normalised plate; lookalike substitutions cost CONFUSION_COST.
+
+    One Levenshtein table for all plates at once: every cell is a numpy
+    operation across the candidates, so the Python loop is only
+    len(query) x len(longest plate).
+    """
+    width = max(map(len, plates))
+    padded = ''.join(plate.ljust(width, '\0') for plate in plates).encode('ascii')
+    codes = np.frombuffer(padded, dtype=np.uint8).reshape(len(plates), width)
+    folded = FOLD_CODES[codes]
+    previous = np.tile(np.arange(width + 1, dtype=np.float32), (len(plates), 1))
+    for i, ch in enumerate(query.encode('ascii'), 1):
+        substitution = np.where(codes == ch, 0.0, np.where(folded == FOLD_CODES[ch], CONFUSION_COST, 1.0))
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        for j in range(1, width + 1):
+            current[:, j] = np.minimum(np.minimum(previous[:, j], current[:, j - 1]) + 1,
+                                       previous[:, j - 1] + substitution[:, j - 1])
+        previous = current
+    return previous[np.arange(len(plates)), [len(plate) for plate in plates]]
+
+
+class PlateIndex:
+    """Distinct plates with their newest history_id and a bigram inverted index over them."""
+
+    def __init__(self, signal_file, refresh_seconds=2.0, lookback_rows=1000):
+        self.signal_file = signal_file
+        self.refresh_seconds = refresh_seconds
+        self.lookback_rows = lookback_rows
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._ids = {}
+        self._plates = []
+        self._normalized = []
+        self._last_ids = []
+        self._lengths = array('H')
+        self._postings = {}
+        self._floor = 0
+        self._signal_seen = None
+        self._refreshed_at = 0.0
+        self.built_by_pid = None
+        self.build_seconds = None
+        self.searches = 0
+        self.refreshes = 0
+        self.rows_read = 0
+        self.errors = 0
+
+    def _add(self, plate, last_id):
+        """Index ``plate`` (caller holds the lock); an existing plate only moves its last_id."""
+        plate_id = self._ids.get(plate)
+        if plate_id is not None:
+            self._last_ids[plate_id] = max(self._last_ids[plate_id], last_id)
+            return
+        normalized = normalize_plate(plate)
+        if not normalized:
+            return
+        plate_id = len(self._plates)
+        self._ids[plate] = plate_id
+        self._plates.append(plate)
+        self._normalized.append(normalized)
+        self._last_ids.append(last_id)
+        self._lengths.append(min(len(normalized), 0xFFFF))
+        for gram in plate_bigrams(fold_plate(normalized)):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('i')
+            postings.append(plate_id)
+
+    def build(self):
+        """Load every distinct plate. Run on a fresh index, before anyone searches it."""
+        started = time.monotonic()
+        signal = signal_state(self.signal_file)
+        with get_db_connection() as (db, cursor):
+            # Read first: rows committed during the scan are picked up by the next refresh
+            cursor.execute(MAX_ID_SQL)
+            row = cursor.fetchone()
+            floor = (row['history_id'] if row else None) or 0
+            cursor.execute(BUILD_SQL)
+            while True:
+                rows = cursor.fetchmany(BUILD_FETCH_SIZE)
+                if not rows:
+                    break
+                with self._lock:
+                    for row in rows:
+                        self._add(row['plate'], row['last_id'])
+        with self._lock:
+            self._floor = floor
+            self._signal_seen = signal
+            self._refreshed_at = time.monotonic()
+            self.built_by_pid = os.getpid()
+            self.build_seconds = round(time.monotonic() - started, 3)
+        logger.info(f"Plate index built: {len(self._plates)} plates in {self.build_seconds}s")
+
+    def refresh(self, force=False):
+        """Fold in history rows committed since the last refresh; False when none was due."""
+        signal = signal_state(self.signal_file)
+        with self._lock:
+            due = (force or signal != self._signal_seen
+                   or time.monotonic() - self._refreshed_at >= self.refresh_seconds)
+            after = max(0, self._floor - self.lookback_rows)
+        if not due:
+            return False
+        # Another thread is already refreshing; search what is there
+        if not self._refresh_lock.acquire(blocking=force):
+            return False
+        try:
+            rows_read = 0
+            with get_db_connection() as (db, cursor):
+                while True:
+                    cursor.execute(SINCE_SQL, (after, REFRESH_BATCH))
+                    rows = cursor.fetchall()
+                    with self._lock:
+                        for row in rows:
+                            if row['plate']:
+                                self._add(row['plate'], row['history_id'])
+                    rows_read += len(rows)
+                    if rows:
+                        after = rows[-1]['history_id']
+                    if len(rows) < REFRESH_BATCH:
+                        break
+            with self._lock:
+                self._floor = max(self._floor, after)
+                self._signal_seen = signal
+                self._refreshed_at = time.monotonic()
+                self.refreshes += 1
+                self.rows_read += rows_read
+            return True
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, query, max_distance, limit):
+        """Up to ``limit`` (plate, distance) for a normalised query, closest first.
+
+        Ties go to the plate seen most recently.
+        """
+        grams = plate_bigrams(fold_plate(query))
+        required = max(1, len(grams) - 2 * int(max_distance))
+        with self._lock:
+            self.searches += 1
+            postings = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not postings:
+                return []
+            counts = np.bincount(np.concatenate([np.frombuffer(p, dtype=np.intc) for p in postings]))
+            candidates = np.flatnonzero(counts >= required)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint16)[candidates].astype(np.intc)
+            candidates = candidates[np.abs(lengths - len(query)) <= max_distance]
+            if len(candidates) > MAX_CANDIDATES:
+                candidates = candidates[np.argpartition(counts[candidates], -MAX_CANDIDATES)[-MAX_CANDIDATES:]]
+            if not len(candidates):
+                return []
+            candidates = candidates.tolist()
+            plates = [self._plates[i] for i in candidates]
+            normalized = [self._normalized[i] for i in candidates]
+            last_ids = np.array([self._last_ids[i] for i in candidates], dtype=np.int64)
+
+        distances = plate_distances(query, normalized)
+        order = np.lexsort((-last_ids, distances))
+        order = order[distances[order] <= max_distance][:limit]
+        return [(plates[i], round(float(distances[i]), 2)) for i in order.tolist()]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'plates': len(self._plates),
+                'bigrams': len(self._postings),
+                'floor_history_id': self._floor,
+                'built_by_pid': self.built_by_pid,
+                'build_seconds': self.build_seconds,
+                'searches': self.searches,
+                'refreshes': self.refreshes,
+                'rows_read': self.rows_read,
+                'errors': self.errors,
+                'signal_file': self.signal_file,
+            }
+
+
+_index = None
+_start_pid = None
+_start_failed_at = None
+_start_lock = threading.Lock()
+
+
+def build_plate_index():
+    """Build the index now and make it this process's (and its future forks')."""
+    global _index
+    index = PlateIndex(history_signal_path(), Config.PLATE_SEARCH_REFRESH_SECONDS, Config.PLATE_SEARCH_LOOKBACK_ROWS)
+    index.build()
+    _index = index
+    return index
+
+
+def start_plate_index():
+    """Once per process: build the index on a background thread, or catch up the one inherited from the master.
+
+    A failed build is retried after BUILD_RETRY_SECONDS.
+    """
+    global _start_pid
+    pid = os.getpid()
+    if not Config.PLATE_SEARCH_ENABLED or _start_pid == pid:
+        return
+    with _start_lock:
+        if _start_pid == pid:
+            return
+        if _start_failed_at is not None and time.monotonic() - _start_failed_at < BUILD_RETRY_SECONDS:
+            return
+        _start_pid = pid
+    threading.Thread(target=_prepare_index, name='plate-index', daemon=True).start()
+
+
+def _prepare_index():
+    global _start_pid, _start_failed_at
+    try:
+        if _index is None:
+            build_plate_index()
+        else:
+            _index.refresh(force=True)
+    except Exception as e:
+        logger.warning(f"Plate index build failed: {e}")
+        if _index is None:
+            with _start_lock:
+                _start_pid, _start_failed_at = None, time.monotonic()
+
+
+def get_plate_index():
+    """The plate index, or None while it is being built (or when PLATE_SEARCH_ENABLED is off)."""
+    return _index if Config.PLATE_SEARCH_ENABLED else None
+
+
+def get_plate_search_stats():
+    if _index is None:
+        return {}
+    stats = _index.stats()
+    stats['inherited'] = _index.built_by_pid != os.getpid()
+    return stats
+
+
+def search_plates(index, query, max_distance, limit, events_per_plate):
+    """Ranked plates close to ``query``, each with its most recent history rows."""
+    matches = index.search(query, max_distance, limit)
+    if not matches:
+        return []
+    results = []
+    with get_db_connection() as (db, cursor):
+        for plate, distance in matches:
+            cursor.execute(RECENT_EVENTS_SQL, (plate, events_per_plate))
+            events = [event_payload(row) for row in cursor.fetchall()]
+            if not events:
+                continue  # every row for it was deleted or re-read as another plate
+            results.append({
+                'plate': plate,
+                'distance': distance,
+                'last_seen': events[0]['date'],
+                'events': events,
+            })
+    return results
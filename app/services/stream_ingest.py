@@ -0,0 +1,288 @@
+"""Incremental JPEG stream ingest for long-lived camera uploads.
+
+A camera (or scripts/replay_stream.py) POSTs one chunked request whose body
+is a sequence of JPEG frames: an MJPEG ``multipart/x-mixed-replace`` body
+or plain back-to-back JPEGs. JpegStreamParser pulls whole frames out of the
+byte stream by walking the JPEG markers, so multipart boundaries and
+headers are skipped without being parsed. EXIF thumbnails inside APP
+segments do not end a frame early.
+
+The reading thread only parses and samples. Sampled frames go into a small
+drop-oldest queue that one consumer thread drains through the normal
+detection pipeline. When OCR falls behind, stale frames are discarded
+instead of the request buffering the whole stream.
+"""
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SOI = b'\xff\xd8'
+# Markers without a length field
+_STANDALONE = {0x01} | set(range(0xd0, 0xd8))
+
+
+class JpegStreamParser:
+    """Feed arbitrary byte chunks, get complete JPEG frames back."""
+
+    def __init__(self, max_frame_bytes):
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._pos = 0  # scan position inside the current frame
+        self._in_frame = False
+        self._in_scan = False
+        self.discarded = 0  # truncated or over max_frame_bytes
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+
+        if self._in_frame and len(self._buffer) > self.max_frame_bytes:
+            # No end marker within the limit: drop it and resync on the next SOI
+            self.discarded += 1
+            self._reset(self._buffer.find(SOI, 2))
+        elif not self._in_frame and len(self._buffer) > 1:
+            # Keep the last byte in case it is the first half of an SOI
+            del self._buffer[:-1]
+        return frames
+
+    def _reset(self, start):
+        if start < 0:
+            self._buffer.clear()
+        else:
+            del self._buffer[:start]
+        self._pos = 0
+        self._in_frame = False
+        self._in_scan = False
+
+    def _next_frame(self):
+        buf = self._buffer
+        if not self._in_frame:
+            start = buf.find(SOI)
+            if start < 0:
+                return None
+            del buf[:start]
+            self._pos = 2
+            self._in_frame = True
+            self._in_scan = False
+
+        while True:
+            if self._in_scan:
+                # Entropy-coded data: FF 00 is a stuffed byte, FF D0-D7 a restart marker
+                index = buf.find(b'\xff', self._pos)
+                if index < 0 or index + 1 >= len(buf):
+                    self._pos = max(self._pos, len(buf) - 1)
+                    return None
+                marker = buf[index + 1]
+                if marker == 0x00 or 0xd0 <= marker <= 0xd7 or marker == 0xff:
+                    self._pos = index + 1
+                    continue
+                self._in_scan = False
+                self._pos = index
+                continue
+
+            if self._pos + 1 >= len(buf):
+                return None
+            if buf[self._pos] != 0xff:
+                # Not a JPEG after all; resync on the next SOI
+                self._reset(buf.find(SOI, 1))
+                return None
+            marker = buf[self._pos + 1]
+            if marker == 0xff:
+                self._pos += 1  # fill byte
+                continue
+            if marker == 0xd8:
+                # A new frame started before this one ended: it was truncated
+                self.discarded += 1
+                self._reset(self._pos)
+                self._pos = 2
+                self._in_frame = True
+                continue
+            if marker == 0xd9:
+                end = self._pos + 2
+                frame = bytes(buf[:end])
+                self._reset(end)
+                return frame
+            if marker in _STANDALONE:
+                self._pos += 2
+                continue
+            if self._pos + 4 > len(buf):
+                return None
+            length = (buf[self._pos + 2] << 8) | buf[self._pos + 3]
+            if self._pos + 2 + length > len(buf):
+                return None
+            self._pos += 2 + length
+            if marker == 0xda:
+                self._in_scan = True
+
+
+class DropOldestQueue:
+    """Bounded hand-off between the reader and the consumer thread."""
+
+    def __init__(self, maxsize):
+        self._items = collections.deque()
+        self._maxsize = max(1, maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def close(self, discard=False):
+        """No more puts; with ``discard`` the pending items are dropped too."""
+        with self._cond:
+            self._closed = True
+            if discard:
+                self.dropped += len(self._items)
+                self._items.clear()
+            self._cond.notify_all()
+
+    def get(self):
+        """Next item, or None once the queue is closed and drained."""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            return self._items.popleft() if self._items else None
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StreamSession:
+    """Parse, sample and process one camera stream.
+
+    ``process(index, frame_bytes)`` runs on the consumer thread for every
+    sampled frame that was not dropped, and returns a JSON-able result.
+    """
+
+    def __init__(self, process, sample_fps, queue_size, max_frame_bytes, keep_results=50):
+        self.process = process
+        self.min_interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        self.parser = JpegStreamParser(max_frame_bytes)
+        self.queue = DropOldestQueue(queue_size)
+        self._results = collections.deque(maxlen=keep_results)
+        self._results_lock = threading.Lock()
+        self.bytes_received = 0
+        self.frames_received = 0
+        self.frames_sampled = 0
+        self.frames_processed = 0
+        self.errors = 0
+        self._next_due = 0.0
+        self._started = time.monotonic()
+        self._consumer = threading.Thread(target=self._consume, name="stream-ingest", daemon=True)
+        self._consumer.start()
+
+    def feed(self, chunk):
+        self.bytes_received += len(chunk)
+        now = time.monotonic()
+        for frame in self.parser.feed(chunk):
+            self.frames_received += 1
+            if now < self._next_due:
+                continue
+            # Fixed schedule, so arrival jitter does not lower the sampled rate;
+            # restart it after a gap (first frame, stalled camera)
+            late = now - self._next_due
+            self._next_due = (self._next_due if late < self.min_interval else now) + self.min_interval
+            self.frames_sampled += 1
+            self.queue.put((self.frames_received - 1, frame))
+
+    def _consume(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                index, frame = item
+                try:
+                    result = self.process(index, frame)
+                    self.frames_processed += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Stream frame {index} failed: {e}")
+                    result = {'frame': index, 'success': False, 'message': str(e)}
+                with self._results_lock:
+                    self._results.append(result)
+        finally:
+            # The stream keeps its slot until OCR on it has really stopped
+            _release(self.summary())
+
+    def finish(self, timeout):
+        """Stop accepting frames and wait up to ``timeout`` for the queue to drain.
+
+        Frames still pending after that are dropped; the frame being read
+        finishes in the background and the summary reports ``drained: False``.
+        """
+        self.queue.close()
+        self._consumer.join(timeout)
+        if self._consumer.is_alive():
+            self.queue.close(discard=True)
+        return self.summary()
+
+    def results(self):
+        """Copy of the latest per-frame results (the consumer may still be adding one)."""
+        with self._results_lock:
+            return list(self._results)
+
+    def summary(self):
+        return {
+            'duration_seconds': round(time.monotonic() - self._started, 3),
+            'bytes_received': self.bytes_received,
+            'frames_received': self.frames_received,
+            'frames_sampled': self.frames_sampled,
+            'frames_dropped': self.queue.dropped,
+            'frames_processed': self.frames_processed,
+            'frames_pending': len(self.queue),
+            'frames_discarded': self.parser.discarded,
+            'errors': self.errors,
+            'drained': not self._consumer.is_alive(),
+        }
+
+
+_stats_lock = threading.Lock()
+_active = 0
+_totals = {'streams': 0, 'rejected': 0, 'frames_received': 0, 'frames_sampled': 0,
+           'frames_dropped': 0, 'frames_processed': 0, 'errors': 0}
+
+
+def open_session(max_active, process, sample_fps, queue_size, max_frame_bytes):
+    """A new StreamSession, or None when this process already runs ``max_active`` streams."""
+    global _active
+    with _stats_lock:
+        if _active >= max_active:
+            _totals['rejected'] += 1
+            return None
+        _active += 1
+        _totals['streams'] += 1
+    try:
+        return StreamSession(process, sample_fps, queue_size, max_frame_bytes)
+    except Exception:
+        _release({})
+        raise
+
+
+def _release(summary):
+    global _active
+    with _stats_lock:
+        _active -= 1
+        for key in ('frames_received', 'frames_sampled', 'frames_dropped', 'frames_processed', 'errors'):
+            _totals[key] += summary.get(key, 0)
+
+
+def get_stream_stats():
+    with _stats_lock:
+        if not _totals['streams'] and not _totals['rejected']:
+            return {}
+        return {'active': _active, **_totals}
@@ -0,0 +1,235 @@
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+try:
+    from ..config import Config
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'jpg': ('JPEG', 'image/jpeg', 'jpg'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+
+
+def parse_variant_args(args):
+    """Variant spec from ?w=&h=&q=&fmt=, or None when the original is wanted.
+
+    Returns a dict with w, h (None = unbounded), q and fmt; raises ValueError
+    on bad input.
+    """
+    if not any(args.get(name) for name in ('w', 'h', 'q', 'fmt')):
+        return None
+
+    def _dimension(name):
+        value = args.get(name)
+        if not value:
+            return None
+        size = int(value)
+        if size < 1 or size > Config.VARIANT_MAX_DIMENSION:
+            raise ValueError(f'{name} must be between 1 and {Config.VARIANT_MAX_DIMENSION}')
+        return size
+
+    try:
+        width, height = _dimension('w'), _dimension('h')
+        quality = int(args.get('q') or Config.VARIANT_DEFAULT_QUALITY)
+    except ValueError as e:
+        raise ValueError(str(e) if 'must be' in str(e) else 'w, h and q must be integers')
+    if not 1 <= quality <= 95:
+        raise ValueError('q must be between 1 and 95')
+
+    fmt = (args.get('fmt') or 'jpeg').lower()
+    if fmt not in VARIANT_FORMATS:
+        raise ValueError(f"fmt must be one of: {', '.join(sorted(VARIANT_FORMATS))}")
+
+    return {'w': width, 'h': height, 'q': quality, 'fmt': 'jpeg' if fmt == 'jpg' else fmt}
+
+
+def variant_name(content_key, variant):
+    """Cache file name (also the variant ETag) for one rendition of an image."""
+    ext = VARIANT_FORMATS[variant['fmt']][2]
+    return f"{content_key}_{variant['w'] or 0}x{variant['h'] or 0}_q{variant['q']}.{ext}"
+
+
+def variant_mimetype(variant):
+    return VARIANT_FORMATS[variant['fmt']][1]
+
+
+def render_variant(source, variant):
+    """Resize ``source`` (path or bytes) to fit within w x h and encode it.
+
+    For JPEG sources ``draft()`` lets libjpeg decode directly at 1/2, 1/4
+    or 1/8 scale, so a 1080p frame is never fully decoded for a thumbnail;
+    ``thumbnail()`` then finishes with ``reduce()`` plus a small resample.
+    """
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    with Image.open(fp) as img:
+        bound = (variant['w'] or img.width, variant['h'] or img.height)
+        if img.format == 'JPEG':
+            img.draft('RGB', bound)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.thumbnail(bound, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+        pil_format = VARIANT_FORMATS[variant['fmt']][0]
+        out = io.BytesIO()
+        if pil_format == 'JPEG':
+            img.save(out, 'JPEG', quality=variant['q'], optimize=True, progressive=True)
+        else:
+            img.save(out, 'WEBP', quality=variant['q'], method=4)
+        return out.getvalue()
+
+
+class VariantCache:
+    """Size-bounded on-disk LRU of rendered variants.
+
+    File mtime is the recency clock (bumped on every hit), so all gunicorn
+    workers share one cache directory. Each worker keeps an estimate of the
+    total size and rescans the directory when the estimate passes the limit
+    or has not been refreshed for ``rescan_interval`` seconds, then evicts
+    least recently used files down to ``low_water`` of the limit.
+    """
+
+    def __init__(self, root, max_bytes, rescan_interval=60, low_water=0.9):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self._last_scan = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def get(self, name):
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, name, data):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += len(data)
+            due = (self._approx_bytes is None or self._approx_bytes > self.max_bytes
+                   or time.monotonic() - self._last_scan > self.rescan_interval)
+        if due:
+            self.evict()
+        return path
+
+    def _scan(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full_path))
+        return entries
+
+    def evict(self):
+        """Rescan the directory and drop least recently used files if over the limit."""
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * self.low_water
+                for _, size, full_path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(full_path)
+                        self.evicted += 1
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            self._approx_bytes = total
+            self._last_scan = time.monotonic()
+
+    def stats(self):
+        return {
+            'max_bytes': self.max_bytes,
+            'approx_bytes': self._approx_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_variant_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VariantCache(Config.VARIANT_CACHE_DIR, Config.VARIANT_CACHE_MAX_BYTES)
+    return _cache
+
+
+def get_or_render_variant(content_key, variant, load_source):
+    """Path of the cached variant, rendering it from ``load_source()`` on a miss."""
+    cache = get_variant_cache()
+    name = variant_name(content_key, variant)
+    path = cache.get(name)
+    if path is not None:
+        return path
+
+    source = load_source()
+    if source is None:
+        return None
+    return cache.put(name, render_variant(source, variant))
+
+
+def standard_thumbnail_variant():
+    return {'w': Config.THUMBNAIL_WIDTH, 'h': None, 'q': Config.VARIANT_DEFAULT_QUALITY, 'fmt': 'jpeg'}
+
+
+def precompute_thumbnail(content_key, image_bytes):
+    """Render the dashboard thumbnail at upload time so the first view is a hit."""
+    if not Config.THUMBNAIL_PRECOMPUTE or not content_key:
+        return
+    try:
+        get_or_render_variant(content_key, standard_thumbnail_variant(), lambda: image_bytes)
+    except Exception as e:
+        logger.warning(f"Thumbnail precompute failed for {content_key}: {e}")
@@ -1,4 +1,5 @@
-from .database import get_db_connection, connect_to_db
-from .auth import hash_password, check_password
+from .database import get_db_connection, connect_to_db, get_pool_stats, kill_running_query
+from .auth import hash_password, check_password, password_needs_rehash
 
-__all__ = ['get_db_connection', 'connect_to_db', 'hash_password', 'check_password']
+__all__ = ['get_db_connection', 'connect_to_db', 'get_pool_stats', 'kill_running_query', 'hash_password',
+           'check_password', 'password_needs_rehash']
@@ -0,0 +1,131 @@
+"""aiomysql connection pool for the ASGI serving mode (asgi.py).
+
+The async twin of database.py: one pool per worker process, opened on the
+event loop when the app starts serving and closed when it stops. Waiting
+for a connection or a query suspends the request instead of holding a
+thread, so many slow dashboard/image requests share one event loop.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+import pymysql
+
+try:
+    from ..config import Config
+    from .database import PoolTimeoutError
+    from ..services.metrics import timed_cursor
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.utils.database import PoolTimeoutError
+    from app.services.metrics import timed_cursor
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_stats = {
+    'borrows': 0,
+    'timeouts': 0,
+    'discarded': 0,
+    'wait_ms_total': 0.0,
+    'wait_ms_max': 0.0,
+}
+
+
+async def open_async_pool():
+    """Create this process's pool; call from the app's startup hook."""
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            minsize=0,
+            maxsize=Config.ASYNC_DB_POOL_SIZE,
+            pool_recycle=Config.DB_POOL_MAX_LIFETIME or -1,
+            host=Config.DB_HOST,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            db=Config.DB_NAME,
+            port=Config.DB_PORT,
+            autocommit=False,
+        )
+        logger.info(f"Async database pool ready (max {Config.ASYNC_DB_POOL_SIZE} connections, pid {os.getpid()})")
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        pool.close()
+        await pool.wait_closed()
+
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """Async context manager yielding (conn, cursor) with dict rows, like get_db_connection()."""
+    pool = _pool or await open_async_pool()
+    start = time.monotonic()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), Config.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        _stats['timeouts'] += 1
+        message = (
+            f"No database connection available after {Config.DB_POOL_TIMEOUT}s "
+            f"(async pool size {Config.ASYNC_DB_POOL_SIZE})"
+        )
+        logger.error(f"Database error: {message}")
+        raise PoolTimeoutError(message)
+    except Exception as e:
+        logger.error(f"Database error: could not get a connection: {e}")
+        raise
+    waited_ms = (time.monotonic() - start) * 1000
+    _stats['borrows'] += 1
+    _stats['wait_ms_total'] += waited_ms
+    _stats['wait_ms_max'] = max(_stats['wait_ms_max'], waited_ms)
+
+    cursor = None
+    try:
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        yield conn, timed_cursor(cursor, async_cursor=True)
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        if isinstance(e, (pymysql.err.InterfaceError, pymysql.err.OperationalError)):
+            conn.close()
+        raise
+    finally:
+        try:
+            if cursor is not None:
+                await cursor.close()
+            # aiomysql closes connections released mid-transaction; end the
+            # implicit transaction a SELECT opened so the connection is reused
+            if not conn.closed and conn.get_transaction_status():
+                await conn.rollback()
+        except Exception as e:
+            logger.warning(f"Discarding async connection after reset failure: {e}")
+            conn.close()
+        if conn.closed:
+            _stats['discarded'] += 1
+        pool.release(conn)
+
+
+def get_async_pool_stats():
+    """Snapshot of the current process's async pool metrics."""
+    if _pool is None:
+        return {}
+    stats = dict(_stats)
+    borrows = stats['borrows']
+    stats.update({
+        'size': _pool.maxsize,
+        'open': _pool.size,
+        'in_use': _pool.size - _pool.freesize,
+        'idle': _pool.freesize,
+        'wait_ms_avg': round(stats['wait_ms_total'] / borrows, 3) if borrows else 0.0,
+        'wait_ms_total': round(stats['wait_ms_total'], 3),
+        'wait_ms_max': round(stats['wait_ms_max'], 3),
+        'pid': os.getpid(),
+    })
+    return stats
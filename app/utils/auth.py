@@ -16,3 +16,10 @@ def hash_password(password):
 def check_password(password, hashed_password):
     """Verify a password against its hash."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def password_needs_rehash(hashed_password):
+    """True when a hash ($2b$<rounds>$...) was made with other than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split('$')[2]) != Config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
@@ -1,44 +1,295 @@
 import mysql.connector
 import logging
+import os
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
 
 # Import config with fallback
 try:
     from app.config import Config
+    from app.services.metrics import timed_cursor
 except ImportError:
     # Fallback to legacy config
     import sys
-    import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     import config as Config
+    def timed_cursor(cursor): return cursor
 
 logger = logging.getLogger(__name__)
 
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool owned by a single worker process.
+
+    Connections are checked on borrow: ones older than ``max_lifetime`` are
+    recycled, ones idle longer than ``max_idle`` are evicted, and ones idle
+    longer than ``ping_after`` are pinged before being handed out.
+    """
+
+    def __init__(self, size, timeout, max_lifetime, max_idle, pre_ping, ping_after, connect_kwargs):
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.pre_ping = pre_ping
+        self.ping_after = ping_after
+        self._connect_kwargs = connect_kwargs
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'borrows': 0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'evicted_idle': 0,
+            'failed_health_checks': 0,
+            'discarded': 0,
+            'wait_ms_total': 0.0,
+            'wait_ms_max': 0.0,
+        }
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self._connect_kwargs)
+        with self._cond:
+            self._stats['created'] += 1
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _validate(self, pooled):
+        """Return True if an idle connection may be handed out again."""
+        now = time.monotonic()
+        if self.max_lifetime and now - pooled.created_at > self.max_lifetime:
+            self._stats['recycled'] += 1
+            return False
+        if self.max_idle and now - pooled.last_used > self.max_idle:
+            self._stats['evicted_idle'] += 1
+            return False
+        return True
+
+    def acquire(self):
+        """Borrow a connection, waiting up to ``timeout`` seconds for one."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            stale = []
+            pooled = None
+            with self._cond:
+                while True:
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._validate(candidate):
+                            pooled = candidate
+                            break
+                        self._open -= 1
+                        stale.append(candidate)
+                    if pooled is not None or self._open < self.size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.size})"
+                        )
+                    self._cond.wait(remaining)
+                # Reserve the slot before doing any network I/O outside the lock
+                if pooled is None:
+                    self._open += 1
+                self._in_use += 1
+
+            for candidate in stale:
+                self._close_quietly(candidate.conn)
+
+            try:
+                if pooled is None:
+                    pooled = self._connect()
+                elif self.pre_ping and time.monotonic() - pooled.last_used > self.ping_after:
+                    try:
+                        pooled.conn.ping(reconnect=False)
+                    except Exception as e:
+                        logger.warning(f"Pooled connection failed health check: {e}")
+                        self._close_quietly(pooled.conn)
+                        with self._cond:
+                            self._stats['failed_health_checks'] += 1
+                            self._open -= 1
+                            self._in_use -= 1
+                            self._cond.notify()
+                        continue
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+            waited_ms = (time.monotonic() - start) * 1000
+            with self._cond:
+                self._stats['borrows'] += 1
+                self._stats['wait_ms_total'] += waited_ms
+                if waited_ms > self._stats['wait_ms_max']:
+                    self._stats['wait_ms_max'] = waited_ms
+            return pooled
+
+    def release(self, pooled, discard=False):
+        """Return a borrowed connection; broken connections are closed instead."""
+        if not discard:
+            try:
+                # End any implicit transaction so the next borrower gets a fresh snapshot
+                if pooled.conn.in_transaction:
+                    pooled.conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection after reset failure: {e}")
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._open -= 1
+                self._stats['discarded'] += 1
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(pooled.conn)
+
+    def close_all(self):
+        """Close every idle connection; borrowed ones are closed on release."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close_quietly(pooled.conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            })
+        borrows = stats['borrows']
+        stats['wait_ms_avg'] = round(stats['wait_ms_total'] / borrows, 3) if borrows else 0.0
+        stats['wait_ms_total'] = round(stats['wait_ms_total'], 3)
+        stats['wait_ms_max'] = round(stats['wait_ms_max'], 3)
+        return stats
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, creating a fresh one after a fork."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Sockets inherited from the gunicorn master must not be shared,
+                # so a forked worker simply drops the parent's pool.
+                _pool = ConnectionPool(
+                    size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                    max_idle=Config.DB_POOL_MAX_IDLE,
+                    pre_ping=Config.DB_POOL_PRE_PING,
+                    ping_after=Config.DB_POOL_PING_AFTER,
+                    connect_kwargs={
+                        'host': Config.DB_HOST,
+                        'user': Config.DB_USER,
+                        'password': Config.DB_PASSWORD,
+                        'database': Config.DB_NAME,
+                        'port': Config.DB_PORT,
+                        'consume_results': True,
+                    },
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def get_pool_stats():
+    """Snapshot of the current process's pool metrics."""
+    stats = get_pool().stats()
+    stats['pid'] = os.getpid()
+    return stats
+
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections with automatic cleanup."""
-    db = None
+    """Context manager for pooled database connections with automatic cleanup."""
+    pool = get_pool()
+    try:
+        pooled = pool.acquire()
+    except Exception as e:
+        # PoolTimeoutError when the pool stays exhausted, or the server refused a new connection
+        logger.error(f"Database error: could not get a connection: {e}")
+        raise
+    db = pooled.conn
     cursor = None
+    discard = False
     try:
-        db = mysql.connector.connect(
-            host=Config.DB_HOST,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            database=Config.DB_NAME,
-            port=Config.DB_PORT,
-        )
         cursor = db.cursor(dictionary=True)
-        yield db, cursor
+        yield db, timed_cursor(cursor)
+    except GeneratorExit:
+        # A streaming caller was closed mid-result; the connection may still
+        # hold unread rows, so it must not go back to the pool
+        discard = True
+        raise
     except Exception as e:
         logger.error(f"Database error: {e}")
-        if db:
+        try:
             db.rollback()
+        except Exception:
+            discard = True
+        if isinstance(e, (mysql.connector.InterfaceError, mysql.connector.OperationalError)):
+            discard = True
         raise
     finally:
         if cursor:
-            cursor.close()
-        if db:
-            db.close()
+            try:
+                cursor.close()
+            except Exception:
+                discard = True
+        pool.release(pooled, discard=discard)
+
+def kill_running_query(db):
+    """Abort the statement running on ``db`` from another pooled connection.
+
+    Closing a connection with an unbuffered result pending reads the rest of
+    the rows first; after KILL QUERY the server stops sending them.
+    """
+    with get_db_connection() as (_, cursor):
+        cursor.execute(f"KILL QUERY {int(db.connection_id)}")
 
 def connect_to_db():
     """Legacy function for backward compatibility."""
@@ -0,0 +1,147 @@
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+
+from flask import Response, request, send_file
+from werkzeug.http import is_resource_modified
+
+try:
+    from ..config import Config
+    from ..services.image_store import get_store_for_backend, load_image_bytes
+    from ..services.thumbnails import get_or_render_variant, variant_name, variant_mimetype
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from app.config import Config
+    from app.services.image_store import get_store_for_backend, load_image_bytes
+    from app.services.thumbnails import get_or_render_variant, variant_name, variant_mimetype
+
+logger = logging.getLogger(__name__)
+
+# Columns build_image_response() needs; image_data is fetched separately
+IMAGE_META_COLUMNS = "image_id, storage_key, storage_backend, file_type, file_size, upload_date"
+
+
+def image_mimetype(file_type):
+    """images.file_type holds an extension like '.jpg'; map it to a MIME type."""
+    if file_type and '/' in file_type:
+        return file_type
+    guessed, _ = mimetypes.guess_type(f"image{file_type or ''}")
+    return guessed or 'image/jpeg'
+
+
+def apply_image_caching(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Image ids are never reused and stored bytes never change, so clients
+    # and proxies may keep them for the full max-age without revalidating.
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.IMAGE_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    response.cache_control.no_cache = None
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return apply_image_caching(Response(status=304), etag, last_modified)
+
+
+def apply_latest_image_caching(response, etag, last_modified):
+    """Validators for /api/fetch_img: cacheable, but revalidated on every poll."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def build_latest_image_response(latest):
+    """200 with the bytes of a LatestImage, or an empty 304 if the client already has it."""
+    if not is_resource_modified(request.environ, etag=latest.etag, last_modified=latest.last_modified):
+        return apply_latest_image_caching(Response(status=304), latest.etag, latest.last_modified)
+    response = Response(latest.data, mimetype=image_mimetype(latest.file_type))
+    return apply_latest_image_caching(response, latest.etag, latest.last_modified)
+
+
+def _send_path(path, mimetype, etag, last_modified, store_root=None):
+    if store_root is not None and Config.IMAGE_SENDFILE_MODE == 'x-accel-redirect':
+        # nginx serves the file (and Range requests) from an internal location
+        relative = os.path.relpath(path, store_root).replace(os.sep, '/')
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = f"{Config.IMAGE_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return apply_image_caching(response, etag, last_modified)
+
+    # send_file hands the open file to wsgi.file_wrapper (sendfile() under
+    # gunicorn) or emits X-Sendfile when USE_X_SENDFILE is set.
+    response = send_file(path, mimetype=mimetype, conditional=False, etag=False, last_modified=last_modified)
+    return apply_image_caching(response, etag, last_modified).make_conditional(
+        request, accept_ranges=True, complete_length=os.path.getsize(path)
+    )
+
+
+def build_image_response(row, fetch_blob):
+    """Cacheable, Range-capable response for an images row.
+
+    ``row`` has IMAGE_META_COLUMNS; ``fetch_blob`` is called only for legacy
+    rows whose bytes still live in images.image_data. Store-backed rows are
+    answered from metadata alone when the client already has the image.
+    """
+    mimetype = image_mimetype(row.get('file_type'))
+    last_modified = row.get('upload_date')
+
+    if row.get('storage_key'):
+        etag = row['storage_key']
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return not_modified_response(etag, last_modified)
+
+        store = get_store_for_backend(row.get('storage_backend') or 'local')
+        path = store.path(row['storage_key'])
+        if path and os.path.exists(path):
+            return _send_path(path, mimetype, etag, last_modified, store.root)
+        image_data = load_image_bytes(row)
+    else:
+        image_data = fetch_blob()
+        etag = hashlib.sha256(image_data).hexdigest() if image_data else None
+        if etag and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return not_modified_response(etag, last_modified)
+
+    if not image_data:
+        return None
+
+    response = send_file(io.BytesIO(image_data), mimetype=mimetype, conditional=False, etag=False,
+                         last_modified=last_modified)
+    return apply_image_caching(response, etag, last_modified).make_conditional(
+        request, accept_ranges=True, complete_length=len(image_data)
+    )
+
+
+def build_variant_response(row, fetch_blob, variant):
+    """Resized rendition of an images row, served from the on-disk variant cache."""
+    last_modified = row.get('upload_date')
+
+    if row.get('storage_key'):
+        content_key = row['storage_key']
+        etag = variant_name(content_key, variant)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return not_modified_response(etag, last_modified)
+
+        store = get_store_for_backend(row.get('storage_backend') or 'local')
+        original = store.path(content_key)
+        load_source = (lambda: original) if original and os.path.exists(original) else (lambda: load_image_bytes(row))
+    else:
+        image_data = fetch_blob()
+        if not image_data:
+            return None
+        content_key = hashlib.sha256(image_data).hexdigest()
+        etag = variant_name(content_key, variant)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return not_modified_response(etag, last_modified)
+        load_source = lambda: image_data
+
+    path = get_or_render_variant(content_key, variant, load_source)
+    if path is None:
+        return None
+    return _send_path(path, variant_mimetype(variant), etag, last_modified)
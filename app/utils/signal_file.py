@@ -0,0 +1,38 @@
+"""Change notification between the processes on one host through a tiny file.
+
+The writer atomically replaces the file; readers compare signal_state()
+with what they saw last. It only says "something changed", so readers
+re-check the database rather than trusting the payload.
+"""
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def default_signal_path(name):
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def signal_state(path):
+    """Opaque token that changes with every send_signal(), or None if there is no file yet."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # os.replace() gives every signal a new inode, so equal mtimes still differ
+    return st.st_ino, st.st_mtime_ns
+
+
+def send_signal(path, payload=''):
+    """Replace ``path`` with ``payload``; returns False (and logs) when that fails."""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.signal-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(payload))
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write signal file {path}: {e}")
+        return False
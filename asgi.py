@@ -0,0 +1,23 @@
+"""ASGI entry point (async serving mode).
+
+    gunicorn asgi:app -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker
+"""
+import os
+import sys
+import logging
+
+os.makedirs('logs', exist_ok=True)
+os.makedirs('uploads', exist_ok=True)
+os.makedirs('models', exist_ok=True)
+
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+logging.getLogger('ultralytics').setLevel(logging.ERROR)
+logging.getLogger('torch').setLevel(logging.ERROR)
+logging.getLogger('cv2').setLevel(logging.ERROR)
+
+try:
+    from app.asgi import create_asgi_app
+    app = create_asgi_app()
+except ImportError as e:
+    logging.error(f"Failed to import ASGI app (pip install -r requirements.txt): {e}")
+    sys.exit(1)
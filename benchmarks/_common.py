@@ -0,0 +1,262 @@
+"""Shared helpers for the benchmark scripts: stats, worker RSS, frames, HTTP load, results.
+
+Every script prints (and with --output writes) one JSON document with the
+same ``meta`` block, so two runs can be diffed with benchmarks/compare.py.
+"""
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(ROOT, 'images')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+def summarize_ms(samples_ms, elapsed_s=None):
+    """count, throughput and latency percentiles for a list of millisecond samples."""
+    values = sorted(samples_ms)
+    summary = {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values), 3) if values else None,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': round(values[-1], 3) if values else None,
+    }
+    if elapsed_s:
+        summary['throughput_per_s'] = round(len(values) / elapsed_s, 2)
+    return summary
+
+
+def _proc_status_mb(pid, field):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def process_rss_mb(pid=None):
+    """Current and peak RSS of one process (Linux), in MB."""
+    pid = pid or os.getpid()
+    return {'pid': pid, 'rss_mb': _proc_status_mb(pid, 'VmRSS:'), 'peak_rss_mb': _proc_status_mb(pid, 'VmHWM:')}
+
+
+def worker_rss_mb(master_pid):
+    """process_rss_mb() for every gunicorn worker (children of the master)."""
+    try:
+        children = subprocess.run(['pgrep', '-P', str(master_pid)], capture_output=True, text=True).stdout.split()
+    except OSError:
+        return []
+    return [process_rss_mb(int(pid)) for pid in children]
+
+
+def sample_images(pattern=None):
+    paths = sorted(glob.glob(pattern or os.path.join(IMAGES_DIR, '*.jpg')))
+    if not paths:
+        raise SystemExit(f"No sample images found in {IMAGES_DIR}")
+    return [cv2.imread(path) for path in paths]
+
+
+def synthetic_frames(count, seed=0, sources=None, quality=(70, 95)):
+    """JPEG frames derived from images/: random crop, shift, scale, exposure and sensor noise.
+
+    Deterministic for a given seed, so two runs feed the server the same bytes.
+    Frames differ enough that the plate cache and motion gate do not turn a
+    load test into a cache benchmark.
+    """
+    rng = random.Random(seed)
+    noise_rng = np.random.default_rng(seed)
+    sources = sources if sources is not None else sample_images()
+    frames = []
+    for i in range(count):
+        image = sources[i % len(sources)]
+        height, width = image.shape[:2]
+        crop = rng.uniform(0.85, 1.0)
+        ch, cw = int(height * crop), int(width * crop)
+        y, x = rng.randint(0, height - ch), rng.randint(0, width - cw)
+        frame = image[y:y + ch, x:x + cw]
+        scale = rng.uniform(0.75, 1.0)
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frame = cv2.convertScaleAbs(frame, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-20, 20))
+        noise = noise_rng.normal(0, rng.uniform(1, 4), frame.shape)
+        frame = np.clip(frame.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, rng.randint(*quality)])
+        if ok:
+            frames.append(encoded.tobytes())
+    return frames
+
+
+def multipart_body(field, filename, payload, content_type='image/jpeg'):
+    boundary = f"carwatchbench{random.getrandbits(64):016x}"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_metadata(benchmark, args):
+    return {
+        'benchmark': benchmark,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args),
+    }
+
+
+def emit_results(results, output=None):
+    text = json.dumps(results, indent=2, default=str)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+
+
+# --- HTTP load generation (asyncio, keep-alive, no third-party client) ---
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, connection may be reused)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length, chunked, keep_alive = None, False, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+def build_request(host, port, method, path, body=b'', content_type=None):
+    """Raw HTTP/1.1 request bytes; build once and replay."""
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+    if body:
+        head += f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+    return head.encode() + b"\r\n" + body
+
+
+async def _client(host, port, requests, deadline, latencies, counters, offset, timeout):
+    reader = writer = None
+    index = offset
+    while time.monotonic() < deadline:
+        raw = requests[index % len(requests)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(raw)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            counters['connection_errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        counters['status'][status] = counters['status'].get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run_load(host, port, requests, concurrency, duration, timeout):
+    latencies, counters = [], {'connection_errors': 0, 'status': {}}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(
+        _client(host, port, requests, deadline, latencies, counters, i, timeout) for i in range(concurrency)
+    ))
+    elapsed = time.monotonic() - started
+    summary = summarize_ms(latencies, elapsed)
+    summary.update({
+        'concurrency': concurrency,
+        'connection_errors': counters['connection_errors'],
+        'status_counts': {str(k): v for k, v in sorted(counters['status'].items())},
+        'http_errors': sum(v for k, v in counters['status'].items() if k >= 400),
+    })
+    return summary
+
+
+def run_load(port, requests, concurrency, duration, host='127.0.0.1', timeout=60):
+    """Replay ``requests`` (raw bytes from build_request) round-robin on N keep-alive connections."""
+    return asyncio.run(_run_load(host, port, requests, concurrency, duration, timeout))
+
+
+def wait_for_http(port, process, path='/health', timeout=60, host='127.0.0.1'):
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://{host}:{port}{path}', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server did not come up on port {port}")
+
+
+def stop_process(process, timeout=30):
+    import signal
+    if process.poll() is not None:
+        return
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
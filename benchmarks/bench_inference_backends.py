@@ -0,0 +1,139 @@
+"""Parity check and latency benchmark: PyTorch checkpoints vs their ONNX exports.
+
+Runs LPD + OCR on the sample image through both backends, reports whether
+the plate strings match and how far the plate boxes drift (IoU), then times
+each backend per model at several batch sizes. Exits non-zero when parity
+fails, so it can gate a re-export:
+
+    python scripts/export_onnx.py --int8
+    python benchmarks/bench_inference_backends.py --iterations 50
+    ONNX_INT8=True ONNX_INTRA_OP_THREADS=4 python benchmarks/bench_inference_backends.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ['INFERENCE_BACKEND'] = 'pytorch'
+os.environ['INFERENCE_BATCHING'] = 'False'
+os.environ['INFERENCE_POOL_ENABLED'] = 'False'
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config import Config
+from app.services import ocr_service
+from app.services.inference_backends import create_backend
+
+SAMPLE_IMAGE = os.path.join(ROOT, 'images', 'image_20250614103441.jpg')
+
+
+def _box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def read_plates(lpd, ocr, image_np):
+    """ocr_service.read_plates with explicit backends instead of the module globals."""
+    plates = ocr_service._plate_crops(lpd.predict([image_np])[0], image_np)
+    if not plates:
+        return []
+    texts = [ocr_service._characters_from_result(r) for r in ocr.predict([p['crop'] for p in plates])]
+    return [
+        {'plate': text, 'confidence': round(p['confidence'], 4), 'box': p['box']}
+        for p, text in zip(plates, texts)
+    ]
+
+
+def parity(reference, candidate, min_iou):
+    ious = [_box_iou(r['box'], c['box']) for r, c in zip(reference, candidate)]
+    return {
+        'reference': reference,
+        'candidate': candidate,
+        'plates_match': [r['plate'] for r in reference] == [c['plate'] for c in candidate],
+        'min_box_iou': round(min(ious), 4) if ious else None,
+        'passed': (
+            len(reference) == len(candidate)
+            and all(r['plate'] == c['plate'] for r, c in zip(reference, candidate))
+            and all(iou >= min_iou for iou in ious)
+        ),
+    }
+
+
+def time_backend(backend, image_np, batch_size, iterations):
+    batch = [image_np] * batch_size
+    backend.predict(batch)  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend.predict(batch)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.asarray(samples)
+    return {
+        'batch_size': batch_size,
+        'ms_per_batch_p50': round(float(np.percentile(samples, 50)), 2),
+        'ms_per_batch_p95': round(float(np.percentile(samples, 95)), 2),
+        'images_per_second': round(batch_size * 1000 / float(samples.mean()), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', default=SAMPLE_IMAGE)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--batch-sizes', default='1,4,8')
+    parser.add_argument('--min-iou', type=float, default=0.9, help='box IoU required for parity')
+    args = parser.parse_args()
+
+    image_np = cv2.imread(args.image, cv2.IMREAD_COLOR)
+    if image_np is None:
+        sys.exit(f"Could not read {args.image}")
+
+    ocr_service.load_yolo_models()
+    backends = {
+        'pytorch': (ocr_service.lpd_model, ocr_service.ocr_model),
+        'onnx': (
+            create_backend('onnx', ocr_service.LPD_MODEL_PATH, ocr_service.LPD_CONF, ocr_service.LPD_IOU, Config),
+            create_backend('onnx', ocr_service.OCR_MODEL_PATH, ocr_service.OCR_CONF, ocr_service.OCR_IOU, Config),
+        ),
+    }
+
+    reference = read_plates(*backends['pytorch'], image_np)
+    check = parity(reference, read_plates(*backends['onnx'], image_np), args.min_iou)
+
+    # The OCR model is timed on the reference plate crop, as in production
+    plates = ocr_service.detect_plates(image_np)
+    crop = plates[0]['crop'] if plates else image_np
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    latency = {}
+    for name, (lpd, ocr) in backends.items():
+        latency[name] = {
+            'lpd': [time_backend(lpd, image_np, size, args.iterations) for size in batch_sizes],
+            'ocr': [time_backend(ocr, crop, size, args.iterations) for size in batch_sizes],
+        }
+
+    print(json.dumps({
+        'benchmark': 'inference_backends',
+        'image': os.path.basename(args.image),
+        'onnx': {
+            'int8': Config.ONNX_INT8,
+            'intra_op_threads': Config.ONNX_INTRA_OP_THREADS,
+            'inter_op_threads': Config.ONNX_INTER_OP_THREADS,
+            'providers': Config.ONNX_PROVIDERS,
+        },
+        'parity': check,
+        'latency': latency,
+    }, indent=2))
+    sys.exit(0 if check['passed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Macro load test: the app under gunicorn against a seeded local database.
+
+Seeds a database stand-in (see local_db.py), starts gunicorn with
+gunicorn.conf.py, and drives each scenario at each concurrency level with
+keep-alive connections:
+
+- ``history``: /api/history first pages, deep keyset pages and plate-prefix filters
+- ``images``: /api/get_image/<id> originals and 320 px thumbnails, plus /api/fetch_img
+- ``upload``: /api/upload_image with synthetic frames made from images/
+  (this runs LPD/OCR, so it needs the model files)
+
+Results are JSON: throughput, p50/p95/p99, status counts and the RSS of
+every worker after each level, plus mean time per pipeline stage scraped
+from /metrics. Keep the JSON and diff later runs with compare.py:
+
+    python benchmarks/bench_load.py --workers 4 --concurrency 1,8,32 --output results/load.json
+    python benchmarks/bench_load.py --db mysql --history-rows 500000 --scenarios history,images
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from _common import (ROOT, build_request, emit_results, multipart_body, run_load, run_metadata,
+                     stop_process, synthetic_frames, wait_for_http, worker_rss_mb)
+import local_db
+
+SCENARIOS = ('history', 'images', 'upload')
+
+
+def _get_json(port, path):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=30) as response:
+        return json.loads(response.read())
+
+
+def history_requests(port, pages):
+    """First pages, pages reached by following next_cursor, and plate-prefix filters."""
+    paths = ['/api/history?limit=50', '/api/history?limit=10', '/api/history?limit=200']
+    cursor, plates = None, set()
+    for _ in range(pages):
+        page = _get_json(port, '/api/history?limit=50&fields=plate,date' + (f'&cursor={cursor}' if cursor else ''))
+        plates.update(row['plate'][:2] for row in page['data'] if row['plate'])
+        cursor = page['pagination']['next_cursor']
+        if not cursor:
+            break
+        paths.append(f'/api/history?limit=50&cursor={cursor}')
+    paths.extend(f'/api/history?limit=50&plate={prefix}' for prefix in sorted(plates)[:10])
+    return [build_request('127.0.0.1', port, 'GET', path) for path in paths]
+
+
+def image_requests(port, count):
+    page = _get_json(port, f'/api/history?limit={max(count * 4, 50)}&fields=image_id')
+    image_ids = list(dict.fromkeys(row['image_id'] for row in page['data'] if row['image_id']))[:count]
+    paths = ['/api/fetch_img']
+    for image_id in image_ids:
+        paths += [f'/api/get_image/{image_id}', f'/api/get_image/{image_id}?w=320']
+    return [build_request('127.0.0.1', port, 'GET', path) for path in paths]
+
+
+def upload_requests(port, frames):
+    requests = []
+    for i, frame in enumerate(frames):
+        body, content_type = multipart_body('image', f'bench_{i}.jpg', frame)
+        status = 'entering' if i % 2 == 0 else 'leaving'
+        requests.append(build_request('127.0.0.1', port, 'POST',
+                                      f'/api/upload_image?status={status}&camera_id=bench{i % 4}',
+                                      body, content_type))
+    return requests
+
+
+def stage_means(port):
+    """Mean seconds per pipeline stage from /metrics (empty if metrics are off)."""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=30) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for suffix, target in (('_sum', sums), ('_count', counts)):
+            prefix = f'carwatch_stage_seconds{suffix}{{stage="'
+            if line.startswith(prefix):
+                stage, value = line[len(prefix):].split('"}')
+                target[stage] = float(value)
+    return {stage: {'count': int(counts[stage]), 'mean_ms': round(sums[stage] / counts[stage] * 1000, 3)}
+            for stage in sums if counts.get(stage)}
+
+
+def start_gunicorn(args, env, workdir):
+    if args.db == 'sqlite':
+        app_spec = ['standin_wsgi:app', '--pythonpath', HERE]
+    elif args.mode == 'asgi':
+        app_spec = ['asgi:app', '-k', 'uvicorn.workers.UvicornWorker']
+    else:
+        app_spec = ['wsgi:app']
+    command = [sys.executable, '-m', 'gunicorn', *app_spec, '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{args.port}', '--workers', str(args.workers),
+               '--pid', os.path.join(workdir, 'gunicorn.pid'), '--access-logfile', '/dev/null',
+               '--error-logfile', os.path.join(workdir, 'error.log'),
+               # Worker recycling would drop connections and reset RSS mid-run
+               '--max-requests', '0']
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_http(args.port, process, timeout=120)
+    except RuntimeError as e:
+        stop_process(process)
+        raise RuntimeError(f"{e}; see {workdir}/error.log")
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', choices=('sqlite', 'mysql', 'env'), default='sqlite',
+                        help='sqlite stand-in, a private local mysqld/mariadbd, or the database in .env as-is')
+    parser.add_argument('--sqlite-path', help='where to build the SQLite stand-in (default: in the work dir)')
+    parser.add_argument('--history-rows', type=int, default=50000, help='synthetic history rows to seed')
+    parser.add_argument('--frames', type=int, default=200, help='synthetic images to seed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='asgi needs --db mysql or env (the stand-in does not cover aiomysql)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=0, help='override gunicorn.conf.py threads')
+    parser.add_argument('--scenarios', default='history,images,upload')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated connection counts')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds of warm-up per scenario')
+    parser.add_argument('--upload-frames', type=int, default=40, help='distinct frames replayed by upload')
+    parser.add_argument('--port', type=int, default=9137)
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra app setting for the server, e.g. --set PLATE_CACHE_ENABLED=True')
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if args.mode == 'asgi' and args.db == 'sqlite':
+        parser.error('--mode asgi needs --db mysql or --db env')
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='carwatch-bench-')
+    # Seeding and the server share one throwaway image store and metrics dir
+    app_env = {
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'images'),
+        'VARIANT_CACHE_DIR': os.path.join(workdir, 'variants'),
+        'METRICS_MULTIPROC_DIR': os.path.join(workdir, 'metrics'),
+    }
+    app_env.update(item.split('=', 1) for item in args.set)
+    os.environ.update(app_env)
+
+    server_db = None
+    if args.db == 'env':
+        db_info, db_env = {'kind': 'env'}, {}
+    else:
+        print(f"Seeding {args.db} stand-in...", file=sys.stderr)
+        db_info, db_env, server_db = local_db.prepare(
+            args.db, args.sqlite_path or os.path.join(workdir, 'carwatch.db'),
+            args.history_rows, args.frames, args.seed)
+
+    results = {
+        'meta': run_metadata('load', args),
+        'database': db_info,
+        'server': {'mode': args.mode, 'workers': args.workers, 'threads': args.threads or 'gunicorn.conf.py'},
+        'scenarios': {},
+    }
+    process = None
+    try:
+        process = start_gunicorn(args, {**os.environ, **db_env}, workdir)
+        builders = {
+            'history': lambda: history_requests(args.port, pages=20),
+            'images': lambda: image_requests(args.port, count=20),
+            'upload': lambda: upload_requests(args.port, synthetic_frames(args.upload_frames, args.seed + 1)),
+        }
+        for scenario in scenarios:
+            requests = builders[scenario]()
+            run_load(args.port, requests, min(levels), args.warmup)
+            runs = []
+            for concurrency in levels:
+                level = run_load(args.port, requests, concurrency, args.duration)
+                level['worker_rss'] = worker_rss_mb(process.pid)
+                runs.append(level)
+                print(f"{scenario} c={concurrency}: {level['throughput_per_s']} req/s, "
+                      f"p95 {level['p95_ms']} ms, statuses {level['status_counts']}", file=sys.stderr)
+            results['scenarios'][scenario] = {'distinct_requests': len(requests), 'levels': runs}
+        results['stages'] = stage_means(args.port)
+    finally:
+        if process is not None:
+            stop_process(process)
+        if server_db is not None:
+            server_db.stop()
+
+    emit_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
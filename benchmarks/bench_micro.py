@@ -0,0 +1,240 @@
+"""Micro-benchmarks for the hot functions behind upload and history, in-process.
+
+- ``ocr``: _lpd_input, _plate_crops and _characters_with_confidences on
+  synthetic detections, plus read_plates end to end when the models load
+  (reported as skipped otherwise)
+- ``upload``: prepare_image_data for JPEG and PNG uploads, then
+  store_uploaded_image and db_upload_image against the database
+- ``history``: jsonify of history pages, and GET /api/history through the
+  Flask test client
+
+The database is a seeded SQLite stand-in by default (see local_db.py);
+``--db mysql`` starts a private mysqld/mariadbd and ``--db env`` uses .env as-is.
+
+    python benchmarks/bench_micro.py --output results/micro.json
+    python benchmarks/bench_micro.py --groups ocr --iterations 2000
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from _common import ROOT, emit_results, process_rss_mb, run_metadata, sample_images, summarize_ms, synthetic_frames
+import local_db
+
+sys.path.insert(0, ROOT)
+
+GROUPS = ('ocr', 'upload', 'history')
+
+
+def measure(fn, iterations, warmup=5):
+    """Per-call latency summary of ``fn()``, plus CPU time per call."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - call_started) * 1000)
+    summary = summarize_ms(samples, time.perf_counter() - started)
+    summary['cpu_ms_per_call'] = round((time.process_time() - cpu_before) * 1000 / iterations, 3)
+    return summary
+
+
+def synthetic_detections(rng, count, image_shape, names):
+    from app.services.inference_backends import Detections
+
+    height, width = image_shape[:2]
+    x1 = np.array([rng.uniform(0, width * 0.8) for _ in range(count)], np.float32)
+    y1 = np.array([rng.uniform(0, height * 0.8) for _ in range(count)], np.float32)
+    xyxy = np.stack([x1, y1, x1 + width * 0.15, y1 + height * 0.06], axis=1)
+    conf = np.array([rng.uniform(0.3, 0.99) for _ in range(count)], np.float32)
+    cls = np.array([rng.randrange(len(names)) for _ in range(count)], np.int64)
+    return Detections(xyxy, conf, cls, names)
+
+
+def bench_ocr(args):
+    from app.services import ocr_service
+
+    rng = random.Random(args.seed)
+    frame = cv2.resize(sample_images()[0], (1920, 1080), interpolation=cv2.INTER_AREA)
+    names = {i: c for i, c in enumerate('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')}
+    plates = synthetic_detections(rng, 4, frame.shape, names)
+    characters = synthetic_detections(rng, 8, (60, 240), names)
+
+    results = {
+        'lpd_input_1080p': measure(lambda: ocr_service._lpd_input(frame), args.iterations),
+        'plate_crops_4': measure(lambda: ocr_service._plate_crops(plates, frame), args.iterations),
+        'characters_with_confidences_8': measure(
+            lambda: ocr_service._characters_with_confidences(characters), args.iterations),
+    }
+
+    try:
+        ocr_service.load_yolo_models()
+    except ocr_service.ModelUnavailableError as e:
+        results['read_plates'] = {'skipped': str(e)}
+        return results
+    frames = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+              for data in synthetic_frames(16, args.seed)]
+    cycle = iter(range(10 ** 9))
+    results['read_plates'] = measure(
+        lambda: ocr_service.read_plates(frames[next(cycle) % len(frames)]), max(1, args.iterations // 20))
+    return results
+
+
+def bench_upload(args, workdir):
+    from app.services.db_upload import prepare_image_data, store_uploaded_image, db_upload_image
+
+    jpeg_frames = synthetic_frames(16, args.seed)
+    decoded = cv2.imdecode(np.frombuffer(jpeg_frames[0], np.uint8), cv2.IMREAD_COLOR)
+    png = cv2.imencode('.png', decoded)[1].tobytes()
+    cycle = iter(range(10 ** 9))
+
+    def next_frame():
+        return jpeg_frames[next(cycle) % len(jpeg_frames)]
+
+    results = {
+        'prepare_image_data_jpeg': measure(lambda: prepare_image_data(jpeg_frames[0], 'bench.jpg'), args.iterations),
+        'prepare_image_data_png': measure(
+            lambda: prepare_image_data(png, 'bench.png', decoded), max(1, args.iterations // 10)),
+    }
+
+    db_iterations = max(1, args.iterations // 5)
+    results['store_uploaded_image'] = measure(
+        lambda: _checked(store_uploaded_image(next_frame(), 'bench_micro.jpg')), db_iterations)
+
+    # db_upload_image reads from uploads/ relative to the working directory
+    os.makedirs(os.path.join(workdir, 'uploads'), exist_ok=True)
+    with open(os.path.join(workdir, 'uploads', 'bench_micro.jpg'), 'wb') as f:
+        f.write(jpeg_frames[0])
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results['db_upload_image'] = measure(lambda: _checked(db_upload_image('bench_micro.jpg')), db_iterations)
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def _checked(result):
+    if not result.get('success'):
+        raise RuntimeError(result.get('message'))
+    return result
+
+
+def bench_history(args):
+    from flask import jsonify
+    from app import create_app
+    from app.services.history_query import DEFAULT_FIELDS
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    now = datetime.datetime.now()
+
+    def page(size):
+        return [{
+            'subject': rng.choice(('Vehicle Entering', 'Vehicle Leaving')),
+            'plate': f"B{rng.randint(1000, 9999)}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}",
+            'description': 'Vehicle detected with plate number',
+            'date': now - datetime.timedelta(seconds=rng.randint(0, 90 * 86400)),
+            'image_id': rng.randint(1, 10 ** 6),
+        } for _ in range(size)]
+
+    results = {}
+    with app.app_context():
+        for size in (50, 500):
+            rows = page(size)
+            results[f'jsonify_{size}_rows'] = measure(
+                lambda: jsonify({'success': True, 'data': [{f: row[f] for f in DEFAULT_FIELDS} for row in rows]})
+                .get_data(), args.iterations)
+
+    client = app.test_client()
+
+    def get(path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    cursor = get('/api/history?limit=50').get_json()['pagination']['next_cursor']
+    db_iterations = max(1, args.iterations // 5)
+    results['get_history_first_page'] = measure(lambda: get('/api/history?limit=50'), db_iterations)
+    if cursor:
+        results['get_history_next_page'] = measure(lambda: get(f'/api/history?limit=50&cursor={cursor}'),
+                                                   db_iterations)
+    results['get_history_plate_prefix'] = measure(lambda: get('/api/history?limit=50&plate=B1'), db_iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', choices=('sqlite', 'mysql', 'env'), default='sqlite')
+    parser.add_argument('--history-rows', type=int, default=20000)
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--groups', default=','.join(GROUPS))
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args()
+
+    groups = [name.strip() for name in args.groups.split(',') if name.strip()]
+    unknown = [name for name in groups if name not in GROUPS]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='carwatch-micro-')
+    # Before the app (and Config) is imported
+    os.environ.update({
+        'IMAGE_STORE_DIR': os.path.join(workdir, 'images'),
+        'VARIANT_CACHE_DIR': os.path.join(workdir, 'variants'),
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', 'False'),
+        'MODEL_WARMUP': 'False',
+    })
+
+    server = None
+    results = {'meta': run_metadata('micro', args)}
+    try:
+        if args.db == 'env':
+            results['database'] = {'kind': 'env'}
+        elif 'upload' in groups or 'history' in groups:
+            print(f"Seeding {args.db} stand-in...", file=sys.stderr)
+            results['database'], db_env, server = local_db.prepare(
+                args.db, os.path.join(workdir, 'carwatch.db'), args.history_rows, args.frames, args.seed)
+            if args.db == 'sqlite':
+                local_db.install_sqlite_standin(db_env['CARWATCH_BENCH_SQLITE'])
+            else:
+                from app.config import Config
+                for key, value in db_env.items():
+                    setattr(Config, key, type(getattr(Config, key))(value))
+
+        runners = {
+            'ocr': lambda: bench_ocr(args),
+            'upload': lambda: bench_upload(args, workdir),
+            'history': lambda: bench_history(args),
+        }
+        for group in groups:
+            print(f"Running {group}...", file=sys.stderr)
+            results[group] = runners[group]()
+        results['rss'] = process_rss_mb()
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    emit_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Load test: gunicorn gthread (wsgi.py) vs the ASGI serving mode (asgi.py).
+
+Starts each server in turn with gunicorn.conf.py (the ASGI run swaps in
+uvicorn workers), drives the same GET endpoints with N concurrent
+keep-alive connections per level, and prints throughput, latency
+percentiles, errors and worker RSS as JSON. It uses the database from
+.env, so point it at a copy with realistic data (bench_load.py --db mysql
+seeds a private one):
+
+    python benchmarks/bench_serving_modes.py --workers 2 --concurrency 10,100,500 \
+        --paths "/api/history?limit=50,/api/get_image/1" --output results/serving.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from _common import (ROOT, build_request, emit_results, run_load, run_metadata, stop_process, wait_for_http,
+                     worker_rss_mb)
+
+MODES = {
+    'wsgi': ['wsgi:app'],
+    'asgi': ['asgi:app', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def start_server(mode, port, workers):
+    command = [sys.executable, '-m', 'gunicorn', *MODES[mode], '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+               '--pid', f'logs/bench-{mode}.pid', '--access-logfile', '/dev/null',
+               # Worker recycling (max_requests) would drop connections mid-run
+               '--max-requests', '0']
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_http(port, process)
+    except RuntimeError as e:
+        stop_process(process)
+        raise RuntimeError(f"{mode}: {e}")
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', default='10,100,500', help='comma-separated connection counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per concurrency level')
+    parser.add_argument('--paths', default='/api/history?limit=50,/api/fetch_img',
+                        help='comma-separated GET paths, requested round-robin')
+    parser.add_argument('--port', type=int, default=9136)
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(',') if path.strip()]
+    requests = [build_request('127.0.0.1', args.port, 'GET', path) for path in paths]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = {'meta': run_metadata('serving_modes', args), 'modes': {}}
+
+    for mode in args.modes.split(','):
+        process = start_server(mode, args.port, args.workers)
+        try:
+            run_load(args.port, requests, min(levels), 2)  # warm-up
+            runs = []
+            for concurrency in levels:
+                level = run_load(args.port, requests, concurrency, args.duration)
+                level['worker_rss'] = worker_rss_mb(process.pid)
+                runs.append(level)
+                print(f"{mode} c={concurrency}: {level['throughput_per_s']} req/s, "
+                      f"p95 {level['p95_ms']} ms", file=sys.stderr)
+            results['modes'][mode] = {'levels': runs}
+        finally:
+            stop_process(process)
+
+    emit_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Micro-benchmark: legacy disk-staged upload path vs the in-memory pipeline.
+
+Measures CPU time per request and, on Linux, the read/write syscalls the
+process issued (from /proc/self/io). The database insert is left out of
+both paths so only the image handling is compared.
+
+    python benchmarks/bench_upload_pipeline.py --iterations 200
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.db_upload import prepare_image_data
+
+SAMPLE_IMAGE = os.path.join(ROOT, 'images', 'image_20250614103441.jpg')
+
+
+def _io_counters():
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':') for line in f.read().splitlines())
+        return int(fields['syscr']), int(fields['syscw'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def legacy_path(image_bytes, upload_dir):
+    """What upload_image + db_upload_image did before: stage, re-encode, decode twice."""
+    filepath = os.path.join(upload_dir, 'image_bench.jpg')
+    with open(filepath, 'wb') as f:
+        f.write(image_bytes)
+
+    with Image.open(filepath) as img:
+        format_type = img.format if img.format else 'PNG'
+        buffer = io.BytesIO()
+        img.save(buffer, format=format_type)
+        img_data = buffer.getvalue()
+
+    img_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    os.remove(filepath)
+    return img_data, img_np
+
+
+def in_memory_path(image_bytes, upload_dir):
+    img_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    img_data, _, _, _ = prepare_image_data(image_bytes, 'image_bench.jpg', img_np)
+    return img_data, img_np
+
+
+def run(fn, image_bytes, iterations, upload_dir):
+    fn(image_bytes, upload_dir)  # warm-up
+    io_before = _io_counters()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    for _ in range(iterations):
+        fn(image_bytes, upload_dir)
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    io_after = _io_counters()
+
+    result = {
+        'iterations': iterations,
+        'cpu_ms_per_request': round(cpu * 1000 / iterations, 3),
+        'wall_ms_per_request': round(wall * 1000 / iterations, 3),
+    }
+    if io_before and io_after:
+        result['read_syscalls_per_request'] = round((io_after[0] - io_before[0]) / iterations, 2)
+        result['write_syscalls_per_request'] = round((io_after[1] - io_before[1]) / iterations, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', default=SAMPLE_IMAGE)
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image_bytes = f.read()
+
+    with tempfile.TemporaryDirectory() as upload_dir:
+        legacy = run(legacy_path, image_bytes, args.iterations, upload_dir)
+        in_memory = run(in_memory_path, image_bytes, args.iterations, upload_dir)
+
+    print(json.dumps({
+        'benchmark': 'upload_pipeline',
+        'image': os.path.basename(args.image),
+        'image_bytes': len(image_bytes),
+        'legacy': legacy,
+        'in_memory': in_memory,
+        'cpu_speedup': round(legacy['cpu_ms_per_request'] / max(in_memory['cpu_ms_per_request'], 1e-9), 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
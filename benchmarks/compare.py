@@ -0,0 +1,96 @@
+"""Diff two benchmark result files and flag regressions.
+
+Walks both JSON documents, pairs every result that has latency percentiles
+(by its path, e.g. ``scenarios.history.levels[c=8]``) and prints p50/p95/p99
+and throughput side by side. Exits 1 when any p95 grew, or any throughput
+fell, by more than --threshold percent:
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+def _results(node, path=''):
+    """Yield (path, summary) for every dict that carries p95_ms."""
+    if isinstance(node, dict):
+        if 'p95_ms' in node:
+            yield path, node
+            return
+        for key, value in node.items():
+            if key != 'meta':
+                yield from _results(value, f"{path}.{key}" if path else key)
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            label = f"c={value['concurrency']}" if isinstance(value, dict) and 'concurrency' in value else i
+            yield from _results(value, f"{path}[{label}]")
+
+
+def _change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after, threshold):
+    old = dict(_results(before))
+    rows, regressions = [], []
+    for path, new in _results(after):
+        if path not in old:
+            continue
+        row = {'path': path}
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s'):
+            row[metric] = (old[path].get(metric), new.get(metric), _change(old[path].get(metric), new.get(metric)))
+        p95_change = row['p95_ms'][2]
+        throughput_change = row['throughput_per_s'][2]
+        if p95_change is not None and p95_change > threshold:
+            regressions.append(f"{path}: p95 {p95_change:+.1f}%")
+        if throughput_change is not None and throughput_change < -threshold:
+            regressions.append(f"{path}: throughput {throughput_change:+.1f}%")
+        rows.append(row)
+    return rows, regressions
+
+
+def _format(value):
+    before, after, change = value
+    if before is None or after is None:
+        return '-'
+    text = f"{before:g} -> {after:g}"
+    return text + (f" ({change:+.1f}%)" if change is not None else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent p95 growth / throughput drop that counts as a regression')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    for label, doc in (('before', before), ('after', after)):
+        meta = doc.get('meta', {})
+        print(f"{label}: {meta.get('benchmark')} @ {meta.get('git_revision')} ({meta.get('timestamp')})")
+    if before.get('meta', {}).get('args') != after.get('meta', {}).get('args'):
+        print("warning: the runs used different arguments")
+
+    rows, regressions = compare(before, after, args.threshold)
+    for row in rows:
+        print(f"{row['path']}\n  p50 {_format(row['p50_ms'])}  p95 {_format(row['p95_ms'])}  "
+              f"p99 {_format(row['p99_ms'])}  req/s {_format(row['throughput_per_s'])}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:g}%.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,645 @@
+"""Throwaway databases for the load benchmarks, seeded from `carwatch database.sql`.
+
+Two stand-ins, both loaded with the dump, then migrations/*.sql, then
+optional synthetic rows:
+
+- ``mysql``: a private mysqld/mariadbd (whichever is on PATH) initialised
+  in a temp directory and listening on 127.0.0.1 only. It behaves exactly
+  like production, so use it for numbers you intend to publish.
+- ``sqlite``: a SQLite file, plus a small mysql.connector look-alike that
+  install_sqlite_standin() plugs in before the app opens connections. It
+  rewrites the handful of MySQL-only constructs the app issues (``%s``,
+  ``NOW(3)``, ``IF()``, ``TIMESTAMPDIFF``, ``FOR UPDATE``, ``ON DUPLICATE
+  KEY``) and serialises writers with BEGIN IMMEDIATE. It needs no server,
+  so it is good for comparing two revisions on one machine. It is not
+  a model of MySQL's absolute latency.
+
+Prepare a database by hand (bench_load.py does this itself):
+
+    python benchmarks/local_db.py --sqlite /tmp/carwatch-bench.db --history-rows 100000
+"""
+import argparse
+import datetime
+import glob
+import os
+import random
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUMP_PATH = os.path.join(ROOT, 'carwatch database.sql')
+MIGRATIONS = sorted(glob.glob(os.path.join(ROOT, 'migrations', '*.sql')))
+DB_NAME = 'carwatch'
+
+
+def split_statements(text):
+    """Split a mysqldump/phpMyAdmin script into statements, honouring DELIMITER."""
+    delimiter = ';'
+    statements, buffer = [], []
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = ''.join(buffer).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+    if ''.join(buffer).strip():
+        statements.append(''.join(buffer).strip())
+    return statements
+
+
+def seed_statements(dump_path=DUMP_PATH, migrations=MIGRATIONS):
+    statements = []
+    for path in [dump_path, *migrations]:
+        with open(path, encoding='utf-8') as f:
+            statements.extend(split_statements(f.read()))
+    return statements
+
+
+def _random_plate(rng):
+    letters = 'ABDEFGHKLNRSTZ'
+    return (rng.choice(letters) + str(rng.randint(1, 9999))
+            + ''.join(rng.choice(letters) for _ in range(rng.randint(1, 3))))
+
+
+def seed_synthetic(conn, history_rows, frames, seed=0, batch=1000):
+    """Add ``frames`` as images (through the app's image store) and ``history_rows`` history rows.
+
+    ``conn`` is a mysql.connector connection or a SQLiteConnection. Rows are
+    spread over the last 90 days so keyset pages and date filters hit a
+    realistic range.
+    """
+    sys.path.insert(0, ROOT)
+    from app.services.db_upload import insert_images_batch
+
+    rng = random.Random(seed)
+    cursor = conn.cursor(dictionary=True)
+    image_ids = []
+    for start in range(0, len(frames), 100):
+        chunk = frames[start:start + 100]
+        prepared = [(f"bench_{start + i:06d}.jpg", data, len(data), '.jpg') for i, data in enumerate(chunk)]
+        image_ids.extend(insert_images_batch(cursor, prepared))
+        conn.commit()
+
+    if not image_ids:
+        cursor.execute("SELECT image_id FROM images")
+        image_ids = [row['image_id'] for row in cursor.fetchall()]
+    plates = [_random_plate(rng) for _ in range(max(1, history_rows // 20))]
+    now = datetime.datetime.now().replace(microsecond=0)
+    sql = "INSERT INTO history (plate, subject, description, date, image_id) VALUES (%s, %s, %s, %s, %s)"
+    for start in range(0, history_rows, batch):
+        rows = []
+        for _ in range(min(batch, history_rows - start)):
+            entering = rng.random() < 0.5
+            rows.append((
+                rng.choice(plates) if rng.random() < 0.9 else '',
+                'Vehicle Entry' if entering else 'Vehicle Exit',
+                'car is available' if entering else 'car is being use',
+                now - datetime.timedelta(seconds=rng.randint(0, 90 * 86400)),
+                rng.choice(image_ids) if image_ids else None,
+            ))
+        cursor.executemany(sql, rows)
+        conn.commit()
+    cursor.close()
+    return {'images_added': len(frames), 'history_rows_added': history_rows}
+
+
+# --- Local MySQL / MariaDB server ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LocalMySQL:
+    """mysqld/mariadbd from PATH on a temp datadir; root without a password on 127.0.0.1."""
+
+    def __init__(self, port=None, workdir=None):
+        self.port = port or _free_port()
+        self.workdir = workdir or tempfile.mkdtemp(prefix='carwatch-mysql-')
+        self.process = None
+
+    @staticmethod
+    def available():
+        return bool(shutil.which('mariadbd') or shutil.which('mysqld'))
+
+    @property
+    def connect_kwargs(self):
+        return {'host': '127.0.0.1', 'port': self.port, 'user': 'root', 'password': ''}
+
+    def start(self, timeout=120):
+        binary = shutil.which('mariadbd') or shutil.which('mysqld')
+        if not binary:
+            raise RuntimeError('Neither mariadbd nor mysqld is on PATH')
+        version = subprocess.run([binary, '--version'], capture_output=True, text=True).stdout
+        datadir = os.path.join(self.workdir, 'data')
+        common = ['--no-defaults', f'--datadir={datadir}']
+        if os.geteuid() == 0:
+            common.append('--user=root')
+
+        if 'MariaDB' in version:
+            installer = shutil.which('mariadb-install-db') or shutil.which('mysql_install_db')
+            subprocess.run([installer, *common, '--auth-root-authentication-method=normal', '--skip-test-db'],
+                           check=True, capture_output=True)
+        else:
+            subprocess.run([binary, *common, '--initialize-insecure'], check=True, capture_output=True)
+
+        self.process = subprocess.Popen(
+            [binary, *common, f'--port={self.port}', '--bind-address=127.0.0.1',
+             f'--socket={os.path.join(self.workdir, "mysqld.sock")}',
+             f'--pid-file={os.path.join(self.workdir, "mysqld.pid")}',
+             f'--log-error={os.path.join(self.workdir, "error.log")}',
+             '--innodb-buffer-pool-size=256M', '--max-connections=500'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        import mysql.connector
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{binary} exited; see {self.workdir}/error.log")
+            try:
+                mysql.connector.connect(**self.connect_kwargs).close()
+                return self
+            except mysql.connector.Error:
+                time.sleep(0.5)
+        raise RuntimeError(f"{binary} did not accept connections within {timeout}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(60)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def seed_mysql(connect_kwargs, statements=None):
+    """Run the dump and migrations against a server (creates the `carwatch` database)."""
+    import mysql.connector
+    conn = mysql.connector.connect(**connect_kwargs)
+    cursor = conn.cursor()
+    for statement in statements or seed_statements():
+        cursor.execute(statement)
+        if cursor.with_rows:
+            cursor.fetchall()
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+# --- SQLite stand-in ---
+
+def _split_top_level(text):
+    """Split on commas that are outside parentheses and quotes."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != '\\':
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _names(column_list):
+    return [name.strip().strip('`') for name in column_list.split(',')]
+
+
+_KEY = re.compile(r'^(?:ADD\s+)?(UNIQUE\s+)?(?:KEY|INDEX)\s+`?(\w+)`?\s*\(([^)]*)\)', re.I)
+_PRIMARY = re.compile(r'^(?:ADD\s+)?PRIMARY\s+KEY\s*\(([^)]*)\)', re.I)
+_COLUMN = re.compile(r'^`?(\w+)`?\s+(.*)$', re.S)
+
+
+class _Table:
+    def __init__(self, name):
+        self.name = name
+        self.columns = {}
+        self.primary_key = []
+        self.autoincrement = None
+        self.indexes = {}
+
+    def set_column(self, name, definition, after=None):
+        if re.search(r'\bAUTO_INCREMENT\b', definition, re.I):
+            self.autoincrement = name
+        if after and after in self.columns and name not in self.columns:
+            items = list(self.columns.items())
+            position = [key for key, _ in items].index(after) + 1
+            items.insert(position, (name, definition))
+            self.columns = dict(items)
+        else:
+            self.columns[name] = definition
+
+    def apply(self, clause):
+        primary = _PRIMARY.match(clause)
+        key = _KEY.match(clause)
+        if primary:
+            self.primary_key = _names(primary.group(1))
+        elif key:
+            self.indexes[key.group(2)] = (bool(key.group(1)), _names(key.group(3)))
+        elif re.match(r'^DROP\s+(KEY|INDEX)\s+', clause, re.I):
+            self.indexes.pop(clause.split()[-1].strip('`'), None)
+        elif re.match(r'^(ADD\s+)?(CONSTRAINT|FOREIGN\s+KEY)\b', clause, re.I) or clause.upper().startswith('AUTO_INCREMENT'):
+            pass  # foreign keys are not enforced by the stand-in
+        else:
+            clause = re.sub(r'^(ADD|MODIFY|CHANGE)(\s+COLUMN)?\s+', '', clause, flags=re.I)
+            after = re.search(r'\s+AFTER\s+`?(\w+)`?\s*$', clause, re.I)
+            if after:
+                clause = clause[:after.start()]
+            clause = re.sub(r'\s+FIRST\s*$', '', clause, flags=re.I)
+            column = _COLUMN.match(clause)
+            if column:
+                self.set_column(column.group(1), column.group(2), after.group(1) if after else None)
+
+
+_AFFINITY = {
+    'int': 'INTEGER', 'integer': 'INTEGER', 'bigint': 'INTEGER', 'smallint': 'INTEGER',
+    'tinyint': 'INTEGER', 'mediumint': 'INTEGER',
+    'float': 'REAL', 'double': 'REAL', 'decimal': 'REAL',
+    'blob': 'BLOB', 'tinyblob': 'BLOB', 'mediumblob': 'BLOB', 'longblob': 'BLOB',
+    'datetime': 'DATETIME', 'timestamp': 'TIMESTAMP', 'date': 'DATE',
+}
+# Same text format the adapter writes for datetime parameters and NOW()
+_SQLITE_NOW_DEFAULT = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+
+def _sqlite_column(table, name, definition):
+    type_match = re.match(r'(\w+)(\([^)]*\))?', definition)
+    mysql_type = type_match.group(1).lower()
+    rest = definition[type_match.end():]
+    rest = re.sub(r'\b(COLLATE|CHARACTER\s+SET)\s+\w+', '', rest, flags=re.I)
+    rest = re.sub(r'\bON\s+UPDATE\s+CURRENT_TIMESTAMP(\(\d*\))?', '', rest, flags=re.I)
+    rest = re.sub(r'\b(AUTO_INCREMENT|UNSIGNED)\b', '', rest, flags=re.I)
+    rest = re.sub(r'\bCURRENT_TIMESTAMP(\(\d*\))?', _SQLITE_NOW_DEFAULT, rest, flags=re.I)
+    if name == table.autoincrement and table.primary_key == [name]:
+        return f'"{name}" INTEGER PRIMARY KEY AUTOINCREMENT'
+    return f'"{name}" {_AFFINITY.get(mysql_type, "TEXT")} {" ".join(rest.split())}'.rstrip()
+
+
+def sqlite_schema(statements):
+    """Replay the DDL in ``statements``; returns (tables, data INSERT statements)."""
+    tables, inserts = {}, []
+    for statement in statements:
+        head = statement.lstrip().upper()
+        if head.startswith('CREATE TABLE'):
+            name = re.match(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?', statement, re.I).group(1)
+            body = statement[statement.index('(') + 1:statement.rindex(')')]
+            table = tables[name] = _Table(name)
+            for item in _split_top_level(body):
+                table.apply(item) if re.match(r'^(PRIMARY|UNIQUE|KEY|INDEX|CONSTRAINT|FOREIGN)\b', item, re.I) \
+                    else table.apply('ADD COLUMN ' + item)
+        elif head.startswith('ALTER TABLE'):
+            match = re.match(r'ALTER\s+TABLE\s+`?(\w+)`?\s*(.*)$', statement, re.I | re.S)
+            table = tables[match.group(1)]
+            for clause in _split_top_level(match.group(2)):
+                table.apply(clause)
+        elif head.startswith('INSERT INTO'):
+            inserts.append(statement)
+    return tables, inserts
+
+
+def _quoted(names):
+    return ', '.join(f'"{name}"' for name in names)
+
+
+def sqlite_ddl(tables):
+    ddl = []
+    for table in tables.values():
+        columns = [_sqlite_column(table, name, definition) for name, definition in table.columns.items()]
+        if table.primary_key and table.primary_key != [table.autoincrement]:
+            columns.append(f"PRIMARY KEY ({_quoted(table.primary_key)})")
+        ddl.append(f'CREATE TABLE "{table.name}" (\n  ' + ',\n  '.join(columns) + '\n)')
+        for index, (unique, names) in table.indexes.items():
+            ddl.append(f'CREATE {"UNIQUE " if unique else ""}INDEX "{table.name}_{index}" '
+                       f'ON "{table.name}" ({_quoted(names)})')
+    return ddl
+
+
+_VALUE_TOKEN = re.compile(
+    r"""\s*(?:'((?:[^'\\]|\\.|'')*)'|0x([0-9A-Fa-f]*)|(NULL)\b|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)|([(),]))""",
+    re.S | re.I)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def _unescape(value):
+    return re.sub(r"\\(.)|''", lambda m: "'" if m.group(1) is None else _ESCAPES.get(m.group(1), m.group(1)),
+                  value, flags=re.S)
+
+
+def parse_insert(statement):
+    """(table, columns, rows) from a dump INSERT with a column list and literal values."""
+    match = re.match(r'INSERT\s+INTO\s+`?(\w+)`?\s*\(([^)]*)\)\s*VALUES\s*', statement, re.I)
+    table, columns = match.group(1), _names(match.group(2))
+    rows, row, position = [], None, match.end()
+    while position < len(statement):
+        token = _VALUE_TOKEN.match(statement, position)
+        if token is None:
+            raise ValueError(f"Cannot parse INSERT into {table} near: {statement[position:position + 40]!r}")
+        position = token.end()
+        text, hex_value, null, number, punct = token.groups()
+        if punct == '(':
+            row = []
+        elif punct == ')':
+            rows.append(tuple(row))
+        elif punct == ',':
+            continue
+        elif hex_value is not None:
+            row.append(bytes.fromhex(hex_value))
+        elif null:
+            row.append(None)
+        elif number is not None:
+            row.append(float(number) if any(c in number for c in '.eE') else int(number))
+        else:
+            row.append(_unescape(text))
+    return table, columns, rows
+
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.') + f"{value.microsecond // 1000:03d}"
+
+
+def _sqlite_param(value):
+    if isinstance(value, datetime.datetime):
+        return _format_datetime(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, bool):
+        return int(value)
+    if hasattr(value, 'as_integer_ratio') and not isinstance(value, (int, float)):
+        return float(value)  # Decimal
+    return value
+
+
+def _parse_datetime(raw):
+    return datetime.datetime.fromisoformat(raw.decode())
+
+
+sqlite3.register_converter('DATETIME', _parse_datetime)
+sqlite3.register_converter('TIMESTAMP', _parse_datetime)
+
+
+def create_sqlite_db(path, statements=None):
+    """Build the schema and dump data in a fresh SQLite file (WAL mode)."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    tables, inserts = sqlite_schema(statements or seed_statements())
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for ddl in sqlite_ddl(tables):
+        conn.execute(ddl)
+    for statement in inserts:
+        table, columns, rows = parse_insert(statement)
+        kinds = {name: _AFFINITY.get(re.match(r'\w+', tables[table].columns[name]).group(0).lower())
+                 for name in columns}
+        converted = [
+            tuple(_format_datetime(datetime.datetime.fromisoformat(value))
+                  if kinds[name] in ('DATETIME', 'TIMESTAMP') and isinstance(value, str) else value
+                  for name, value in zip(columns, row))
+            for row in rows
+        ]
+        conn.executemany(f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                         converted)
+    conn.commit()
+    conn.close()
+    return sorted(tables)
+
+
+_REWRITES = [
+    (re.compile(r'NOW\(\d*\)\s*-\s*INTERVAL\s+(%s|\d+)\s+SECOND', re.I), r'SECONDS_AGO(\1)'),
+    (re.compile(r'TIMESTAMPDIFF\(\s*MICROSECOND\s*,', re.I), 'TIMESTAMPDIFF_US('),
+    (re.compile(r'\bIF\(', re.I), 'IIF('),
+    (re.compile(r'\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED)?', re.I), ''),
+    (re.compile(r'ON\s+DUPLICATE\s+KEY\s+UPDATE\s+(\w+)\s*=\s*\1\b', re.I), 'ON CONFLICT DO NOTHING'),
+    (re.compile(r'\bLIKE\s+%s', re.I), r"LIKE %s ESCAPE '\\'"),
+    (re.compile(r'%s'), '?'),
+]
+_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b|\bFOR\s+UPDATE\b', re.I)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """MySQL statement as issued by the app -> (SQLite statement, needs the write lock)."""
+    needs_lock = bool(_WRITE.search(sql))
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql, needs_lock
+
+
+def _now(precision=0):
+    return _format_datetime(datetime.datetime.now())
+
+
+def _seconds_ago(seconds):
+    return _format_datetime(datetime.datetime.now() - datetime.timedelta(seconds=float(seconds)))
+
+
+def _timestampdiff_us(start, end):
+    if start is None or end is None:
+        return None
+    delta = datetime.datetime.fromisoformat(end) - datetime.datetime.fromisoformat(start)
+    return int(delta.total_seconds() * 1_000_000)
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def _begin_if_needed(self, needs_lock):
+        # MySQL takes row locks as it goes; SQLite has one writer, so take the
+        # write lock up front instead of failing with SQLITE_BUSY on upgrade
+        if needs_lock and not self._connection.raw.in_transaction:
+            self._connection.raw.execute('BEGIN IMMEDIATE')
+
+    def execute(self, operation, params=None, multi=False):
+        sql, needs_lock = translate(operation)
+        self._begin_if_needed(needs_lock)
+        self._cursor.execute(sql, tuple(_sqlite_param(p) for p in params or ()))
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+
+    def executemany(self, operation, seq_params):
+        sql, needs_lock = translate(operation)
+        self._begin_if_needed(needs_lock)
+        rows = [tuple(_sqlite_param(p) for p in params) for params in seq_params]
+        self._cursor.executemany(sql, rows)
+        self.rowcount = self._cursor.rowcount
+        if rows and sql.lstrip().upper().startswith('INSERT'):
+            # mysql.connector reports the first id of a multi-row insert
+            last = self._connection.raw.execute('SELECT last_insert_rowid()').fetchone()[0]
+            self.lastrowid = last - len(rows) + 1
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The parts of a mysql.connector connection the app and ConnectionPool use."""
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        self.raw.execute('PRAGMA synchronous=NORMAL')
+        self.raw.execute('PRAGMA busy_timeout=30000')
+        self.raw.create_function('NOW', -1, _now)
+        self.raw.create_function('SECONDS_AGO', 1, _seconds_ago)
+        self.raw.create_function('TIMESTAMPDIFF_US', 2, _timestampdiff_us)
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute('COMMIT')
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute('ROLLBACK')
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.raw.execute('SELECT 1')
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+
+
+_installed_path = None
+_install_lock = threading.Lock()
+
+
+def install_sqlite_standin(path):
+    """Make mysql.connector.connect() open ``path`` instead of a MySQL server (this process only)."""
+    global _installed_path
+    import mysql.connector
+
+    with _install_lock:
+        _installed_path = path
+
+        def connect(*args, **kwargs):
+            return SQLiteConnection(_installed_path)
+
+        mysql.connector.connect = connect
+
+
+# --- CLI ---
+
+def prepare(kind, path=None, history_rows=0, frames=0, seed=0):
+    """Create and seed a stand-in; returns (info dict, env overrides for the app, LocalMySQL or None)."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from _common import synthetic_frames
+
+    frame_bytes = synthetic_frames(frames, seed) if frames else []
+    started = time.perf_counter()
+    if kind == 'sqlite':
+        path = path or os.path.join(tempfile.gettempdir(), 'carwatch-bench.db')
+        tables = create_sqlite_db(path)
+        conn = SQLiteConnection(path)
+        extra = seed_synthetic(conn, history_rows, frame_bytes, seed)
+        conn.close()
+        info = {'kind': 'sqlite', 'path': path, 'tables': tables, **extra,
+                'seed_seconds': round(time.perf_counter() - started, 2)}
+        return info, {'CARWATCH_BENCH_SQLITE': path}, None
+
+    server = LocalMySQL().start()
+    try:
+        seed_mysql(server.connect_kwargs)
+        import mysql.connector
+        conn = mysql.connector.connect(database=DB_NAME, **server.connect_kwargs)
+        extra = seed_synthetic(conn, history_rows, frame_bytes, seed)
+        conn.close()
+    except Exception:
+        server.stop()
+        raise
+    info = {'kind': 'mysql', 'port': server.port, **extra,
+            'seed_seconds': round(time.perf_counter() - started, 2)}
+    env = {'DB_HOST': '127.0.0.1', 'DB_PORT': str(server.port), 'DB_USER': 'root',
+           'DB_PASSWORD': '', 'DB_NAME': DB_NAME}
+    return info, env, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sqlite', metavar='PATH', help='create a SQLite stand-in at PATH')
+    parser.add_argument('--mysql', action='store_true',
+                        help='start a local mysqld/mariadbd, seed it and keep it running until Ctrl-C')
+    parser.add_argument('--history-rows', type=int, default=0, help='synthetic history rows to add')
+    parser.add_argument('--frames', type=int, default=0, help='synthetic images (from images/) to add')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not args.sqlite and not args.mysql:
+        parser.error('choose --sqlite PATH or --mysql')
+
+    info, env, server = prepare('mysql' if args.mysql else 'sqlite', args.sqlite,
+                                args.history_rows, args.frames, args.seed)
+    print(info)
+    if server is not None:
+        print('App settings: ' + ' '.join(f'{k}={v}' for k, v in env.items()))
+        try:
+            server.process.wait()
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""gunicorn entry point used by bench_load.py: wsgi.py on the SQLite stand-in.
+
+    CARWATCH_BENCH_SQLITE=/tmp/carwatch-bench.db \
+        gunicorn standin_wsgi:app -c gunicorn.conf.py --pythonpath benchmarks
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from local_db import install_sqlite_standin
+
+# Before the app is imported, so every pooled connection opens the SQLite file
+install_sqlite_standin(os.environ['CARWATCH_BENCH_SQLITE'])
+
+from wsgi import app  # noqa: E402
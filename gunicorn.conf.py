@@ -33,3 +33,53 @@ user = None
 group = None
 
 os.makedirs('logs', exist_ok=True)
+
+# Workers write Prometheus samples here so /metrics can sum them (app/services/metrics.py);
+# .env is loaded first so a value set there still wins
+from dotenv import load_dotenv
+load_dotenv()
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/carwatch-metrics')
+
+
+_inference_pool = None
+
+
+def on_starting(server):
+    # With INFERENCE_POOL_ENABLED the models are loaded once, in a separate
+    # process pool, instead of in every worker
+    global _inference_pool
+    from app.config import Config
+    from app.services.metrics import reset_multiproc_dir
+    reset_multiproc_dir()
+    if Config.INFERENCE_POOL_ENABLED:
+        from app.services.inference_pool import start_pool_process
+        _inference_pool = start_pool_process()
+        server.log.info(f"Started inference pool supervisor (pid {_inference_pool.pid})")
+    # Build the plate search index once here; forked workers inherit it
+    if Config.PLATE_SEARCH_ENABLED:
+        from app.services.plate_search import build_plate_index
+        try:
+            index = build_plate_index()
+            server.log.info(f"Built plate search index ({index.stats()['plates']} plates)")
+        except Exception as e:
+            server.log.warning(f"Plate search index not built in the master, workers will build it: {e}")
+
+
+def on_exit(server):
+    if _inference_pool is not None and _inference_pool.is_alive():
+        _inference_pool.terminate()
+        _inference_pool.join(10)
+
+
+def child_exit(server, worker):
+    from app.services.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Load and warm the models in the background so the worker can answer
+    # /health immediately and /health/ready once inference is fast
+    from app.services.ocr_service import start_model_warmup
+    from app.services.plate_search import start_plate_index
+    start_model_warmup()
+    start_plate_index()
@@ -0,0 +1,20 @@
+-- Queue table for asynchronous OCR (POST /api/upload_image?async=1).
+-- Requires MySQL 8.0+ for SELECT ... FOR UPDATE SKIP LOCKED.
+
+USE `carwatch`;
+
+CREATE TABLE IF NOT EXISTS `ocr_jobs` (
+  `job_id` int NOT NULL AUTO_INCREMENT,
+  `image_id` int NOT NULL,
+  `history_id` int DEFAULT NULL,
+  `status` enum('queued','running','done','failed') COLLATE utf8mb4_general_ci NOT NULL DEFAULT 'queued',
+  `plate` varchar(12) COLLATE utf8mb4_general_ci DEFAULT NULL,
+  `error` varchar(255) COLLATE utf8mb4_general_ci DEFAULT NULL,
+  `attempts` int NOT NULL DEFAULT 0,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`job_id`),
+  KEY `idx_status_job` (`status`, `job_id`),
+  KEY `fk_job_history_id` (`history_id`),
+  CONSTRAINT `fk_job_history_id` FOREIGN KEY (`history_id`) REFERENCES `history` (`history_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,18 @@
+-- Indexes for keyset-paginated /api/history.
+--
+-- idx_history_keyset covers every column /api/history can return, so the
+-- default newest-first page is an index-only range scan on (date, history_id)
+-- regardless of table size. The filter indexes keep plate-prefix, subject and
+-- user_id lookups ordered by the same keyset so LIMIT stops the scan early.
+-- idx_history_user_date also backs the user_id foreign key, replacing `user_id`.
+
+USE `carwatch`;
+
+ALTER TABLE `history`
+  ADD KEY `idx_history_keyset` (`date`, `history_id`, `plate`, `subject`, `image_id`, `user_id`, `description`),
+  ADD KEY `idx_history_plate_date` (`plate`, `date`, `history_id`),
+  ADD KEY `idx_history_subject_date` (`subject`, `date`, `history_id`),
+  ADD KEY `idx_history_user_date` (`user_id`, `date`, `history_id`);
+
+ALTER TABLE `history`
+  DROP KEY `user_id`;
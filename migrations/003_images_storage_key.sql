@@ -0,0 +1,13 @@
+-- Move image bytes out of MySQL into the content-addressed file store.
+--
+-- New uploads write the bytes to IMAGE_STORE_DIR and keep only the sha256
+-- key here, so image_data becomes nullable. Existing rows keep serving from
+-- image_data until scripts/migrate_image_blobs.py moves them out.
+
+USE `carwatch`;
+
+ALTER TABLE `images`
+  MODIFY `image_data` mediumblob NULL,
+  ADD COLUMN `storage_key` char(64) DEFAULT NULL AFTER `image_data`,
+  ADD COLUMN `storage_backend` varchar(16) DEFAULT NULL AFTER `storage_key`,
+  ADD KEY `idx_storage_key` (`storage_key`);
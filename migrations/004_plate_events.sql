@@ -0,0 +1,19 @@
+-- Open multi-frame event per camera for PLATE_EVENTS_ENABLED.
+-- One row per (camera, status) holds the reads of the current window; it is
+-- overwritten when the next car arrives, so the table never grows.
+
+USE `carwatch`;
+
+CREATE TABLE IF NOT EXISTS `plate_events` (
+  `camera_id` varchar(64) COLLATE utf8mb4_general_ci NOT NULL,
+  `status` varchar(16) COLLATE utf8mb4_general_ci NOT NULL,
+  `history_id` int DEFAULT NULL,
+  `image_id` int DEFAULT NULL,
+  `plate` varchar(12) COLLATE utf8mb4_general_ci NOT NULL DEFAULT '',
+  `best_confidence` float NOT NULL DEFAULT 0,
+  `frames` int NOT NULL DEFAULT 0,
+  `frame_reads` text COLLATE utf8mb4_general_ci NOT NULL,
+  `first_seen` datetime(3) NOT NULL,
+  `last_seen` datetime(3) NOT NULL,
+  PRIMARY KEY (`camera_id`, `status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,66 @@
+"""Export the LPD and OCR checkpoints to ONNX for INFERENCE_BACKEND=onnx.
+
+Writes models/best_LPD.onnx and models/best_OCR.onnx next to the .pt files
+and, with --int8, dynamically quantized best_*.int8.onnx copies (used when
+ONNX_INT8=True):
+
+    python scripts/export_onnx.py --int8
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.inference_backends import _configure_torch, onnx_path_for
+
+MODELS = [
+    os.path.join(ROOT, 'models', 'best_LPD.pt'),
+    os.path.join(ROOT, 'models', 'best_OCR.pt'),
+]
+
+
+def export(pt_path, imgsz, opset, dynamic):
+    _configure_torch()
+    from ultralytics import YOLO
+
+    exported = YOLO(pt_path).export(format='onnx', imgsz=imgsz, opset=opset, dynamic=dynamic, simplify=True)
+    target = onnx_path_for(pt_path)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        shutil.move(exported, target)
+    return target
+
+
+def quantize(onnx_path, pt_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    target = onnx_path_for(pt_path, int8=True)
+    # Weight-only INT8; activations stay float so no calibration set is needed.
+    # quantize_dynamic keeps the model metadata, including the class names.
+    quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--static-batch', action='store_true',
+                        help='export with a fixed batch of 1 instead of a dynamic batch axis')
+    parser.add_argument('--int8', action='store_true', help='also write INT8-quantized models')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    for pt_path in MODELS:
+        onnx_path = export(pt_path, args.imgsz, args.opset, dynamic=not args.static_batch)
+        logging.info(f"Exported {pt_path} -> {onnx_path}")
+        if args.int8:
+            logging.info(f"Quantized {onnx_path} -> {quantize(onnx_path, pt_path)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Move legacy images.image_data BLOBs into the configured image store.
+
+Run from the project root next to the live service, e.g.:
+
+    nohup python scripts/migrate_image_blobs.py --batch-size 100 --sleep 0.5 &
+    python scripts/migrate_image_blobs.py --prune-orphans
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.blob_migration import migrate_blobs, prune_orphans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=100, help='rows moved per transaction')
+    parser.add_argument('--sleep', type=float, default=0.5, help='pause between batches in seconds')
+    parser.add_argument('--max-batches', type=int, default=None, help='stop after this many batches')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--prune-orphans', action='store_true',
+                        help='delete stored files no longer referenced by any images row')
+    parser.add_argument('--grace', type=float, default=3600,
+                        help='with --prune-orphans, skip files newer than this many seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.prune_orphans:
+        result = prune_orphans(grace_seconds=args.grace, dry_run=args.dry_run)
+    else:
+        result = migrate_blobs(
+            batch_size=args.batch_size,
+            sleep_seconds=args.sleep,
+            max_batches=args.max_batches,
+            dry_run=args.dry_run
+        )
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
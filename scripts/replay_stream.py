@@ -0,0 +1,104 @@
+"""Replay a JPEG sequence (or a recorded .mjpeg file) into /api/stream.
+
+Sends the frames as one chunked multipart/x-mixed-replace request, paced
+like a camera, and prints the server's summary:
+
+    python scripts/replay_stream.py frames/ --url http://localhost:5000 \
+        --camera-id gate-1 --status entering --fps 10 --loop 3
+
+A directory is replayed in file-name order. A single file is read as
+back-to-back JPEGs (e.g. saved with ``curl camera/video.mjpg > clip.mjpeg``).
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services.stream_ingest import JpegStreamParser
+
+BOUNDARY = 'carwatchframe'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def load_frames(source):
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        frames = []
+        for name in names:
+            with open(os.path.join(source, name), 'rb') as f:
+                frames.append(f.read())
+        return frames
+
+    parser = JpegStreamParser(max_frame_bytes=64 * 1024 * 1024)
+    with open(source, 'rb') as f:
+        return parser.feed(f.read())
+
+
+def mjpeg_body(frames, fps, loops, raw):
+    """Yield the request body one frame at a time, sleeping to keep ``fps``."""
+    interval = 1.0 / fps if fps > 0 else 0.0
+    next_at = time.monotonic()
+    for _ in range(loops):
+        for frame in frames:
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_at = max(next_at + interval, time.monotonic())
+            if raw:
+                yield frame
+            else:
+                yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(frame)}\r\n\r\n").encode() + frame + b"\r\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='directory of .jpg files or a recorded MJPEG file')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--camera-id', default='replay')
+    parser.add_argument('--status', default='entering')
+    parser.add_argument('--fps', type=float, default=10.0, help='send rate (0 = as fast as possible)')
+    parser.add_argument('--sample-fps', type=float, help='server-side sampling rate (?fps=)')
+    parser.add_argument('--loop', type=int, default=1, help='replay the sequence this many times')
+    parser.add_argument('--raw', action='store_true', help='send bare JPEGs without multipart framing')
+    args = parser.parse_args()
+
+    frames = load_frames(args.source)
+    if not frames:
+        sys.exit(f"No JPEG frames found in {args.source}")
+
+    url = urllib.parse.urlsplit(args.url)
+    query = {'camera_id': args.camera_id, 'status': args.status}
+    if args.sample_fps is not None:
+        query['fps'] = args.sample_fps
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(url.netloc, timeout=600)
+    content_type = 'image/jpeg' if args.raw else f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+    print(f"Replaying {len(frames)} frame(s) x{args.loop} at {args.fps:g} fps to {args.url}/api/stream",
+          file=sys.stderr)
+    started = time.monotonic()
+    connection.request(
+        'POST', f"{url.path.rstrip('/')}/api/stream?{urllib.parse.urlencode(query)}",
+        body=mjpeg_body(frames, args.fps, args.loop, args.raw),
+        headers={'Content-Type': content_type},
+        encode_chunked=True,
+    )
+    response = connection.getresponse()
+    body = response.read().decode()
+    print(f"HTTP {response.status} after {time.monotonic() - started:.1f}s", file=sys.stderr)
+    try:
+        print(json.dumps(json.loads(body), indent=2))
+    except ValueError:
+        print(body)
+    sys.exit(0 if response.status == 200 else 1)
+
+
+if __name__ == '__main__':
+    main()